@@ -20,7 +20,25 @@ import ovs.vlog
 vlog = ovs.vlog.Vlog('dc')
 
 
-def get_row_data(row, table_name, schema, idl, index=None):
+def get_row_data(row, table_name, schema, idl, index=None, cache=None,
+                 parent=None):
+
+    # Rows not changed since they were last read are taken from the cache
+    key = (table_name, row.uuid)
+    if cache is not None:
+        cache.add_parent(key, parent)
+        if cache.has_row(key, index):
+            return cache.get_row(key, index)
+
+    row_data = _get_row_data(row, table_name, schema, idl, index, cache, key)
+
+    if cache is not None:
+        cache.set_row(key, index, row_data)
+
+    return row_data
+
+
+def _get_row_data(row, table_name, schema, idl, index, cache, key):
 
     if index is None:
         index = ops.utils.row_to_index(row, table_name, schema, idl)
@@ -72,14 +90,15 @@ def get_row_data(row, table_name, schema, idl, index=None):
                     kv_index = keys[count]
                     data = get_row_data(
                         item, child_table_name, schema,
-                        idl, kv_index)
+                        idl, kv_index, cache, key)
                     if data is None:
                         continue
 
                     children_data.update({str(keys[count]): data.values()[0]})
                     count = count + 1
                 else:
-                    data = get_row_data(item, child_table_name, schema, idl)
+                    data = get_row_data(item, child_table_name, schema, idl,
+                                        cache=cache, parent=key)
                     if data is None:
                         continue
 
@@ -102,17 +121,12 @@ def get_row_data(row, table_name, schema, idl, index=None):
                     column_name = name
                     break
 
-            # Iterate through entire child table to find those rows belonging
-            # to the same parent
-            for item in idl.tables[child_name].rows.itervalues():
-                # Get the parent row reference
-                ref = item.__getattr__(column_name)
-                # Parent reference is same as 'row' (row was passed to
-                #this function) this is now the child of 'row'
-                if ref.uuid == row.uuid:
-                    data = get_row_data(item, child_name, schema, idl)
-                    if data is not None:
-                        children_data.update(data)
+            for item in _get_back_references(row, child_name, column_name,
+                                             idl):
+                data = get_row_data(item, child_name, schema, idl,
+                                    cache=cache, parent=key)
+                if data is not None:
+                    children_data.update(data)
 
         if children_data:
             row_data[child_name] = children_data
@@ -129,6 +143,10 @@ def get_row_data(row, table_name, schema, idl, index=None):
             if not references:
                 continue
 
+            # The indexes of the referenced rows are part of the row data
+            if cache is not None:
+                cache.add_references(key, ref_table_name, references)
+
             refdata = None
             if isinstance(references, ovs.db.idl.Row):
                 if not (_min == 1 and _max == 1):
@@ -192,7 +210,28 @@ def get_row_data(row, table_name, schema, idl, index=None):
     return None
 
 
-def get_table_data(table_name, schema, idl):
+def _get_back_references(row, child_name, column_name, idl):
+
+    # OpsIdl keeps the children of each parent row in a back reference map
+    child_table = idl.tables[child_name]
+    if column_name in getattr(child_table, 'parent_columns', ()):
+        return idl.back_reference_lookup(row.uuid, child_name)
+
+    # Iterate through entire child table to find those rows belonging
+    # to the same parent
+    children = []
+    for item in idl.tables[child_name].rows.itervalues():
+        # Get the parent row reference
+        ref = item.__getattr__(column_name)
+        # Parent reference is same as 'row' (row was passed to
+        #this function) this is now the child of 'row'
+        if ref.uuid == row.uuid:
+            children.append(item)
+
+    return children
+
+
+def get_table_data(table_name, schema, idl, cache=None):
 
     # get the table from the DB
     table = idl.tables[table_name]
@@ -206,7 +245,7 @@ def get_table_data(table_name, schema, idl):
         return None
 
     for row in table.rows.itervalues():
-        row_data = get_row_data(row, table_name, schema, idl)
+        row_data = get_row_data(row, table_name, schema, idl, cache=cache)
         if row_data is None:
             continue
         table_data[table_name].update(row_data)
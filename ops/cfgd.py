@@ -39,7 +39,7 @@ def connect():
     return idl
 
 
-def read():
+def read(idl=None):
     '''
     Walk through the rows in the config table (if any)
     looking for a row with type == startup.
@@ -47,9 +47,14 @@ def read():
     If found, return content of the "config" field in that row.
 
     'config' is stored in DB as a JSON string
+
+    When idl is given its replica of the config table is read,
+    otherwise a new connection is made and synced, blocking.
     '''
 
-    idl = connect()
+    if idl is None:
+        idl = connect()
+
     for ovs_rec in idl.tables["config"].rows.itervalues():
         row_type = ovs_rec.__getattr__('type')
         if row_type and row_type == 'startup':
@@ -61,15 +66,23 @@ def read():
     return None
 
 
-def write(data):
+def write(data, idl=None, txn=None):
     '''
     Walk through the rows in the config table (if any)
     looking for a row with type == startup.
 
     If found, update content of the "config" field in that row.
     If not found, create new row and set "config" field
+
+    When idl and txn are given the change is committed in txn without
+    waiting for the result, which may be Transaction.INCOMPLETE.
+    Otherwise a new connection is made and the commit blocks.
     '''
-    idl = connect()
+    blocking = idl is None
+    if blocking:
+        idl = connect()
+        txn = Transaction(idl)
+
     row = None
     for ovs_rec in idl.tables['config'].rows.itervalues():
         row_type = ovs_rec.__getattr__('type')
@@ -77,8 +90,6 @@ def write(data):
             row = ovs_rec
             break
 
-    txn = Transaction(idl)
-
     if row is None:
         row = txn.insert(idl.tables['config'])
         row.__setattr__('type', 'startup')
@@ -87,7 +98,10 @@ def write(data):
     base64data = base64.b64encode(json.dumps(data))
     row.__setattr__('config', base64data)
 
-    result = txn.commit_block()
+    if blocking:
+        result = txn.commit_block()
+    else:
+        result = txn.commit()
     error = txn.get_error()
 
     return (result, error)
@@ -67,11 +67,106 @@ def register(extschema, ovsschema, ovsremote):
 
         schema_helper.register_columns(str(tablename), register_columns)
 
-    idl = ops.opsidl.OpsIdl(ovsremote, schema_helper)
+    idl = ops.opsidl.OpsIdl(ovsremote, schema_helper, extschema)
     return idl
 
 
-def read(extschema, idl):
+class RunningConfigCache(object):
+    """Materialized running configuration, kept between reads.
+
+    The data of every row read is kept along with the rows whose data
+    contains it, i.e. its parents and the rows referencing it. When
+    rows change, invalidate_rows drops their data and the data of all
+    the rows containing it, so the next read only rebuilds the changed
+    subtrees. The data returned by reads is shared with the cache and
+    must not be modified.
+    """
+
+    def __init__(self, extschema):
+        self.config = None
+        self.generation = 0
+
+        # (table, uuid) to {index: row data}
+        self.rows = {}
+        # table to the uuids of its rows in self.rows
+        self.tables = {}
+        # (table, uuid) to the keys of the rows containing its data
+        self.parents = {}
+        self.referrers = {}
+
+        # table to the tables whose rows may have its rows as children
+        self.parent_tables = {}
+        for table_name, table_schema in extschema.ovs_tables.iteritems():
+            for child_name in table_schema.children:
+                if child_name in table_schema.references:
+                    child_name = table_schema.references[child_name].ref_table
+                self.parent_tables.setdefault(child_name,
+                                              set()).add(table_name)
+
+    def clear(self):
+        self.config = None
+        self.generation += 1
+        self.rows = {}
+        self.tables = {}
+        self.parents = {}
+        self.referrers = {}
+
+    def has_row(self, key, index):
+        return key in self.rows and index in self.rows[key]
+
+    def get_row(self, key, index):
+        return self.rows[key][index]
+
+    def set_row(self, key, index, row_data):
+        self.rows.setdefault(key, {})[index] = row_data
+        self.tables.setdefault(key[0], set()).add(key[1])
+
+    def add_parent(self, key, parent):
+        if parent is not None:
+            self.parents.setdefault(key, set()).add(parent)
+
+    def add_references(self, key, ref_table_name, references):
+        if isinstance(references, dict):
+            references = references.values()
+        elif not isinstance(references, list):
+            references = [references]
+
+        for ref in references:
+            self.referrers.setdefault((ref_table_name, ref.uuid),
+                                      set()).add(key)
+
+    def invalidate_rows(self, changed_rows):
+        """Drops the data of the (table, uuid) rows changed and of the
+        rows containing it.
+        """
+        if not changed_rows:
+            return
+
+        self.config = None
+        self.generation += 1
+
+        keys = []
+        for key in changed_rows:
+            if key in self.rows:
+                keys.append(key)
+            else:
+                # A new row may be the child of any row of its parent
+                # tables
+                for table_name in self.parent_tables.get(key[0], ()):
+                    keys.extend((table_name, uuid)
+                                for uuid in self.tables.get(table_name, ()))
+
+        while keys:
+            key = keys.pop()
+            if self.rows.pop(key, None) is None:
+                continue
+
+            self.tables[key[0]].discard(key[1])
+            keys.extend(self.parents.pop(key, ()))
+            keys.extend(self.referrers.pop(key, ()))
+
+
+def read(extschema, idl, cache=None):
     """Read the OpenSwitch OVSDB database
 
     Args:
@@ -79,6 +174,8 @@ def read(extschema, idl):
             parsed extended-schema (vswitch.extschema) object.
         idl (ovs.db.idl.Idl): This is the IDL object that
             represents the OVSDB IDL.
+        cache (RunningConfigCache): if given, rows not changed
+            since the last read are not read again
 
     Returns:
         dict: Returns a Python dictionary object containing
@@ -86,6 +183,9 @@ def read(extschema, idl):
             to the relationship between various tables as
             described in vswitch.extschema
     """
+    if cache is not None and cache.config is not None:
+        return dict(cache.config)
+
     config = {}
     for table_name in extschema.ovs_tables.keys():
 
@@ -95,7 +195,8 @@ def read(extschema, idl):
 
         # Get table data for root or top level table
         try:
-            table_data = _read.get_table_data(table_name, extschema, idl)
+            table_data = _read.get_table_data(table_name, extschema, idl,
+                                              cache)
         except Exception as e:
             vlog.err(e)
             return e
@@ -106,11 +207,92 @@ def read(extschema, idl):
     # remove system uuid
     config[ops.constants.OVSDB_SCHEMA_SYSTEM_TABLE] = config[ops.constants.OVSDB_SCHEMA_SYSTEM_TABLE].values()[0]
     vlog.dbg('succcess generating running configuration')
+
+    if cache is not None:
+        cache.config = config
+        return dict(config)
+
     return config
 
-def write(data, extschema, idl, txn=None, block=False):
+
+def fill_cache(extschema, idl, cache):
+    """Read the rows of the running configuration into a cache, one
+    top-level row at a time
+
+    This is a generator yielding after each row read, so that the read
+    can be spread over several iterations of an event loop. Rows changed
+    between two iterations are invalidated in the cache as usual and
+    read again by the next read.
+
+    Args:
+        extschema (opslib.RestSchema): This is the
+            parsed extended-schema (vswitch.extschema) object.
+        idl (ovs.db.idl.Idl): This is the IDL object that
+            represents the OVSDB IDL.
+        cache (RunningConfigCache): the cache to fill
+    """
+    for table_name, table_schema in extschema.ovs_tables.iteritems():
+        if table_schema.parent is not None:
+            continue
+
+        rows = idl.tables[table_name].rows
+        for row_uuid in rows.keys():
+            row = rows.get(row_uuid)
+            if row is None or cache.has_row((table_name, row_uuid), None):
+                continue
+
+            _read.get_row_data(row, table_name, extschema, idl, cache=cache)
+            yield
+
+
+def diff(data, running_config):
+    """Compare a configuration with the running configuration
+
+    Args:
+        data (dict): The new configuration represented as a Python
+            dictionary object.
+        running_config (dict): The running configuration as returned
+            by read
+
+    Returns:
+        set: The paths of the dictionaries in data equal to the
+            dictionary at the same place in running_config, i.e. the
+            unchanged rows and subtrees of data. A path is the tuple
+            of the keys leading to the dictionary from the top of the
+            configuration, e.g. ('Port', 'bridge_normal') or
+            ('System', 'vrfs', 'vrf_default'), the path of the
+            configuration itself being ().
+    """
+    unchanged = set()
+    _diff(data, running_config, (), unchanged)
+    return unchanged
+
+
+def _diff(new, old, path, unchanged):
+    if not isinstance(new, dict) or not isinstance(old, dict):
+        return new == old
+
+    equal = len(new) == len(old)
+    for key, value in new.iteritems():
+        if key not in old:
+            equal = False
+        elif not _diff(value, old[key], path + (key,), unchanged):
+            equal = False
+
+    if equal:
+        unchanged.add(path)
+    return equal
+
+
+def write(data, extschema, idl, txn=None, block=False, cache=None,
+          unchanged=None):
     """Write a new configuration to OpenSwitch OVSDB database
 
+    Only the difference with the running configuration is applied,
+    rows whose data is the same as in the running configuration are
+    not set up again. Writing the running configuration back results
+    in an empty transaction, i.e. UNCHANGED.
+
     Args:
         data (dict): The new configuration represented as a Python
             dictionary object.
@@ -120,10 +302,23 @@ def write(data, extschema, idl, txn=None, block=False):
             represents the OVSDB IDL.
         txn (ovs.db.idl.Transaction): OVSDB transaction object.
         block (boolean): if block is True, commit_block() is used
+        cache (RunningConfigCache): running configuration to compare
+            with, idl.config_cache if not given
+        unchanged (set): result of diff with the current running
+            configuration, computed if not given
 
     Returns:
         result : The result of transaction commit
     """
+    if unchanged is None:
+        if cache is None:
+            cache = getattr(idl, 'config_cache', None)
+
+        running_config = read(extschema, idl, cache)
+        if isinstance(running_config, Exception):
+            running_config = None
+        unchanged = diff(data, running_config)
+
     if txn is None:
         try:
             txn = Transaction(idl)
@@ -132,6 +327,11 @@ def write(data, extschema, idl, txn=None, block=False):
             vlog.dbg('error in creating transaction: %s' % e)
             return e
 
+    # Nothing to set up if the configuration did not change
+    if () in unchanged:
+        vlog.dbg('configuration unchanged')
+        return _commit(txn, block)
+
     # dc.read returns config db with 'System' table
     # indexed to 'System' keyword. Replace it with
     # current database's System row UUID so that all
@@ -141,7 +341,7 @@ def write(data, extschema, idl, txn=None, block=False):
         system_uuid = idl.tables[ops.constants.OVSDB_SCHEMA_SYSTEM_TABLE].rows.keys()[0]
         data[ops.constants.OVSDB_SCHEMA_SYSTEM_TABLE] = {system_uuid:data[ops.constants.OVSDB_SCHEMA_SYSTEM_TABLE]}
 
-        _write.setup_validators(extschema, idl)
+        writer = _write.ConfigWriter(extschema, idl, txn, unchanged)
 
         # iterate over all top-level tables i.e. root
         for table_name, tableschema in extschema.ovs_tables.iteritems():
@@ -151,7 +351,7 @@ def write(data, extschema, idl, txn=None, block=False):
                 continue
 
             # set up the non-child table
-            _write.setup_table(table_name, data, extschema, idl, txn)
+            writer.setup_table(table_name, data)
 
         # iterate over all tables to fill in references
         for table_name, tableschema in extschema.ovs_tables.iteritems():
@@ -159,9 +359,9 @@ def write(data, extschema, idl, txn=None, block=False):
             if extschema.ovs_tables[table_name].parent is not None:
                 continue
 
-            _write.setup_references(table_name, data, extschema, idl)
+            writer.setup_references(table_name, data)
 
-        validation_errors = _write.exec_validators()
+        validation_errors = writer.exec_validators()
         if validation_errors:
             return (txn.ERROR, validation_errors)
 
@@ -169,6 +369,10 @@ def write(data, extschema, idl, txn=None, block=False):
         txn.abort()
         return (txn.ERROR, e)
 
+    return _commit(txn, block)
+
+
+def _commit(txn, block):
     try:
         if not block:
             # txn maybe be incomplete
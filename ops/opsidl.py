@@ -14,7 +14,14 @@
 
 
 from ovs.db.idl import Idl, Row
+from collections import OrderedDict
 import ovs
+import bisect
+
+import ops.constants
+
+# Sort orders kept per table by sorted_index_lookup
+MAX_SORTED_ORDERS = 8
 
 
 class OpsIdl(Idl):
@@ -23,33 +30,148 @@ class OpsIdl(Idl):
     is used in order to improve dc write time by doing the lookup from
     the index_map.
 
+    When the extended schema is given, OpsIdl also keeps a back_ref_map
+    per table, mapping a parent row UUID to the rows of the table whose
+    'parent' column references it. This avoids scanning the whole child
+    table (e.g. Route, BGP_Neighbor) to find the children of one parent.
+
+    For tables referenced through a 'child' column, a parent_ref_map
+    maps the child row UUID to its owner row, the owning column and the
+    key of the reference (None for non key-value columns), so the owner
+    of a child row is found without scanning the parent table.
+
+    The first sorted_index_lookup of a table and sort order builds the
+    list of (key, uuid) pairs of the rows in ascending order, for the
+    whole table or for the children of a parent in back_ref_map, and
+    keeps it sorted on every update afterwards. Collections are paged
+    by seeking in it instead of sorting the rows on each request.
+
+    After track_row_changes is called, every row created, updated or
+    deleted by an update from the server, or cleared on reconnection,
+    is recorded as a (table, uuid) pair until it is retrieved with
+    get_changed_rows. config_cache is the ops.dc.RunningConfigCache
+    ops.dc.write compares with by default, invalidated by the caller of
+    get_changed_rows, if any.
+
+    After track_txn_replies is called, the JSON-RPC ids of the
+    transactions completed by a reply, or aborted by a reconnection,
+    are recorded until they are retrieved with get_txn_replies.
     """
-    def __init__(self, remote, schema):
+    def __init__(self, remote, schema, extschema=None):
         Idl.__init__(self, remote, schema)
+        self._set_parent_columns(extschema)
+        self._set_child_columns(extschema)
         self._clear_all_index_maps()
+        self.changed_rows = None
+        self.config_cache = None
+        self.txn_replies = None
 
     def _Idl__clear(self):
+        if self.changed_rows is not None:
+            for table in self.tables.itervalues():
+                self.changed_rows.update((table.name, uuid)
+                                         for uuid in table.rows)
         self._clear_all_index_maps()
         Idl._Idl__clear(self)
 
+    def _Idl__txn_process_reply(self, msg):
+        if self.txn_replies is not None and msg.id in self._outstanding_txns:
+            self.txn_replies.append(msg.id)
+        return Idl._Idl__txn_process_reply(self, msg)
+
+    def _Idl__txn_abort_all(self):
+        if self.txn_replies is not None:
+            self.txn_replies.extend(self._outstanding_txns.keys())
+        Idl._Idl__txn_abort_all(self)
+
+    def track_txn_replies(self):
+        if self.txn_replies is None:
+            self.txn_replies = []
+
+    def get_txn_replies(self):
+        """
+        Returns the ids of the transactions completed since the last call.
+        """
+        txn_replies = self.txn_replies or []
+        if self.txn_replies is not None:
+            self.txn_replies = []
+        return txn_replies
+
+    def _set_parent_columns(self, extschema):
+        for table_name, table in self.tables.iteritems():
+            table.parent_columns = []
+            if extschema is None or table_name not in extschema.ovs_tables:
+                continue
+
+            references = extschema.ovs_tables[table_name].references
+            for name, column in references.iteritems():
+                if column.relation == ops.constants.OVSDB_SCHEMA_PARENT \
+                        and name in table.columns:
+                    table.parent_columns.append(name)
+
+    def _set_child_columns(self, extschema):
+        for table_name, table in self.tables.iteritems():
+            table.child_columns = []
+            if extschema is None or table_name not in extschema.ovs_tables:
+                continue
+
+            references = extschema.ovs_tables[table_name].references
+            for name, column in references.iteritems():
+                if column.relation == ops.constants.OVSDB_SCHEMA_CHILD \
+                        and name in table.columns \
+                        and column.ref_table in self.tables:
+                    table.child_columns.append((name, column.ref_table,
+                                                column.kv_type))
+
     def _clear_all_index_maps(self):
         for table in self.tables.itervalues():
             table.index_map = {}
+            table.back_ref_map = {}
+            table.parent_ref_map = {}
+            table.sorted_orders = OrderedDict()
 
     # Overriding parent process_update
     def _Idl__process_update(self, table, uuid, old, new):
         """Returns True if a column changed, False otherwise."""
         row = table.rows.get(uuid)
+        old_parents = self._get_parent_uuids(row, table)
+        old_children = self._get_child_refs(row, table)
+        old_index = None
+        if row and old and new and self._index_changed(table, old):
+            old_index = self._get_index_key(row, table)
         changed = Idl._Idl__process_update(self, table, uuid, old, new)
+        if changed and self.changed_rows is not None:
+            self.changed_rows.add((table.name, uuid))
 
         if not new:
             if row:
                 # Delete row.
                 self._update_index_map(row, table, ovs.db.idl.ROW_DELETE)
+                self._update_back_ref_map(row, table, old_parents, [])
+                self._update_parent_ref_map(row, table, old_children, [])
         elif not old or not row:
             # Create row.
             row = table.rows.get(uuid)
             self._update_index_map(row, table, ovs.db.idl.ROW_CREATE, new)
+            self._update_back_ref_map(row, table, [],
+                                      self._get_parent_uuids(row, table))
+            self._update_parent_ref_map(row, table, [],
+                                        self._get_child_refs(row, table))
+        else:
+            # Update row, the index or references may have changed.
+            if old_index is not None:
+                if table.index_map.get(old_index) is row:
+                    del table.index_map[old_index]
+                table.index_map[self._get_index_key(row, table)] = row
+            if table.parent_columns:
+                self._update_back_ref_map(row, table, old_parents,
+                                          self._get_parent_uuids(row, table))
+            if table.child_columns:
+                self._update_parent_ref_map(row, table, old_children,
+                                            self._get_child_refs(row, table))
+
+        if table.sorted_orders:
+            self._update_sorted_orders(table, uuid, old, new, old_parents)
 
         return changed
 
@@ -74,6 +196,225 @@ class OpsIdl(Idl):
                         index_values.append(val)
                 table.index_map[tuple(index_values)] = row
 
+    def track_row_changes(self):
+        if self.changed_rows is None:
+            self.changed_rows = set()
+
+    def get_changed_rows(self):
+        """
+        Returns the (table, uuid) pairs changed since the last call.
+        """
+        changed_rows = self.changed_rows or set()
+        if self.changed_rows is not None:
+            self.changed_rows = set()
+        return changed_rows
+
+    def _index_changed(self, table, old):
+        if not table.indexes:
+            return False
+        for column in table.indexes[0]:
+            if column.name in old:
+                return True
+        return False
+
+    def _get_index_key(self, row, table):
+        # Same key as ROW_CREATE, UUID references taken from the datum
+        index_values = []
+        for v in table.indexes[0]:
+            if v.name in row._data:
+                if v.type.key.type == ovs.db.types.UuidType:
+                    val = row._data[v.name].as_scalar()
+                else:
+                    val = row.__getattr__(v.name)
+                index_values.append(str(val))
+        return tuple(index_values)
+
+    def _get_index_order(self, table):
+        columns = []
+        if table.indexes:
+            columns = [column.name for column in table.indexes[0]]
+
+        def key(row):
+            if not columns:
+                return ()
+            return self._get_index_key(row, table)
+
+        return (None, columns, key)
+
+    def _get_order_key(self, row, sorted_order):
+        # Keys are computed from the committed values of the row
+        committed_row = Row(self, row._table, row.uuid, row._data)
+        return (sorted_order.key(committed_row), str(row.uuid))
+
+    def _update_sorted_orders(self, table, uuid, old, new, old_parents):
+        row = table.rows.get(uuid) if new else None
+        if row is not None and row._data is None:
+            row = None
+        new_parents = self._get_parent_uuids(row, table)
+
+        for sorted_order in table.sorted_orders.itervalues():
+            old_key = sorted_order.keys.get(uuid)
+            if old_key is not None and row is not None and old and \
+                    old_parents == new_parents and \
+                    not sorted_order.columns.intersection(old):
+                continue
+
+            new_key = None
+            if row is not None:
+                new_key = self._get_order_key(row, sorted_order)
+
+            if old_key is not None:
+                del sorted_order.keys[uuid]
+                for group in [None] + old_parents:
+                    sorted_order.remove(group, old_key)
+
+            if new_key is not None:
+                sorted_order.keys[uuid] = new_key
+                for group in [None] + new_parents:
+                    sorted_order.insert(group, new_key)
+
+    def sorted_index_lookup(self, table_name, parent_uuid=None, order=None):
+        """
+        This subroutine returns the (key, uuid) pairs of the rows of
+        table_name in ascending order, uuid being the string of the row
+        UUID. Without order, key is the tuple of string index values,
+        empty for tables without indexes. Otherwise order is a
+        (name, columns, key) tuple, where key returns the sort key of a
+        row from the values of the given columns, without the changes
+        of ongoing transactions.
+        If parent_uuid is given, only the rows whose parent column
+        references that row are returned. The list is owned by the IDL
+        and must not be modified.
+        Only the MAX_SORTED_ORDERS orders last looked up are kept up to
+        date, per table.
+        """
+        table = self.tables.get(table_name)
+        if order is None:
+            order = self._get_index_order(table)
+
+        name, columns, key = order
+        sorted_order = table.sorted_orders.pop(name, None)
+        if sorted_order is None:
+            sorted_order = _SortedOrder(key, columns)
+            for row in table.rows.itervalues():
+                if row._data is not None:
+                    sorted_order.keys[row.uuid] = \
+                        self._get_order_key(row, sorted_order)
+
+        table.sorted_orders[name] = sorted_order
+        while len(table.sorted_orders) > MAX_SORTED_ORDERS:
+            table.sorted_orders.popitem(last=False)
+
+        keys = sorted_order.lists.get(parent_uuid)
+        if keys is None:
+            if parent_uuid is None:
+                uuids = sorted_order.keys.iterkeys()
+            else:
+                uuids = table.back_ref_map.get(parent_uuid, {}).iterkeys()
+            keys = sorted(sorted_order.keys[uuid] for uuid in uuids
+                          if uuid in sorted_order.keys)
+
+            # Parents without children are not kept
+            if keys or parent_uuid is None:
+                sorted_order.lists[parent_uuid] = keys
+
+        return keys
+
+    def _get_parent_uuids(self, row, table):
+        # Read the committed parent reference(s) of the row
+        parents = []
+        if row is None or row._data is None:
+            return parents
+
+        for name in table.parent_columns:
+            if name in row._data:
+                parents.extend(row._data[name].as_list())
+        return parents
+
+    def _update_back_ref_map(self, row, table, old_parents, new_parents):
+        if old_parents == new_parents:
+            return
+
+        for parent_uuid in old_parents:
+            children = table.back_ref_map.get(parent_uuid)
+            if children is None:
+                continue
+            children.pop(row.uuid, None)
+            if not children:
+                del table.back_ref_map[parent_uuid]
+
+        for parent_uuid in new_parents:
+            table.back_ref_map.setdefault(parent_uuid, {})[row.uuid] = row
+
+    def _get_child_refs(self, row, table):
+        # Read the committed child references of the row as
+        # (child table, column, key, child uuid) tuples
+        refs = []
+        if row is None or row._data is None:
+            return refs
+
+        for name, ref_table, kv_type in table.child_columns:
+            if name not in row._data:
+                continue
+            for key, value in row._data[name].values.iteritems():
+                if kv_type:
+                    refs.append((ref_table, name, key.value, value.value))
+                else:
+                    refs.append((ref_table, name, None, key.value))
+        return refs
+
+    def _update_parent_ref_map(self, row, table, old_refs, new_refs):
+        if old_refs == new_refs:
+            return
+
+        for ref_table, name, key, child_uuid in old_refs:
+            parents = self.tables[ref_table].parent_ref_map.get(child_uuid)
+            if parents is None:
+                continue
+            entry = parents.get((table.name, name))
+            if entry is not None and entry[0].uuid == row.uuid:
+                del parents[(table.name, name)]
+            if not parents:
+                del self.tables[ref_table].parent_ref_map[child_uuid]
+
+        for ref_table, name, key, child_uuid in new_refs:
+            parent_ref_map = self.tables[ref_table].parent_ref_map
+            parent_ref_map.setdefault(child_uuid, {})[(table.name, name)] = \
+                (row, key)
+
+    def parent_reference_lookup(self, child_uuid, table_name,
+                                parent_table_name, column):
+        """
+        This subroutine fetches the row of parent_table_name that holds
+        the row with UUID child_uuid of table_name in its child column.
+        Returns a (row, key) tuple, key is None if the column is not a
+        key-value reference, or None if the child has no parent.
+        """
+        table = self.tables.get(table_name)
+        parents = table.parent_ref_map.get(child_uuid)
+        if not parents or (parent_table_name, column) not in parents:
+            return None
+
+        parent_row, key = parents[(parent_table_name, column)]
+        if parent_row.uuid not in self.tables[parent_table_name].rows:
+            return None
+
+        return (parent_row, key)
+
+    def back_reference_lookup(self, parent_uuid, table_name):
+        """
+        This subroutine fetches the rows of table_name whose 'parent'
+        column references the row with UUID parent_uuid. Rows that were
+        deleted in an ongoing transaction are skipped.
+        """
+        table = self.tables.get(table_name)
+        children = table.back_ref_map.get(parent_uuid)
+        if not children:
+            return []
+
+        return [row for uuid, row in children.iteritems()
+                if uuid in table.rows]
+
     def index_to_row_lookup(self, index, table_name):
         """
         This subroutine fetches the row reference using index_values.
@@ -99,3 +440,32 @@ class OpsIdl(Idl):
             val = str(val)
             index_values.append(val)
         return tuple(index_values)
+
+
+class _SortedOrder(object):
+    """
+    Sort order of the rows of a table. The key of every row is kept,
+    while the sorted lists of keys are built on demand per group, None
+    for the whole table or a parent UUID for its children.
+    """
+    def __init__(self, key, columns):
+        self.key = key
+        self.columns = set(columns)
+        self.keys = {}
+        self.lists = {}
+
+    def insert(self, group, key):
+        keys = self.lists.get(group)
+        if keys is not None:
+            bisect.insort(keys, key)
+
+    def remove(self, group, key):
+        keys = self.lists.get(group)
+        if keys is None:
+            return
+
+        position = bisect.bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+        if not keys and group is not None:
+            del self.lists[group]
@@ -76,7 +76,12 @@ def row_to_index(row, table, restschema, idl, parent_row=None):
                     # TODO: check if this row exists in parent table
                     parent_rows = [parent_row]
                 else:
-                    parent_rows = idl.tables[parent].rows
+                    # only the row owning this child needs to be checked
+                    parent_rows = {}
+                    owner = idl.parent_reference_lookup(row.uuid, table,
+                                                        parent, column_name)
+                    if owner is not None:
+                        parent_rows[owner[0].uuid] = owner[0]
 
                 for item in parent_rows.itervalues():
                     column_data = item.__getattr__(column_name)
@@ -20,8 +20,9 @@ import string
 import sys
 
 import inflect
+import itertools
 
-from copy import deepcopy
+from copy import copy, deepcopy
 import ovs.daemon
 from ovs.db import error, types
 import ovs.db.idl
@@ -311,6 +312,81 @@ class OVSColumnCategory(object):
             raise error.Error('Unknown category: %s' % value)
 
 
+class OVSSerializationPlan(object):
+    '''
+    An instance of OVSSerializationPlan is the compiled description of
+    how the rows of a table are serialized, for one assignment of the
+    table columns to categories. Plans are built when the schema is
+    loaded and shared by all requests, they must not be modified.
+    Attributes:
+
+    - columns: category to tuple of (name, OVSColumn, is_scalar, type)
+      column accessors sorted by name. is_scalar is True if the column
+      holds at most one element and type is the base type used to
+      convert the column (the value type of maps)
+    - references: tuple of (name, OVSReference, category) for the
+      reference columns serialized with the row, sorted by name.
+      Columns referencing the parent table are left out
+    - keys: category to column name to OVSColumn mapping, including
+      the OVSDB_SCHEMA_REFERENCE category
+
+    Columns whose category is given in categories are copies of the
+    schema columns with their own category, so the schema objects
+    are never modified.
+    '''
+    def __init__(self, table, categories=None):
+        if categories is None:
+            categories = {}
+
+        self.keys = {OVSDB_SCHEMA_CONFIG: {},
+                     OVSDB_SCHEMA_STATS: {},
+                     OVSDB_SCHEMA_STATUS: {},
+                     OVSDB_SCHEMA_REFERENCE: {}}
+
+        for name, reference in table.references.iteritems():
+            if name in categories:
+                reference = _copy_with_category(reference, categories[name])
+            self.keys[OVSDB_SCHEMA_REFERENCE][name] = reference
+
+        for category, columns in ((OVSDB_SCHEMA_CONFIG, table.config),
+                                  (OVSDB_SCHEMA_STATS, table.stats),
+                                  (OVSDB_SCHEMA_STATUS, table.status)):
+            for name, column in columns.iteritems():
+                column_category = category
+                if name in categories:
+                    column_category = categories[name]
+                    column = _copy_with_category(column, column_category)
+                self.keys[column_category][name] = column
+
+        self.columns = {}
+        for category in (OVSDB_SCHEMA_CONFIG, OVSDB_SCHEMA_STATS,
+                         OVSDB_SCHEMA_STATUS):
+            accessors = []
+            for name in sorted(self.keys[category]):
+                column = self.keys[category][name]
+                value_type = column.type
+                if column.is_dict:
+                    value_type = column.value_type
+                accessors.append((name, column, column.n_max == 1,
+                                  value_type))
+            self.columns[category] = tuple(accessors)
+
+        references = []
+        for name in sorted(self.keys[OVSDB_SCHEMA_REFERENCE]):
+            reference = self.keys[OVSDB_SCHEMA_REFERENCE][name]
+            if reference.ref_table == table.parent:
+                continue
+            references.append((name, reference, reference.category.value))
+        self.references = tuple(references)
+
+
+def _copy_with_category(column, category):
+    column = copy(column)
+    column.category = copy(column.category)
+    column.category.value = category
+    return column
+
+
 class OVSTable(object):
     '''__init__() functions as the class constructor'''
     def __init__(self, name, is_root, is_many=True, desc=None,
@@ -374,6 +450,71 @@ class OVSTable(object):
         # Table's documentation strings for group descriptions
         self.groupsDesc = groupsDesc
 
+        # OVSSerializationPlan of the table, for tables with dynamic
+        # categories it is the plan of the default categories
+        self.serialization_plan = None
+
+        # Columns whose value determines the dynamic categories, the
+        # columns that follow each of them, their value to category
+        # mappings and the plan of each combination of categories
+        self.dynamic_sources = ()
+        self.dynamic_followers = {}
+        self.dynamic_per_value = {}
+        self.dynamic_plans = {}
+
+    def compile_serialization_plans(self):
+        '''
+        Builds the serialization plans of the table. Must be called
+        once the parent table is known.
+        '''
+        self.serialization_plan = OVSSerializationPlan(self)
+        if not self.dynamic:
+            return
+
+        columns = {}
+        columns.update(self.references)
+        columns.update(self.config)
+        columns.update(self.stats)
+        columns.update(self.status)
+
+        followers = {}
+        for column_name, category in self.dynamic.iteritems():
+            source = column_name
+            if category.follows is not None:
+                source = category.follows
+            followers.setdefault(source, []).append(column_name)
+
+        self.dynamic_sources = tuple(sorted(followers))
+        self.dynamic_followers = followers
+        self.dynamic_per_value = dict((source_name,
+                                       columns[source_name].category.
+                                       per_value)
+                                      for source_name in self.dynamic_sources)
+
+        # Precompile a plan for every combination of categories
+        source_categories = [sorted(set(self.dynamic_per_value[source_name].
+                                        values()))
+                             for source_name in self.dynamic_sources]
+        for key in itertools.product(*source_categories):
+            categories = {}
+            for source, category in zip(self.dynamic_sources, key):
+                for column_name in followers[source]:
+                    categories[column_name] = category
+            self.dynamic_plans[key] = OVSSerializationPlan(self, categories)
+
+    def get_serialization_plan(self, get_value=None):
+        '''
+        Returns the OVSSerializationPlan of a row of the table.
+        get_value(column_name) returns the value of a column of the
+        row, it is used to determine the dynamic categories.
+        '''
+        if not self.dynamic_sources:
+            return self.serialization_plan
+
+        key = tuple(self.dynamic_per_value[source][get_value(source)]
+                    for source in self.dynamic_sources)
+        return self.dynamic_plans[key]
+
     @staticmethod
     def from_json(_json, name, loadDescription):
         parser = ovs.db.parser.Parser(_json, 'schema of table %s' % name)
@@ -612,6 +753,9 @@ class RESTSchema(object):
         for table in self.ovs_tables.itervalues():
             self.plural_name_map[table.plural_name] = table.name
 
+        for table in self.ovs_tables.itervalues():
+            table.compile_serialization_plans()
+
     @staticmethod
     def from_json(_json, loadDescription):
         parser = ovs.db.parser.Parser(_json, 'extended OVSDB schema')
@@ -14,9 +14,11 @@
 
 from tornado.web import Application, StaticFileHandler
 
-from opsrest.manager import OvsdbConnectionManager
+from opsrest.manager import OvsdbConnectionManager, OvsdbConfigDbManager
+from opsrest.configjob import ConfigJobQueue
 from opslib import restparser
 from opsrest import constants
+from opsrest import parse
 from opsvalidator import validator
 from opsrest.notifications.handler import NotificationHandler
 import cookiesecret
@@ -28,6 +30,8 @@ class OvsdbApiApplication(Application):
         self.settings['cookie_secret'] = cookiesecret.generate_cookie_secret()
         schema = self.settings.get('ext_schema')
         self.restschema = restparser.parseSchema(schema)
+        # Precompile the URI routes used to parse every request
+        parse.get_routes(self.restschema)
         self.manager = OvsdbConnectionManager(self.settings.get('ovs_remote'),
                                               self.settings.get('ovs_schema'),
                                               self.restschema)
@@ -38,6 +42,16 @@ class OvsdbApiApplication(Application):
         # and replica is ready
         self.manager.start()
 
+        # Asynchronous declarative config writes
+        self.config_jobs = ConfigJobQueue(self.manager, self.restschema)
+
+        # The config DB replica serves the startup-config requests
+        self.cfg_manager = \
+            OvsdbConfigDbManager(self.settings.get('ovs_remote'),
+                                 self.settings.get('cfg_db_schema'),
+                                 None)
+        self.cfg_manager.start(register_tables=[constants.CFG_DB_CONFIG_TABLE])
+
         # Load all custom validators
         validator.init_plugins(constants.OPSPLUGIN_DIR)
 
@@ -0,0 +1,199 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import httplib
+import urllib
+
+import ovs.db.data
+import ovs.db.types
+from tornado import gen
+from tornado.log import app_log
+
+from opsrest.constants import *
+from opsrest.exceptions import APIException, DataValidationFailed, NotFound
+from opsrest.parse import parse_url_path, parse, split_path
+
+from opsrest import post, delete, put, patch
+
+
+class OperationBatch:
+    '''
+    Prepares the operations of a batch in a single transaction, through
+    the same code paths as the single resource requests. The IDL only
+    indexes committed rows, so the URIs of the rows created by earlier
+    operations are resolved from the rows the batch created.
+
+    A row inserted by a transaction only has the columns the POST set,
+    the other configuration columns of a row created by the batch are
+    set to their default value before a later operation reads it.
+    '''
+    def __init__(self, schema, idl, txn):
+        self.schema = schema
+        self.idl = idl
+        self.txn = txn
+
+        # (path, table, uuid) of the rows created by the batch, path
+        # being the split URI of the new row
+        self.created = []
+
+    @gen.coroutine
+    def prepare_all(self, operations):
+        '''
+        Prepares the operations in order until one fails. Returns the
+        result dictionary of each operation, with the Location of new
+        resources, and the position of the failed operation or None.
+        Operations not prepared are reported as failed dependencies.
+        '''
+        results = [{BATCH_KEY_STATUS: httplib.FAILED_DEPENDENCY}
+                   for operation in operations]
+
+        for index, operation in enumerate(operations):
+            try:
+                result = yield self.prepare_operation(operation)
+                if result.index is not None:
+                    results[index][BATCH_KEY_LOCATION] = \
+                        operation[BATCH_KEY_URI] + "/" + result.index
+            except APIException as e:
+                results[index][BATCH_KEY_STATUS] = e.status_code
+                results[index][BATCH_KEY_ERROR] = e.detail
+                raise gen.Return((results, index))
+
+        raise gen.Return((results, None))
+
+    @gen.coroutine
+    def prepare_operation(self, operation):
+        '''
+        Prepares the changes of an operation in the batch transaction.
+        '''
+        method = operation[BATCH_KEY_METHOD]
+        uri = operation[BATCH_KEY_URI]
+        data = operation[BATCH_KEY_BODY]
+
+        resource_path = self.parse_uri(uri, method)
+        if resource_path is None:
+            raise NotFound("Resource '%s' not found" % uri)
+
+        try:
+            if method == REQUEST_TYPE_CREATE:
+                result = post.post_resource(data, resource_path, self.schema,
+                                            self.txn, self.idl, False)
+            elif method == REQUEST_TYPE_UPDATE:
+                result = put.put_resource(data, resource_path, self.schema,
+                                          self.txn, self.idl, False)
+            elif method == REQUEST_TYPE_PATCH:
+                result = yield patch.patch_resource(data, resource_path,
+                                                    self.schema, self.txn,
+                                                    self.idl, uri, False)
+            else:
+                result = delete.delete_resource(resource_path, self.schema,
+                                                self.txn, self.idl, False)
+        except ValueError as e:
+            raise DataValidationFailed(str(e))
+
+        if result is None:
+            raise DataValidationFailed("Operation '%s' is not allowed on "
+                                       "'%s'" % (method, uri))
+
+        if method == REQUEST_TYPE_CREATE and result.row is not None:
+            self._add_created(uri, resource_path, result)
+
+        raise gen.Return(result)
+
+    def parse_uri(self, uri, method):
+        '''
+        Parses the uri of an operation, which may be the URI of a row
+        created by the batch or of one of its descendants.
+        '''
+        resource_path = parse_url_path(uri, self.schema, self.idl, method)
+        if resource_path is not None or not self.created:
+            return resource_path
+
+        # The closest row created by the batch the uri belongs to
+        path = split_path(uri)
+        created = None
+        for created_path, table, row_uuid in self.created:
+            if path[:len(created_path)] == created_path and \
+                    (created is None or len(created_path) > len(created[0])):
+                created = (created_path, table, row_uuid)
+
+        if created is None:
+            return None
+
+        created_path, table, row_uuid = created
+        if row_uuid not in self.idl.tables[table].rows:
+            # Deleted by a later operation
+            return None
+
+        index_length = max(len(self.schema.ovs_tables[table].indexes), 1)
+        collection_uri = '/' + '/'.join(
+            urllib.quote(item, safe='')
+            for item in created_path[:-index_length])
+
+        resource_path = self.parse_uri(collection_uri, REQUEST_TYPE_CREATE)
+        if resource_path is None:
+            return None
+
+        resource = resource_path
+        while resource.next.next is not None:
+            resource = resource.next
+
+        new_resource = resource.next
+        new_resource.row = row_uuid
+        new_resource.index = created_path[-index_length:]
+        self._set_defaults(table, self.idl.tables[table].rows[row_uuid])
+
+        try:
+            parse(path[len(created_path):], new_resource, self.schema,
+                  self.idl, method)
+        except Exception as e:
+            app_log.debug("Failed to parse %s: %s" % (uri, e))
+            return None
+
+        return resource_path
+
+    def _add_created(self, uri, resource_path, result):
+        table = resource_path
+        while table.next is not None:
+            table = table.next
+
+        # The Location of the row, split as its URIs are
+        path = split_path(uri)
+        indexes = self.schema.ovs_tables[table.table].indexes
+        if len(indexes) > 1:
+            path.extend(urllib.unquote(item)
+                        for item in result.index.split('/'))
+        else:
+            path.append(str(result.index))
+
+        self.created.append((path, table.table, result.row.uuid))
+
+    def _set_defaults(self, table, row):
+        table_schema = self.schema.ovs_tables[table]
+        columns = list(table_schema.config)
+        columns.extend(name for name, reference in
+                       table_schema.references.iteritems()
+                       if reference.category == OVSDB_SCHEMA_CONFIG)
+
+        for name in columns:
+            column = row._table.columns.get(name)
+            if column is None or name in row._changes:
+                continue
+
+            # Required references have no default
+            if column.type.key.type == ovs.db.types.UuidType and \
+                    column.type.n_min > 0:
+                continue
+
+            default = ovs.db.data.Datum.default(column.type)
+            row.__setattr__(name, default.to_python(None))
@@ -0,0 +1,172 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import sys
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+from tornado.log import app_log
+
+from opsrest.constants import INCOMPLETE, SUCCESS, UNCHANGED, \
+    WRITE_BATCH_WINDOW, WRITE_BATCH_MAX_SIZE
+
+
+class WriteBatcher:
+    '''
+    Merges the REST writes that arrive within WRITE_BATCH_WINDOW seconds
+    into a single transaction. Writes sharing a key, e.g. changing the
+    same row, are never merged, the later ones wait for the next batch.
+    When a write of the batch fails, or the batch commit does not
+    succeed, the writes are retried one at a time in their own
+    transaction so each one gets its own status. When the batch commit
+    raises, all its writes fail with the exception.
+    '''
+    def __init__(self, manager):
+        self.manager = manager
+
+        # (get_keys, apply, Future) of the writes waiting for a batch
+        self._pending = []
+        self._running = False
+
+    def write(self, apply, get_keys=None):
+        '''
+        Queues a write. apply(txn, commit) prepares the changes of the
+        write in txn, without committing when commit is False, and
+        returns its OvsdbTransactionResult. It may be called more than
+        once if the write is retried. get_keys() returns the set of keys
+        of what the write changes and is called when the batch is
+        formed, right before the writes are applied. Without keys a
+        write never conflicts with other writes. Returns a Future of the
+        result and the transaction that committed the write.
+        '''
+        future = Future()
+        self._pending.append((get_keys, apply, future))
+
+        if not self._running:
+            self._running = True
+            IOLoop.current().call_later(WRITE_BATCH_WINDOW, self._run)
+
+        return future
+
+    @gen.coroutine
+    def _run(self):
+        try:
+            # Writes queued while a batch commits form the next batch
+            while self._pending:
+                batch = self._next_batch()
+                try:
+                    yield self._commit_batch(batch)
+                except Exception as e:
+                    app_log.error("Batch commit failed: %s" % e)
+                    exc_info = sys.exc_info()
+                    for get_keys, apply, future in batch:
+                        if not future.done():
+                            future.set_exc_info(exc_info)
+        finally:
+            self._running = False
+
+    def _next_batch(self):
+        batch = []
+        deferred = []
+        keys = set()
+
+        for write in self._pending:
+            if len(batch) >= WRITE_BATCH_MAX_SIZE:
+                deferred.append(write)
+                continue
+
+            write_keys = self._get_keys(write[0])
+            if keys.isdisjoint(write_keys):
+                keys.update(write_keys)
+                batch.append(write)
+            else:
+                deferred.append(write)
+
+        self._pending = deferred
+        return batch
+
+    def _get_keys(self, get_keys):
+        if get_keys is None:
+            return ()
+
+        try:
+            return get_keys()
+        except Exception as e:
+            # The write fails the same way when applied, and the batch
+            # falls back to one transaction per write
+            app_log.debug("Failed to get the keys of a write: %s" % e)
+            return ()
+
+    @gen.coroutine
+    def _commit_batch(self, batch):
+        if len(batch) > 1:
+            app_log.debug("Committing %d writes in one transaction.."
+                          % len(batch))
+
+            txn = self.manager.get_new_transaction()
+            try:
+                results = []
+                for get_keys, apply, future in batch:
+                    updates = txn.get_updates()
+                    result = yield gen.maybe_future(apply(txn, False))
+
+                    # A write changing nothing by itself stays UNCHANGED
+                    # when the rest of the batch changes rows
+                    unchanged = txn.get_updates() <= updates
+                    results.append((result, unchanged))
+            except Exception as e:
+                app_log.debug("Batched write failed: %s" % e)
+                txn.abort()
+            else:
+                try:
+                    status = yield self._commit(txn)
+                except Exception:
+                    # The writes may have been sent, they are not retried
+                    txn.abort()
+                    raise
+
+                if status in (SUCCESS, UNCHANGED):
+                    for (get_keys, apply, future), (result, unchanged) in \
+                            zip(batch, results):
+                        result.status = UNCHANGED if unchanged else status
+                        future.set_result((result, txn))
+                    return
+
+                app_log.debug("Batch commit status: %s" % status)
+
+        for get_keys, apply, future in batch:
+            yield self._commit_one(apply, future)
+
+    @gen.coroutine
+    def _commit_one(self, apply, future):
+        txn = self.manager.get_new_transaction()
+        try:
+            result = yield gen.maybe_future(apply(txn, False))
+            result.status = yield self._commit(txn)
+        except Exception:
+            txn.abort()
+            future.set_exc_info(sys.exc_info())
+        else:
+            future.set_result((result, txn))
+
+    @gen.coroutine
+    def _commit(self, txn):
+        status = txn.commit()
+        if status == INCOMPLETE:
+            self.manager.monitor_transaction(txn)
+            yield txn.event.wait()
+            status = txn.status
+
+        raise gen.Return(status)
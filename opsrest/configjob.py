@@ -0,0 +1,231 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+from tornado.log import app_log
+
+import ops.dc
+from opsrest.constants import *
+
+
+def run_in_thread(func, *args):
+    '''
+    Runs func in a worker thread and returns a Future of its result,
+    resolved on the IOLoop. func must not use the IDL.
+    '''
+    future = Future()
+    io_loop = IOLoop.current()
+
+    def run():
+        try:
+            result = func(*args)
+        except Exception:
+            io_loop.add_callback(future.set_exc_info, sys.exc_info())
+        else:
+            io_loop.add_callback(future.set_result, result)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return future
+
+
+class ConfigJob:
+    '''
+    An asynchronous apply of a declarative running configuration.
+    '''
+    def __init__(self, job_id, data):
+        self.id = job_id
+        self.data = data
+        self.state = CONFIG_JOB_STATE_QUEUED
+        self.status = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def get_uri(self):
+        return CONFIG_JOBS_URI + '/' + self.id
+
+    def is_finished(self):
+        return self.state in (CONFIG_JOB_STATE_COMPLETED,
+                              CONFIG_JOB_STATE_FAILED)
+
+    def finish(self, status, error=None):
+        self.status = status
+        if status in (SUCCESS, UNCHANGED):
+            self.state = CONFIG_JOB_STATE_COMPLETED
+        else:
+            self.state = CONFIG_JOB_STATE_FAILED
+            self.error = str(error) if error is not None else None
+
+        self.finished = time.time()
+        self.data = None
+
+    def to_json(self):
+        return {'id': self.id,
+                'uri': self.get_uri(),
+                'state': self.state,
+                'status': self.status,
+                'error': self.error,
+                'submitted': self.submitted,
+                'started': self.started,
+                'finished': self.finished}
+
+
+class ConfigJobQueue:
+    '''
+    Applies the submitted configurations one at a time, in order. The
+    diff with the running configuration, the bulk of the work for large
+    configurations, runs in a worker thread on a snapshot of the running
+    configuration. The IDL can only be used on the IOLoop: the snapshot
+    is taken from the running configuration cache, whose missing rows
+    are first read one top-level row per IOLoop iteration. If the
+    running configuration changes during the diff, a new snapshot is
+    diffed, up to CONFIG_JOB_MAX_DIFFS times.
+
+    Only the changed rows are then set up, validated and committed on
+    the IOLoop; an IDL transaction can not stay open across IOLoop
+    iterations and the validators read the rows of the transaction, so
+    that part runs in a single callback. The last
+    CONFIG_JOBS_MAX_FINISHED finished jobs are kept for querying.
+    '''
+    def __init__(self, manager, restschema):
+        self.manager = manager
+        self.restschema = restschema
+        self.jobs = OrderedDict()
+
+        self._queue = []
+        self._next_id = 1
+        self._running = False
+
+    def submit(self, data):
+        job = ConfigJob(str(self._next_id), data)
+        self._next_id += 1
+        self.jobs[job.id] = job
+        self._queue.append(job)
+
+        if not self._running:
+            self._running = True
+            IOLoop.current().add_callback(self._run)
+
+        return job
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def get_jobs(self):
+        return self.jobs.values()
+
+    def _expire(self):
+        finished = [job_id for job_id, job in self.jobs.iteritems()
+                    if job.is_finished()]
+        for job_id in finished[:max(0, len(finished) -
+                                    CONFIG_JOBS_MAX_FINISHED)]:
+            del self.jobs[job_id]
+
+    @gen.coroutine
+    def _run(self):
+        try:
+            while self._queue:
+                yield self._run_job(self._queue.pop(0))
+        finally:
+            self._running = False
+
+    @gen.coroutine
+    def _run_job(self, job):
+        job.started = time.time()
+        try:
+            (status, error) = yield self._apply(job)
+        except Exception as e:
+            (status, error) = (ERROR, e)
+
+        app_log.debug("Config job %s result: %s" % (job.id, status))
+        job.finish(status, error)
+        self._expire()
+
+    def _check_connected(self, idl):
+        if not self.manager.connected or self.manager.idl is not idl:
+            raise Exception("OVSDB is not connected")
+
+    @gen.coroutine
+    def _read_running_config(self):
+        '''
+        Returns a snapshot of the running configuration, plain data
+        shared with the cache that is not modified afterwards.
+        '''
+        manager = self.manager
+        idl = manager.idl
+        for _ in ops.dc.fill_cache(self.restschema, idl,
+                                   manager.config_cache):
+            yield gen.moment
+            self._check_connected(idl)
+
+        # Only the rows changed since the last iteration are read
+        running_config = ops.dc.read(self.restschema, idl,
+                                     manager.config_cache)
+        if isinstance(running_config, Exception):
+            raise running_config
+
+        raise gen.Return(running_config)
+
+    @gen.coroutine
+    def _apply(self, job):
+        manager = self.manager
+        cache = manager.config_cache
+        idl = manager.idl
+        self._check_connected(idl)
+
+        job.state = CONFIG_JOB_STATE_DIFFING
+        for attempt in range(CONFIG_JOB_MAX_DIFFS):
+            running_config = yield self._read_running_config()
+            generation = cache.generation
+            unchanged = yield run_in_thread(ops.dc.diff, job.data,
+                                            running_config)
+            self._check_connected(idl)
+
+            # The diff is stale if the running config changed meanwhile
+            if cache.generation == generation:
+                break
+        else:
+            # Every row is set up, as without a diff
+            app_log.debug("Running config changed during every diff of "
+                          "config job %s" % job.id)
+            unchanged = set()
+
+        job.state = CONFIG_JOB_STATE_APPLYING
+        txn = manager.get_new_transaction()
+        (status, error) = ops.dc.write(job.data, self.restschema,
+                                       manager.idl, txn.txn, cache=cache,
+                                       unchanged=unchanged)
+
+        if status == INCOMPLETE:
+            job.state = CONFIG_JOB_STATE_COMMITTING
+            manager.monitor_transaction(txn)
+            yield txn.event.wait()
+            status = txn.status
+            if status == ERROR:
+                error = txn.get_error()
+
+        if status not in (SUCCESS, UNCHANGED):
+            txn.abort()
+
+        raise gen.Return((status, error))
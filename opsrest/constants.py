@@ -20,6 +20,9 @@ OVSDB_STATUS_DISCONNECTED = 1
 OVSDB_STATUS_CONNECTED = 2
 OVSDB_DEFAULT_CONNECTION_TIMEOUT = 1.0
 
+# Maximum number of row JSON representations kept for GET requests
+ROW_JSON_CACHE_MAX_ENTRIES = 8192
+
 # All IDL Transaction states
 UNCOMMITTED = Transaction.UNCOMMITTED
 UNCHANGED = Transaction.UNCHANGED
@@ -40,6 +43,35 @@ REST_QUERY_PARAM_OFFSET = 'offset'
 REST_QUERY_PARAM_LIMIT = 'limit'
 REST_QUERY_PARAM_DEPTH = "depth"
 REST_QUERY_PARAM_KEYS = 'keys'
+REST_QUERY_PARAM_CURSOR = 'cursor'
+REST_QUERY_PARAM_MAX_AGE = 'max-age'
+
+# Page size of cursor pagination when no limit is given
+CURSOR_DEFAULT_LIMIT = 100
+CURSOR_NEXT = 'next'
+CURSOR_PREV = 'prev'
+
+# Seconds the on demand fetched read-only columns of a row are reused
+# by GET requests before they are fetched again. Requests may ask for a
+# different window, up to the limit, with the max-age query argument or
+# the Cache-Control header
+READONLY_FETCH_DEFAULT_MAX_AGE = 1
+READONLY_FETCH_MAX_AGE_LIMIT = 60
+
+# With write batching enabled, writes arriving within this many seconds
+# are committed in one transaction of at most WRITE_BATCH_MAX_SIZE writes
+WRITE_BATCH_WINDOW = 0.005
+WRITE_BATCH_MAX_SIZE = 100
+
+# Batch endpoint operations and results
+BATCH_MAX_OPERATIONS = 1000
+BATCH_KEY_METHOD = 'method'
+BATCH_KEY_URI = 'uri'
+BATCH_KEY_BODY = 'body'
+BATCH_KEY_RESULTS = 'results'
+BATCH_KEY_STATUS = 'status'
+BATCH_KEY_LOCATION = 'location'
+BATCH_KEY_ERROR = 'error'
 
 # Recursive GET argument depth max value
 # Set to 10 to prevent a stack overflow
@@ -49,6 +81,9 @@ DEPTH_MAX_VALUE = 10
 # Set to 1MB to avoid idl overload
 MAX_BODY_SIZE = 1000000
 
+# Collection GETs with depth of at least this many rows are streamed
+GET_STREAMING_MIN_ROWS = 128
+
 # Ovsdb schema constants
 OVSDB_SCHEMA_SYSTEM_TABLE = 'System'
 OVSDB_SCHEMA_SYSTEM_URI = 'system'
@@ -79,6 +114,7 @@ HTTP_HEADER_CONTENT_TYPE = 'Content-Type'
 HTTP_HEADER_CONTENT_LENGTH = 'Content-Length'
 HTTP_HEADER_ALLOW = 'Allow'
 HTTP_HEADER_LOCATION = "Location"
+HTTP_HEADER_CACHE_CONTROL = 'Cache-Control'
 
 HTTP_HEADER_CONDITIONAL_IF_MATCH = 'If-Match'
 HTTP_HEADER_ETAG = 'Etag'
@@ -143,6 +179,19 @@ OPSPLUGIN_DIR = '/usr/share/opsplugins'
 # Declarative Config
 CONFIG_TYPE_RUNNING = "running"
 CONFIG_TYPE_STARTUP = "startup"
+CFG_DB_CONFIG_TABLE = "config"
+
+# Asynchronous declarative config apply jobs
+REST_QUERY_PARAM_ASYNC = 'async'
+CONFIG_JOBS_URI = '/rest/v1/system/full-configuration/jobs'
+CONFIG_JOBS_MAX_FINISHED = 20
+CONFIG_JOB_MAX_DIFFS = 3
+CONFIG_JOB_STATE_QUEUED = 'queued'
+CONFIG_JOB_STATE_DIFFING = 'diffing'
+CONFIG_JOB_STATE_APPLYING = 'applying'
+CONFIG_JOB_STATE_COMMITTING = 'committing'
+CONFIG_JOB_STATE_COMPLETED = 'completed'
+CONFIG_JOB_STATE_FAILED = 'failed'
 
 # PATCH operation's keys according to RFC 6902
 PATCH_KEY_OP = 'op'
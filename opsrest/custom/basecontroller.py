@@ -19,6 +19,18 @@ from opsrest.patch import create_patch, apply_patch
 from tornado import gen
 
 
+class AcceptedUpdate:
+    """
+    Returned by update, or patch, when the update continues
+    asynchronously. data is the JSON of the resource tracking it, found
+    at uri.
+    """
+
+    def __init__(self, uri, data):
+        self.uri = uri
+        self.data = data
+
+
 class BaseController():
     """
     BaseController base controller class with generic
@@ -84,9 +96,13 @@ class BaseController():
             # Update resource only if needed, since a valid
             # patch can contain PATCH_OP_TEST operations
             # only, which do not modify the resource
+            result = None
             if needs_update:
-                yield self.update(item_id, patched_resource, current_user, query_args)
+                result = yield self.update(item_id, patched_resource,
+                                           current_user, query_args)
 
         # In case the resource doesn't implement GET/PUT
         except MethodNotAllowed:
             raise MethodNotAllowed("PATCH not allowed on resource")
+
+        raise gen.Return(result)
@@ -21,9 +21,10 @@ import ops.cfgd
 from opsrest.exceptions import DataValidationFailed,\
     NotModified, InternalError, NotFound, APIException
 from opsrest.transaction import OvsdbTransactionResult
-from opsrest.custom.basecontroller import BaseController
+from opsrest.custom.basecontroller import BaseController, AcceptedUpdate
 from opsrest.constants import CONFIG_TYPE_RUNNING,\
-    CONFIG_TYPE_STARTUP, SUCCESS, UNCHANGED, INCOMPLETE, ERROR
+    CONFIG_TYPE_STARTUP, SUCCESS, UNCHANGED, INCOMPLETE, ERROR,\
+    REST_QUERY_PARAM_ASYNC
 
 
 class ConfigController(BaseController):
@@ -35,33 +36,39 @@ class ConfigController(BaseController):
 
     @gen.coroutine
     def update(self, item_id, data, current_user, query_args):
+        if self.is_async(query_args):
+            raise gen.Return(self.submit_job(data, query_args))
+
         try:
             request_type = self.get_request_type(query_args)
             self.check_config_type(request_type)
             status = None
             error = None
             if request_type == CONFIG_TYPE_RUNNING:
-                self.txn = self.context.manager.get_new_transaction()
+                manager = self.context.manager
+                self.txn = manager.get_new_transaction()
                 (status, error) = ops.dc.write(data, self.schema,
-                                               self.idl, self.txn.txn)
-                app_log.debug('Transaction result: %s', status)
-
-                if status == INCOMPLETE:
-                    self.context.manager.monitor_transaction(self.txn)
-                    yield self.txn.event.wait()
-                    status = self.txn.status
-                    if status == ERROR:
-                        error = self.txn.get_error()
+                                               self.idl, self.txn.txn,
+                                               cache=manager.config_cache)
             else:
-                # FIXME: This is a blocking call.
-                (status, error) = ops.cfgd.write(data)
+                manager = self.get_cfg_manager()
+                self.txn = manager.get_new_transaction()
+                (status, error) = ops.cfgd.write(data, manager.idl,
+                                                 self.txn.txn)
+            app_log.debug('Transaction result: %s', status)
+
+            if status == INCOMPLETE:
+                manager.monitor_transaction(self.txn)
+                yield self.txn.event.wait()
+                status = self.txn.status
+                if status == ERROR:
+                    error = self.txn.get_error()
 
             if status != SUCCESS:
                 if status == UNCHANGED:
                     raise NotModified
                 else:
-                    if request_type == CONFIG_TYPE_RUNNING:
-                        self.txn.abort()
+                    self.txn.abort()
                     raise APIException("Error: %s" % error)
 
         except Exception as e:
@@ -75,10 +82,10 @@ class ConfigController(BaseController):
         self.check_config_type(request_type)
         result = None
         if request_type == CONFIG_TYPE_RUNNING:
-            result = ops.dc.read(self.schema, self.idl)
+            result = ops.dc.read(self.schema, self.idl,
+                                 self.context.manager.config_cache)
         else:
-            # FIXME: This is a blocking call
-            result = ops.cfgd.read()
+            result = ops.cfgd.read(self.get_cfg_manager().idl)
         if result is None:
             if request_type == CONFIG_TYPE_RUNNING:
                 raise InternalError
@@ -86,12 +93,35 @@ class ConfigController(BaseController):
                 raise NotFound
         return result
 
+    def is_async(self, query_args):
+        if not query_args or REST_QUERY_PARAM_ASYNC not in query_args:
+            return False
+        return query_args[REST_QUERY_PARAM_ASYNC][0].lower() == 'true'
+
+    def submit_job(self, data, query_args):
+        request_type = self.get_request_type(query_args)
+        self.check_config_type(request_type)
+        if request_type != CONFIG_TYPE_RUNNING:
+            raise DataValidationFailed("Only the %s configuration can be "
+                                       "written asynchronously" %
+                                       CONFIG_TYPE_RUNNING)
+
+        job = self.context.config_jobs.submit(data)
+        app_log.debug('Submitted config job %s', job.id)
+        return AcceptedUpdate(job.get_uri(), job.to_json())
+
+    def get_cfg_manager(self):
+        cfg_manager = self.context.cfg_manager
+        if not cfg_manager.connected:
+            raise InternalError("Config DB is not available")
+        return cfg_manager
+
     def get_request_type(self, query_args):
         app_log.debug('Query args: %s', query_args)
         if not query_args:
             return CONFIG_TYPE_RUNNING
         else:
-            typearg = query_args.get("type", CONFIG_TYPE_RUNNING)
+            typearg = query_args.get("type", [CONFIG_TYPE_RUNNING])
             return typearg[0]
 
     def check_config_type(self, request_type):
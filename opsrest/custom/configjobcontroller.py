@@ -0,0 +1,41 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+from tornado import gen
+
+# Local imports
+from opsrest.exceptions import NotFound
+from opsrest.custom.basecontroller import BaseController
+
+
+class ConfigJobController(BaseController):
+    """
+    Progress and results of the asynchronous full-configuration
+    writes, i.e. PUT full-configuration?async=true
+    """
+
+    def initialize(self):
+        self.jobs = self.context.config_jobs
+
+    @gen.coroutine
+    def get(self, item_id, current_user=None, selector=None,
+            query_args=None):
+        job = self.jobs.get_job(item_id)
+        if job is None:
+            raise NotFound
+        raise gen.Return(job.to_json())
+
+    @gen.coroutine
+    def get_all(self, current_user=None, selector=None, query_args=None):
+        raise gen.Return([job.to_json() for job in self.jobs.get_jobs()])
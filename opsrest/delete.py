@@ -25,7 +25,7 @@ import httplib
 from tornado.log import app_log
 
 
-def delete_resource(resource, schema, txn, idl):
+def delete_resource(resource, schema, txn, idl, commit=True):
 
     if resource.next is None:
         return None
@@ -72,19 +72,11 @@ def delete_resource(resource, schema, txn, idl):
 
     elif resource.relation == OVSDB_SCHEMA_BACK_REFERENCE:
         if resource.next.row is None:
-            refcol = None
             parent = idl.tables[resource.table].rows[resource.row]
-            refkeys = schema.ovs_tables[resource.next.table].references
-            for key, value in refkeys.iteritems():
-                if (value.relation == OVSDB_SCHEMA_PARENT and
-                        value.ref_table == resource.table):
-                    refcol = key
-                    break
-
-            children = []
-            for row in idl.tables[resource.next.table].rows.itervalues():
-                if row.__getattr__(refcol) == parent:
-                    children.append(row.uuid)
+            rows = utils.get_back_reference_children(parent, resource.table,
+                                                     resource.next.table,
+                                                     schema, idl)
+            children = [row.uuid for row in rows or []]
 
             for child in children:
                 row = idl.tables[resource.next.table].rows[child]
@@ -102,5 +94,5 @@ def delete_resource(resource, schema, txn, idl):
             if schema.ovs_tables[resource_table].is_root:
                 row.delete()
 
-    result = txn.commit()
+    result = txn.commit() if commit else UNCOMMITTED
     return OvsdbTransactionResult(result)
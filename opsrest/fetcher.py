@@ -0,0 +1,155 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import time
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.log import app_log
+
+from opsrest.constants import INCOMPLETE, SUCCESS, UNCHANGED, \
+    READONLY_FETCH_DEFAULT_MAX_AGE, READONLY_FETCH_MAX_AGE_LIMIT
+from opslib.restparser import ON_DEMAND_FETCHED_TABLES
+
+
+class ReadOnlyFetcher:
+    '''
+    Fetches the read-only columns of the ON_DEMAND_FETCHED_TABLES rows
+    from the DB. All the rows given to fetch are requested in a single
+    transaction. Rows, or whole tables, that are already being fetched
+    by another request are not requested again, the request waits for
+    the fetch in flight instead. Rows fetched less than max_age seconds
+    ago keep the values of the last fetch.
+    '''
+    def __init__(self, manager):
+        self.manager = manager
+
+        # (table, uuid) to Future of the fetch in flight, uuid is None
+        # when all the rows of the table are fetched
+        self._in_flight = {}
+
+        # (table, uuid) to the time of the last successful fetch
+        self._fetched = {}
+        self._last_expire = time.time()
+
+    def clear(self):
+        '''
+        Forgets the fetch times, the rows of a new IDL have no
+        read-only values.
+        '''
+        self._fetched = {}
+
+    def _expire(self, now):
+        if now - self._last_expire < READONLY_FETCH_MAX_AGE_LIMIT:
+            return
+
+        self._last_expire = now
+        for key, fetched_at in self._fetched.items():
+            if now - fetched_at >= READONLY_FETCH_MAX_AGE_LIMIT:
+                del self._fetched[key]
+
+    def _is_fresh(self, key, now, max_age):
+        fetched_at = self._fetched.get(key)
+        return fetched_at is not None and now - fetched_at < max_age
+
+    @gen.coroutine
+    def fetch(self, schema, rows_by_table, max_age=None):
+        '''
+        Fetches the read-only columns of the rows of each table of the
+        rows_by_table dictionary. A value of None fetches all the rows
+        of the table. Rows fetched less than max_age seconds ago, by
+        default READONLY_FETCH_DEFAULT_MAX_AGE, are not fetched again.
+        '''
+        if max_age is None:
+            max_age = READONLY_FETCH_DEFAULT_MAX_AGE
+        max_age = min(max_age, READONLY_FETCH_MAX_AGE_LIMIT)
+
+        now = time.time()
+        self._expire(now)
+
+        waits = set()
+        fetch_tables = []
+        fetch_rows = []
+
+        for table, rows in rows_by_table.iteritems():
+            if table not in ON_DEMAND_FETCHED_TABLES:
+                continue
+
+            readonly_columns = schema.ovs_tables[table].readonly_columns
+            if not readonly_columns:
+                continue
+
+            table_fetch = self._in_flight.get((table, None))
+            if table_fetch is not None:
+                waits.add(table_fetch)
+            elif self._is_fresh((table, None), now, max_age):
+                continue
+            elif rows is None:
+                fetch_tables.append((table, readonly_columns))
+            else:
+                for row in rows:
+                    row_fetch = self._in_flight.get((table, row.uuid))
+                    if row_fetch is not None:
+                        waits.add(row_fetch)
+                    elif not self._is_fresh((table, row.uuid), now,
+                                            max_age):
+                        fetch_rows.append((table, row, readonly_columns))
+
+        if fetch_tables or fetch_rows:
+            txn = self.manager.get_new_transaction()
+            fetch_keys = []
+
+            for table, readonly_columns in fetch_tables:
+                for column in readonly_columns:
+                    txn.txn.fetch_table(table, column)
+                fetch_keys.append((table, None))
+
+            for table, row, readonly_columns in fetch_rows:
+                for column in readonly_columns:
+                    row.fetch(column)
+                fetch_keys.append((table, row.uuid))
+
+            yield self._run(txn, fetch_keys)
+
+        if waits:
+            yield list(waits)
+
+    @gen.coroutine
+    def _run(self, txn, fetch_keys):
+        app_log.debug("Fetching read-only columns of %d rows.."
+                      % len(fetch_keys))
+
+        done = Future()
+        for key in fetch_keys:
+            self._in_flight[key] = done
+
+        try:
+            started = time.time()
+            status = txn.commit()
+            if status == INCOMPLETE:
+                self.manager.monitor_transaction(txn)
+                yield txn.event.wait()
+                status = txn.status
+
+            app_log.debug("Fetching status: %s" % status)
+
+            if status in (SUCCESS, UNCHANGED):
+                for key in fetch_keys:
+                    self._fetched[key] = started
+
+        finally:
+            for key in fetch_keys:
+                if self._in_flight.get(key) is done:
+                    del self._in_flight[key]
+            done.set_result(None)
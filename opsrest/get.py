@@ -18,13 +18,17 @@ from opsrest.constants import *
 from opsrest.utils import utils
 from opsrest.utils import getutils
 from opsrest import verify
+from opslib.restparser import ON_DEMAND_FETCHED_TABLES
 from opsrest.exceptions import (
     InternalError,
     TransactionFailed
 )
 
 import httplib
+import json
 import types
+import urllib
+import uuid
 
 from tornado.log import app_log
 from tornado import gen
@@ -33,7 +37,8 @@ from tornado import gen
 @gen.coroutine
 def get_resource(idl, resource, schema, uri=None,
                  selector=None, query_arguments=None,
-                 fetch_readonly=False, manager=None):
+                 fetch_readonly=False, manager=None, links=None,
+                 max_age=None):
 
     depth = getutils.get_depth_param(query_arguments)
 
@@ -70,8 +75,9 @@ def get_resource(idl, resource, schema, uri=None,
         # Fetch all read-only columns prior to retrieving row data
         if fetch_readonly and manager:
             row = idl.tables[resource.table].rows[resource.row]
-            yield utils.fetch_readonly_columns(schema, resource.table,
-                                               idl, manager, [row])
+            yield fetch_readonly_rows([row], resource.table, schema, idl,
+                                      manager, selector, depth,
+                                      max_age=max_age)
 
         result = yield get_row_json(resource.row, resource.table, schema,
                                     idl, uri, selector, depth,
@@ -82,7 +88,8 @@ def get_resource(idl, resource, schema, uri=None,
         # Other tables
         result = yield get_resource_from_db(resource, schema, idl, uri,
                                             selector, query_arguments, depth,
-                                            fetch_readonly, manager)
+                                            fetch_readonly, manager, links,
+                                            max_age)
         raise gen.Return(result)
 
 
@@ -90,7 +97,8 @@ def get_resource(idl, resource, schema, uri=None,
 @gen.coroutine
 def get_resource_from_db(resource, schema, idl, uri,
                          selector=None, query_arguments=None,
-                         depth=0, fetch_readonly=False, manager=None):
+                         depth=0, fetch_readonly=False, manager=None,
+                         links=None, max_age=None):
 
     resource_result = None
 
@@ -126,19 +134,43 @@ def get_resource_from_db(resource, schema, idl, uri,
     app_log.debug("Offset % s" % offset)
     app_log.debug("Keys % s" % keys_args)
 
+    if is_collection and REST_QUERY_PARAM_CURSOR in pagination_args:
+        resource_result = yield get_cursor_page_json(resource, schema, idl,
+                                                     uri, selector, depth,
+                                                     sorting_args,
+                                                     filter_args,
+                                                     pagination_args,
+                                                     keys_args,
+                                                     query_arguments,
+                                                     fetch_readonly, manager,
+                                                     links, max_age)
+        raise gen.Return(resource_result)
+
+    # Filter, sort and paginate before serializing when possible
+    if is_collection and depth and (sorting_args or filter_args or
+                                    keys_args or offset is not None or
+                                    limit is not None):
+        resource_result = yield get_planned_collection_json(
+            resource, schema, idl, uri, selector, depth, sorting_args,
+            filter_args, offset, limit, keys_args, fetch_readonly, manager,
+            max_age)
+
+        if resource_result is not None:
+            raise gen.Return(resource_result)
+
     # Get the resource result according to result type
     if is_collection:
         resource_result = yield get_collection_json(resource, schema, idl, uri,
                                                     selector, depth,
                                                     fetch_readonly,
-                                                    manager)
+                                                    manager, max_age)
     else:
         # Fetch all read-only columns prior to retrieving row data
         if fetch_readonly and manager:
             row = idl.tables[resource.next.table].rows[resource.next.row]
-            yield utils.fetch_readonly_columns(schema,
-                                               resource.next.table,
-                                               idl, manager, [row])
+            yield fetch_readonly_rows([row], resource.next.table, schema,
+                                      idl, manager, selector, depth,
+                                      max_age=max_age)
 
         resource_result = yield get_row_json(resource.next.row,
                                              resource.next.table,
@@ -159,21 +191,398 @@ def get_resource_from_db(resource, schema, idl, uri,
     raise gen.Return(resource_result)
 
 
+@gen.coroutine
+def get_planned_collection_json(resource, schema, idl, uri, selector, depth,
+                                sorting_args, filter_args, offset, limit,
+                                keys_args, fetch_readonly=False,
+                                manager=None, max_age=None):
+    """
+    Returns the page of a top-level or back referenced collection with
+    only the selected rows and columns serialized, or None if the query
+    cannot be planned and post_process_get_data must be used instead.
+    """
+    rows = get_collection_rows(resource, schema, idl)
+    if rows is None:
+        raise gen.Return(None)
+
+    # Empty collections are not post-processed
+    if not rows:
+        raise gen.Return([])
+
+    table = resource.next.table
+    db_rows = idl.tables[table].rows
+    rows = [db_rows[row] for row in rows]
+
+    fetch_all = yield _fetch_plan_columns(resource, schema, idl, rows,
+                                          filter_args.keys() +
+                                          sorting_args[:-1],
+                                          fetch_readonly, manager, max_age)
+
+    selected = getutils.plan_collection_rows(rows, table, schema, selector,
+                                             sorting_args, filter_args,
+                                             offset, limit)
+    if selected is None or isinstance(selected, dict):
+        raise gen.Return(selected)
+
+    if fetch_readonly and manager and (not fetch_all or depth > 1):
+        yield fetch_readonly_rows(selected, table, schema, idl, manager,
+                                  selector, depth, max_age=max_age)
+
+    resources_list = []
+    for row in selected:
+        json_row = yield get_row_json(row.uuid, table, schema, idl, uri,
+                                      selector, depth,
+                                      fetch_readonly=fetch_readonly,
+                                      manager=manager,
+                                      columns=keys_args or None)
+        resources_list.append(json_row)
+
+    raise gen.Return(resources_list)
+
+
+@gen.coroutine
+def _fetch_plan_columns(resource, schema, idl, rows, columns,
+                        fetch_readonly=False, manager=None, max_age=None):
+    """
+    Fetches the read-only columns of the collection rows when the
+    query planner needs one of the given columns. Returns True if
+    the columns were fetched.
+    """
+    table = resource.next.table
+    if not fetch_readonly or not manager or \
+            table not in ON_DEMAND_FETCHED_TABLES:
+        raise gen.Return(False)
+
+    readonly_columns = schema.ovs_tables[table].readonly_columns
+    if not [column for column in columns if column in readonly_columns]:
+        raise gen.Return(False)
+
+    if resource.relation is OVSDB_SCHEMA_TOP_LEVEL:
+        yield utils.fetch_readonly_columns_for_table(schema, table, idl,
+                                                     manager, max_age)
+    else:
+        yield utils.fetch_readonly_columns(schema, table, idl, manager, rows,
+                                           max_age)
+
+    raise gen.Return(True)
+
+
+@gen.coroutine
+def get_cursor_page_json(resource, schema, idl, uri, selector, depth,
+                         sorting_args, filter_args, pagination_args,
+                         keys_args, query_arguments, fetch_readonly=False,
+                         manager=None, links=None, max_age=None):
+    """
+    Returns the page of a top-level or back referenced collection at
+    the position of the cursor query argument. Rows are ordered by the
+    sort columns, or by index columns when there is no sort argument,
+    and then by UUID. The page is found by seeking the sorted keys the
+    IDL keeps for the collection, instead of sorting and slicing the
+    rows, so pages stay consistent when rows are added or removed
+    before the cursor. Only sorting by read-only columns, which are
+    fetched on demand, sorts the rows on each request.
+
+    The URIs of the previous and next pages are appended to links as
+    Link header values.
+    """
+    if resource.relation not in (OVSDB_SCHEMA_TOP_LEVEL,
+                                 OVSDB_SCHEMA_BACK_REFERENCE):
+        error_json = utils.to_json_error("Pagination cursor is only " +
+                                         "supported for top-level and " +
+                                         "back referenced collections",
+                                         None, REST_QUERY_PARAM_CURSOR)
+        raise gen.Return({ERROR: error_json})
+
+    table = resource.next.table
+    db_rows = idl.tables[table].rows
+    sort_columns = sorting_args[:-1]
+    reverse_sort = bool(sorting_args) and sorting_args[-1]
+
+    columns = getutils.get_plan_columns(table, schema, selector,
+                                        filter_args.keys() + sort_columns)
+    if columns is None:
+        error_json = utils.to_json_error("Pagination cursor can't be used " +
+                                         "to sort or filter by reference " +
+                                         "columns", None,
+                                         REST_QUERY_PARAM_CURSOR)
+        raise gen.Return({ERROR: error_json})
+
+    rows = None
+    parent_uuid = None
+    if resource.relation is OVSDB_SCHEMA_BACK_REFERENCE:
+        parent = idl.tables[resource.table].rows[resource.row]
+        rows = utils.get_back_reference_children(parent, resource.table,
+                                                 table, schema, idl)
+        if rows is None:
+            raise gen.Return(None)
+        parent_uuid = parent.uuid
+
+    fetch_all = yield _fetch_plan_columns(resource, schema, idl, rows,
+                                          columns.keys(), fetch_readonly,
+                                          manager, max_age)
+
+    readonly_columns = schema.ovs_tables[table].readonly_columns
+    if [column for column in sort_columns if column in readonly_columns]:
+        # Their values change without IDL updates
+        if rows is None:
+            rows = db_rows.values()
+        keys = sorted((getutils.get_cursor_sort_key(
+            getutils.get_row_plan_values(row, columns), sort_columns),
+            str(row.uuid)) for row in rows)
+    else:
+        order = None
+        if sort_columns:
+            order = _get_cursor_sort_order(sort_columns, columns, selector)
+        keys = idl.sorted_index_lookup(table, parent_uuid, order)
+
+    def accept(key):
+        row = db_rows.get(uuid.UUID(key[-1]))
+        if row is None:
+            return False
+        if filter_args:
+            values = getutils.get_row_plan_values(row, columns)
+            return getutils.filter_get_results([values], filter_args,
+                                               schema, table)
+        return True
+
+    limit = pagination_args.get(REST_QUERY_PARAM_LIMIT)
+    if limit is None:
+        limit = CURSOR_DEFAULT_LIMIT
+
+    page, prev_key, next_key = \
+        getutils.seek_cursor_page(keys,
+                                  pagination_args[REST_QUERY_PARAM_CURSOR],
+                                  limit, reverse_sort, accept)
+
+    selected = [db_rows[uuid.UUID(key[-1])] for key in page]
+    if fetch_readonly and manager and (not fetch_all or depth > 1):
+        yield fetch_readonly_rows(selected, table, schema, idl, manager,
+                                  selector, depth, max_age=max_age)
+
+    resources_list = []
+    for row in selected:
+        json_row = yield get_row_json(row.uuid, table, schema, idl, uri,
+                                      selector, depth,
+                                      fetch_readonly=fetch_readonly,
+                                      manager=manager,
+                                      columns=keys_args or None)
+        resources_list.append(json_row)
+
+    if links is not None:
+        if prev_key is not None:
+            links.append(_get_cursor_link(uri, query_arguments, CURSOR_PREV,
+                                          prev_key))
+        if next_key is not None:
+            links.append(_get_cursor_link(uri, query_arguments, CURSOR_NEXT,
+                                          next_key))
+
+    raise gen.Return(resources_list)
+
+
+def _get_cursor_sort_order(sort_columns, columns, selector):
+    # The order of OpsIdl.sorted_index_lookup, its name identifies
+    # the key function across requests
+    sort_plan = dict((column, columns[column]) for column in sort_columns)
+
+    def key(row):
+        return getutils.get_cursor_sort_key(
+            getutils.get_row_plan_values(row, sort_plan), sort_columns)
+
+    return ((tuple(sort_columns), selector), sort_columns, key)
+
+
+def _get_cursor_link(uri, query_arguments, direction, key):
+    arguments = [(name, value)
+                 for name, values in query_arguments.iteritems()
+                 if name != REST_QUERY_PARAM_CURSOR
+                 for value in values]
+    arguments.append((REST_QUERY_PARAM_CURSOR,
+                      getutils.encode_cursor(direction, key)))
+    return '<%s?%s>; rel="%s"' % (uri, urllib.urlencode(arguments),
+                                  direction)
+
+
+@gen.coroutine
+def stream_resource(idl, resource, schema, handler, uri=None,
+                    selector=None, query_arguments=None,
+                    fetch_readonly=False, manager=None, max_age=None):
+    """
+    Writes the rows of a top-level or back referenced collection GET
+    with depth as a JSON list, flushing each row as an HTTP chunk so
+    memory use does not grow with the size of the collection. Only
+    collections of at least GET_STREAMING_MIN_ROWS rows are streamed,
+    smaller ones keep the buffered response and its Etag.
+
+    Returns False if the request is not streamed and nothing was
+    written, an error dictionary if the query arguments are invalid
+    or True once the collection was written.
+    """
+    depth = getutils.get_depth_param(query_arguments)
+    if resource is None or isinstance(depth, dict) or not depth:
+        raise gen.Return(False)
+
+    while resource.next is not None and resource.next.next is not None:
+        resource = resource.next
+
+    if resource.next is None or not is_resource_type_collection(resource) \
+            or resource.relation not in (OVSDB_SCHEMA_TOP_LEVEL,
+                                         OVSDB_SCHEMA_BACK_REFERENCE):
+        raise gen.Return(False)
+
+    utils.update_resource_keys(resource.next, schema, idl)
+    if verify.verify_http_method(resource, schema, "GET") is False:
+        raise gen.Return(False)
+
+    table = resource.next.table
+    sorting_args = []
+    filter_args = {}
+    pagination_args = {}
+    keys_args = []
+    validation_result = getutils.validate_query_args(sorting_args, filter_args,
+                                                     pagination_args,
+                                                     keys_args,
+                                                     query_arguments,
+                                                     schema, resource.next,
+                                                     depth, True)
+    if ERROR in validation_result:
+        raise gen.Return(validation_result)
+
+    rows = get_collection_rows(resource, schema, idl)
+    if rows is None or len(rows) < GET_STREAMING_MIN_ROWS or \
+            REST_QUERY_PARAM_CURSOR in pagination_args:
+        raise gen.Return(False)
+
+    if fetch_readonly and manager:
+        db_rows = idl.tables[table].rows
+        yield fetch_readonly_rows([db_rows[row] for row in rows
+                                   if row in db_rows], table, schema, idl,
+                                  manager, selector, depth,
+                                  all_rows=(resource.relation is
+                                            OVSDB_SCHEMA_TOP_LEVEL),
+                                  max_age=max_age)
+
+    # Filtering, sorting and pagination need a first pass over the
+    # rows; only the UUIDs and sort keys are kept from it
+    offset = pagination_args.get(REST_QUERY_PARAM_OFFSET)
+    limit = pagination_args.get(REST_QUERY_PARAM_LIMIT)
+    if filter_args or sorting_args or offset is not None or \
+            limit is not None:
+        db_rows = idl.tables[table].rows
+        selected = getutils.plan_collection_rows([db_rows[row]
+                                                  for row in rows],
+                                                 table, schema, selector,
+                                                 sorting_args, filter_args,
+                                                 offset, limit)
+        if selected is None:
+            rows = yield _select_collection_rows(rows, table, schema, idl,
+                                                 uri, selector, depth,
+                                                 sorting_args, filter_args,
+                                                 offset, limit, manager)
+        elif isinstance(selected, list):
+            rows = [row.uuid for row in selected]
+        else:
+            rows = selected
+
+        if isinstance(rows, dict):
+            raise gen.Return(rows)
+
+    handler.set_status(httplib.OK)
+    handler.set_header(HTTP_HEADER_CONTENT_TYPE, HTTP_CONTENT_TYPE_JSON)
+    handler.write('[')
+
+    try:
+        separator = ''
+        for row in rows:
+            if row not in idl.tables[table].rows:
+                continue
+
+            json_row = yield get_row_json(row, table, schema, idl, uri,
+                                          selector, depth,
+                                          fetch_readonly=fetch_readonly,
+                                          manager=manager,
+                                          columns=keys_args or None)
+
+            handler.write(separator + json.dumps(json_row))
+            separator = ', '
+            yield handler.flush()
+
+        handler.write(']')
+
+    except Exception as e:
+        # Headers were already sent, the client sees a truncated body
+        app_log.error("Collection streaming failed: %s" % e)
+        handler.request.connection.close()
+
+    raise gen.Return(True)
+
+
+@gen.coroutine
+def _select_collection_rows(rows, table, schema, idl, uri, selector, depth,
+                            sorting_args, filter_args, offset, limit,
+                            manager=None):
+
+    selected = []
+    for row in rows:
+        if row not in idl.tables[table].rows:
+            continue
+
+        json_row = yield get_row_json(row, table, schema, idl, uri,
+                                      selector, depth, manager=manager)
+        if filter_args and \
+                not getutils.filter_get_results([json_row], filter_args,
+                                                schema, table, True):
+            continue
+
+        sort_key = None
+        if sorting_args:
+            sort_key = tuple(getutils.process_sort_value(json_row, k, True)
+                             for k in sorting_args[:-1])
+        selected.append((sort_key, row))
+
+    if sorting_args:
+        # Last sorting argument indicates if sort should be reversed
+        selected.sort(key=lambda item: item[0], reverse=sorting_args[-1])
+
+    rows = getutils.paginate_get_results([row for unused, row in selected],
+                                         offset, limit)
+    raise gen.Return(rows)
+
+
+def get_collection_rows(resource, schema, idl):
+    """
+    Returns the UUIDs of the rows of a top-level or back referenced
+    collection, or None if the rows cannot be determined.
+    """
+    table = resource.next.table
+    if resource.relation is OVSDB_SCHEMA_TOP_LEVEL:
+        return idl.tables[table].rows.keys()
+
+    parent = idl.tables[resource.table].rows[resource.row]
+    rows = utils.get_back_reference_children(parent, resource.table, table,
+                                             schema, idl)
+    if rows is None:
+        return None
+
+    return [row.uuid for row in rows]
+
+
 @gen.coroutine
 def get_collection_json(resource, schema, idl, uri, selector, depth,
-                        fetch_readonly=False, manager=None):
+                        fetch_readonly=False, manager=None, max_age=None):
 
     if resource.relation is OVSDB_SCHEMA_TOP_LEVEL:
         resource_result = yield get_table_json(resource.next.table, schema,
                                                idl, uri, selector, depth,
-                                               fetch_readonly, manager)
+                                               fetch_readonly, manager,
+                                               max_age)
 
     elif resource.relation is OVSDB_SCHEMA_CHILD:
         resource_result = yield get_column_json(resource.column, resource.row,
                                                 resource.table, schema, idl,
                                                 uri, selector, depth,
                                                 fetch_readonly=fetch_readonly,
-                                                manager=manager)
+                                                manager=manager,
+                                                max_age=max_age)
 
     elif resource.relation is OVSDB_SCHEMA_BACK_REFERENCE:
         resource_result = yield get_back_references_json(resource.row,
@@ -182,7 +591,7 @@ def get_collection_json(resource, schema, idl, uri, selector, depth,
                                                          schema, idl, uri,
                                                          selector, depth,
                                                          fetch_readonly,
-                                                         manager)
+                                                         manager, max_age)
 
     raise gen.Return(resource_result)
 
@@ -190,105 +599,88 @@ def get_collection_json(resource, schema, idl, uri, selector, depth,
 @gen.coroutine
 def get_row_json(row, table, schema, idl, uri, selector=None,
                  depth=0, depth_counter=0, with_empty_values=False,
-                 fetch_readonly=False, manager=None):
+                 fetch_readonly=False, manager=None, columns=None):
 
     depth_counter += 1
+
+    # Rows whose references are not expanded are served from the cache,
+    # unless a transaction is open: its rows hold uncommitted changes
+    cache_key = None
+    if manager and depth_counter >= depth and idl.txn is None and \
+            table not in ON_DEMAND_FETCHED_TABLES:
+        cache_key = (table, row, uri, selector, with_empty_values,
+                     tuple(sorted(columns)) if columns else None)
+        data = manager.row_cache.get(cache_key)
+        if data is not None:
+            raise gen.Return(data)
+
     db_table = idl.tables[table]
     db_row = db_table.rows[row]
     table_schema = schema.ovs_tables[table]
 
-    keys = {}
-    keys[OVSDB_SCHEMA_CONFIG] = table_schema.config
-    keys[OVSDB_SCHEMA_STATS] = table_schema.stats
-    keys[OVSDB_SCHEMA_STATUS] = table_schema.status
-    keys[OVSDB_SCHEMA_REFERENCE] = table_schema.references
-
-    if table_schema.dynamic:
-        keys = utils.update_category_keys(keys, db_row,
-                                          idl, schema,
-                                          table)
-
-    config_keys = {}
-    config_data = {}
-    if selector is None or selector == OVSDB_SCHEMA_CONFIG:
-        config_keys = keys[OVSDB_SCHEMA_CONFIG]
-        config_data = utils.row_to_json(db_row, config_keys)
-
-    # To remove the unnecessary empty values from the config data
-    if not with_empty_values:
-        config_data = {key: config_data[key] for key in config_keys
-                       if not getutils.is_empty_value(config_data[key])}
-
-    stats_keys = {}
-    stats_data = {}
-    if selector is None or selector == OVSDB_SCHEMA_STATS:
-        stats_keys = keys[OVSDB_SCHEMA_STATS]
-        stats_data = utils.row_to_json(db_row, stats_keys)
-
-    # To remove all the empty columns from the satistics data
-    if not with_empty_values:
-        stats_data = {key: stats_data[key] for key in stats_keys
-                      if not getutils.is_empty_value(stats_data[key])}
-
-    status_keys = {}
-    status_data = {}
-    if selector is None or selector == OVSDB_SCHEMA_STATUS:
-        status_keys = keys[OVSDB_SCHEMA_STATUS]
-        status_data = utils.row_to_json(db_row, status_keys)
-
-    # To remove all the empty columns from the status data
-    if not with_empty_values:
-        status_data = {key: status_data[key] for key in status_keys
-                       if not getutils.is_empty_value(status_data[key])}
-
-    # Categorize references
-    references = keys[OVSDB_SCHEMA_REFERENCE]
-    reference_data = []
-    for key in references:
-        # Ignore parent column in case of back references as we
-        # already are in the child table whose row we need to fetch
-        if references[key].ref_table == table_schema.parent:
-            continue
+    # The plan holds the columns of each category for this row
+    plan = utils.get_serialization_plan(db_row, table_schema)
 
-        if (depth_counter >= depth):
-            depth = 0
+    # Serialize only the requested columns
+    if columns:
+        columns = set(columns)
 
+    categories = VALID_CATEGORIES
+    if selector is not None:
+        categories = [category for category in VALID_CATEGORIES
+                      if category == selector]
 
-        temp = yield get_column_json(key, row, table, schema,
-                                     idl, uri+'/'+key, selector, depth,
-                                     depth_counter, fetch_readonly, manager)
+    row_data = utils.row_to_json_by_plan(db_row, plan, categories,
+                                         with_empty_values, columns)
+    config_data = row_data.get(OVSDB_SCHEMA_CONFIG, {})
+    stats_data = row_data.get(OVSDB_SCHEMA_STATS, {})
+    status_data = row_data.get(OVSDB_SCHEMA_STATUS, {})
 
-        # The condition below is used to discard the empty list of references
-        # in the data returned for get requests
-        if not temp:
-            continue
+    # Categorize references, parent references are left out of the
+    # plan as we already are in the child table whose row we fetch
+    if depth_counter >= depth:
+        depth = 0
 
-        reference_data = temp
+    for key, reference, category in plan.references:
+        # References of other categories are dropped by the selector
+        if category not in row_data:
+            continue
 
-        # Depending upon the category of the
-        # reference pair them with the right data set
-        category = references[key].category
+        if columns and key not in columns:
+            continue
 
-        if category == OVSDB_SCHEMA_CONFIG:
-            config_data.update({key: reference_data})
+        # Referenced rows were fetched along with this row
+        reference_data = yield get_column_json(key, row, table, schema,
+                                               idl, uri + '/' + key,
+                                               selector, depth,
+                                               depth_counter,
+                                               manager=manager)
 
-        elif category == OVSDB_SCHEMA_STATUS:
-            status_data.update({key: reference_data})
+        # The condition below is used to discard the empty list of references
+        # in the data returned for get requests
+        if not reference_data:
+            continue
 
-        elif category == OVSDB_SCHEMA_STATS:
-            stats_data.update({key: reference_data})
+        # Pair the reference with the data set of its category
+        row_data[category][key] = reference_data
 
     # Categorize by selector
     data = getutils._categorize_by_selector(config_data, stats_data,
                                             status_data, selector)
 
+    if cache_key is not None:
+        dependencies = _get_row_json_dependencies(db_row, table, plan,
+                                                  row_data, columns, schema,
+                                                  idl)
+        manager.row_cache.set(cache_key, data, dependencies)
+
     raise gen.Return(data)
 
 
 # get list of all table row entries
 @gen.coroutine
 def get_table_json(table, schema, idl, uri, selector=None, depth=0,
-                   fetch_readonly=False, manager=None):
+                   fetch_readonly=False, manager=None, max_age=None):
 
     db_table = idl.tables[table]
 
@@ -302,9 +694,9 @@ def get_table_json(table, schema, idl, uri, selector=None, depth=0,
     else:
         # Fetch all read-only columns prior to retrieving row data
         if fetch_readonly and manager:
-            yield utils.fetch_readonly_columns_for_table(schema,
-                                                         table, idl,
-                                                         manager)
+            yield fetch_readonly_rows(db_table.rows.values(), table, schema,
+                                      idl, manager, selector, depth,
+                                      all_rows=True, max_age=max_age)
 
         for row in db_table.rows.itervalues():
             json_row = yield get_row_json(row.uuid, table, schema, idl, uri,
@@ -319,7 +711,7 @@ def get_table_json(table, schema, idl, uri, selector=None, depth=0,
 @gen.coroutine
 def get_column_json(column, row, table, schema, idl, uri,
                     selector=None, depth=0, depth_counter=0,
-                    fetch_readonly=False, manager=None):
+                    fetch_readonly=False, manager=None, max_age=None):
 
     reftable = schema.ovs_tables[table].references[column].ref_table
     relation = schema.ovs_tables[table].references[column].relation
@@ -362,36 +754,159 @@ def get_column_json(column, row, table, schema, idl, uri,
                     data[k] = uri + '/' + str(k)
     # GET with depth
     else:
+        # Fetch the referenced rows and the rows expanded with them
+        if fetch_readonly and manager:
+            yield fetch_readonly_rows(_get_reference_rows(column_data),
+                                      reftable, schema, idl, manager,
+                                      selector, depth,
+                                      depth_counter=depth_counter,
+                                      max_age=max_age)
+
         if isinstance(column_data, ovs.db.idl.Row):
-            if fetch_readonly and manager:
-                yield utils.fetch_readonly_columns(schema, table, idl,
-                                                   manager, [column_data])
             data = yield get_row_json(column_data.uuid, reftable, schema,
-                                      idl, uri, selector, depth, depth_counter)
+                                      idl, uri, selector, depth, depth_counter,
+                                      manager=manager)
         elif isinstance(column_data, dict):
-            if fetch_readonly and manager:
-                yield utils.fetch_readonly_columns(schema, table, idl,
-                                                   manager,
-                                                   column_data.values())
             data = {}
             for k, v in column_data.iteritems():
                 data[k] = yield get_row_json(v.uuid, reftable, schema, idl,
                                              uri, selector, depth,
-                                             depth_counter)
+                                             depth_counter, manager=manager)
         elif isinstance(column_data, list):
-            if fetch_readonly and manager:
-                yield utils.fetch_readonly_columns(schema, table, idl,
-                                                   manager, column_data)
             data = []
             for item in column_data:
                 result = yield get_row_json(item.uuid, reftable, schema,
                                             idl, uri, selector, depth,
-                                            depth_counter)
+                                            depth_counter, manager=manager)
                 data.append(result)
 
     raise gen.Return(data)
 
 
+@gen.coroutine
+def fetch_readonly_rows(rows, table, schema, idl, manager, selector=None,
+                        depth=0, depth_counter=0, all_rows=False,
+                        max_age=None):
+    """
+    Fetches in a single transaction the read-only columns of the rows
+    and of every row that get_row_json expands along with them up to
+    depth, so the serialization of the response does not wait on the
+    DB. If all_rows is True, rows are all the rows of the table.
+    Rows fetched less than max_age seconds ago are not fetched again.
+    """
+    fetch_tables = _get_fetch_tables(schema)
+    rows_by_table = {}
+    if all_rows and table in ON_DEMAND_FETCHED_TABLES:
+        rows_by_table[table] = None
+
+    _collect_readonly_rows(rows, table, schema, selector, depth,
+                           depth_counter, fetch_tables, rows_by_table)
+    if not rows_by_table:
+        return
+
+    for fetch_table, fetch_rows in rows_by_table.items():
+        if fetch_rows is not None:
+            rows_by_table[fetch_table] = fetch_rows.values()
+
+    yield manager.readonly_fetcher.fetch(schema, rows_by_table, max_age)
+
+
+def _collect_readonly_rows(rows, table, schema, selector, depth,
+                           depth_counter, fetch_tables, rows_by_table):
+    if table not in fetch_tables:
+        return
+
+    if table in ON_DEMAND_FETCHED_TABLES:
+        if table not in rows_by_table:
+            rows_by_table[table] = {}
+        if rows_by_table[table] is not None:
+            rows_by_table[table].update((row.uuid, row) for row in rows)
+
+    # Same depth rule as get_row_json
+    depth_counter += 1
+    if depth_counter >= depth:
+        return
+
+    table_schema = schema.ovs_tables[table]
+    references_rows = {}
+    for row in rows:
+        plan = utils.get_serialization_plan(row, table_schema)
+        for key, reference, category in plan.references:
+            if category not in VALID_CATEGORIES or \
+                    (selector is not None and category != selector):
+                continue
+
+            references_rows.setdefault(reference.ref_table, []).extend(
+                _get_reference_rows(row.__getattr__(key)))
+
+    for ref_table, ref_rows in references_rows.iteritems():
+        _collect_readonly_rows(ref_rows, ref_table, schema, selector, depth,
+                               depth_counter, fetch_tables, rows_by_table)
+
+
+def _get_row_json_dependencies(db_row, table, plan, row_data, columns,
+                               schema, idl):
+    """
+    Returns the (table, uuid) of the rows whose values are part of the
+    JSON of the row when its references are not expanded: the rows it
+    references, whose index is in their URI, along with their ancestors.
+    """
+    dependencies = set()
+    for key, reference, category in plan.references:
+        if category not in row_data or (columns and key not in columns):
+            continue
+
+        ref_table = reference.ref_table
+        for ref_row in _get_reference_rows(db_row.__getattr__(key)):
+            dependencies.add((ref_table, ref_row.uuid))
+            if reference.relation == OVSDB_SCHEMA_REFERENCE:
+                dependencies.update(
+                    (ancestor_table, ancestor.uuid)
+                    for ancestor_table, ancestor in
+                    utils.get_ancestor_rows(ref_row, ref_table, schema, idl))
+
+    return dependencies
+
+
+def _get_reference_rows(column_data):
+    if isinstance(column_data, ovs.db.idl.Row):
+        return [column_data]
+    elif isinstance(column_data, dict):
+        return column_data.values()
+    elif isinstance(column_data, list):
+        return column_data
+    return []
+
+
+def _get_fetch_tables(schema):
+    """
+    Returns the tables whose rows are, or reference through any number
+    of references, rows of on demand fetched tables. The set is
+    computed once per schema.
+    """
+    fetch_tables = getattr(schema, 'fetch_tables', None)
+    if fetch_tables is not None:
+        return fetch_tables
+
+    fetch_tables = set(table for table in ON_DEMAND_FETCHED_TABLES
+                       if table in schema.ovs_tables)
+    changed = True
+    while changed:
+        changed = False
+        for name, table_schema in schema.ovs_tables.iteritems():
+            if name in fetch_tables:
+                continue
+            for reference in table_schema.references.itervalues():
+                if reference.ref_table in fetch_tables and \
+                        reference.ref_table != table_schema.parent:
+                    fetch_tables.add(name)
+                    changed = True
+                    break
+
+    schema.fetch_tables = fetch_tables
+    return fetch_tables
+
+
 def _get_referenced_row(schema, table, row, column, column_row, idl):
 
     table_schema = schema.ovs_tables[table]
@@ -410,39 +925,26 @@ def _get_referenced_row(schema, table, row, column, column_row, idl):
 def get_back_references_json(parent_row, parent_table, table,
                              schema, idl, uri, selector=None,
                              depth=0, fetch_readonly=False,
-                             manager=None):
+                             manager=None, max_age=None):
 
-    references = schema.ovs_tables[table].references
-    _refCol = None
-    for key, value in references.iteritems():
-        if (value.relation == OVSDB_SCHEMA_PARENT and
-                value.ref_table == parent_table):
-            _refCol = key
-            break
-
-    if _refCol is None:
+    parent = idl.tables[parent_table].rows[parent_row]
+    rows = utils.get_back_reference_children(parent, parent_table, table,
+                                             schema, idl)
+    if rows is None:
         raise gen.Return(None)
 
     resources_list = []
 
     if not depth:
-        for row in idl.tables[table].rows.itervalues():
-            ref = row.__getattr__(_refCol)
-            if ref.uuid == parent_row:
-                tmp = utils.get_table_key(row, table, schema, idl, False)
-                _uri = _create_uri(uri, tmp)
-                resources_list.append(_uri)
+        for row in rows:
+            tmp = utils.get_table_key(row, table, schema, idl, False)
+            _uri = _create_uri(uri, tmp)
+            resources_list.append(_uri)
     else:
         # Fetch all read-only columns prior to retrieving row data
-        rows = []
-        for row in idl.tables[table].rows.itervalues():
-            ref = row.__getattr__(_refCol)
-            if ref.uuid == parent_row:
-                rows.append(row)
-
         if fetch_readonly and manager:
-            yield utils.fetch_readonly_columns(schema, table, idl,
-                                               manager, rows)
+            yield fetch_readonly_rows(rows, table, schema, idl, manager,
+                                      selector, depth, max_age=max_age)
 
         for row in rows:
             json_row = yield get_row_json(row.uuid, table, schema, idl, uri,
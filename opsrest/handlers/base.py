@@ -146,10 +146,12 @@ class BaseHandler(web.RequestHandler):
             if isinstance(self, OVSDBAPIHandler):
                 app_log.debug("If-Match is for OVSDBAPIHandler")
                 from opsrest import get
+                manager = self.ref_object.manager
                 result = yield get.get_resource(self.idl, self.resource_path,
                                                 self.schema, self.request.path,
                                                 selector, query_arguments,
-                                                fetch_readonly=True)
+                                                fetch_readonly=True,
+                                                manager=manager)
             elif self.controller is not None:
                 app_log.debug("If-Match is for custom resource")
 
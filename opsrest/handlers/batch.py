@@ -0,0 +1,161 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+from tornado import gen
+from tornado.log import app_log
+
+import json
+import httplib
+import re
+
+from opsrest.handlers import base
+from opsrest.batch import OperationBatch
+from opsrest.utils import utils
+from opsrest.constants import *
+from opsrest.exceptions import APIException, LengthRequired, \
+    DataValidationFailed
+
+# Status of each operation of a successful batch
+BATCH_SUCCESS_STATUS = {
+    REQUEST_TYPE_CREATE: httplib.CREATED,
+    REQUEST_TYPE_UPDATE: httplib.OK,
+    REQUEST_TYPE_PATCH: httplib.NO_CONTENT,
+    REQUEST_TYPE_DELETE: httplib.NO_CONTENT
+}
+
+
+class BatchHandler(base.BaseHandler):
+    '''
+    Applies an ordered list of operations in a single transaction.
+    The body is a list of {"method", "uri", "body"} operations, each one
+    handled as the POST, PUT, PATCH or DELETE of its uri would be. Either
+    all the operations are committed or none of them is, the response
+    holds the status of each operation.
+    '''
+
+    @gen.coroutine
+    def prepare(self):
+        try:
+            # Call parent's prepare to check authentication
+            super(BatchHandler, self).prepare()
+
+            # Check ovsdb connection before each request
+            if not self.ref_object.manager.connected:
+                self.set_status(httplib.SERVICE_UNAVAILABLE)
+                self.finish()
+
+        except APIException as e:
+            self.on_exception(e)
+            self.finish()
+
+        except Exception, e:
+            self.on_exception(e)
+            self.finish()
+
+    @gen.coroutine
+    def post(self):
+        try:
+            if HTTP_HEADER_CONTENT_LENGTH not in self.request.headers:
+                raise LengthRequired
+
+            if int(self.request.headers['Content-Length']) > MAX_BODY_SIZE:
+                raise DataValidationFailed("Content-Length too long")
+
+            operations = self.get_operations(json.loads(self.request.body))
+
+            # create a new ovsdb transaction for all the operations
+            self.txn = self.ref_object.manager.get_new_transaction()
+
+            batch = OperationBatch(self.schema, self.idl, self.txn)
+            results, failed = yield batch.prepare_all(operations)
+
+            if failed is not None:
+                app_log.debug("Batch operation %s failed" % failed)
+                self.txn.abort()
+                self.set_status(results[failed][BATCH_KEY_STATUS])
+            else:
+                status = self.txn.commit()
+                if status == INCOMPLETE:
+                    self.ref_object.manager.monitor_transaction(self.txn)
+                    # on 'incomplete' state we wait until the transaction
+                    # completes with either success or failure
+                    yield self.txn.event.wait()
+                    status = self.txn.status
+
+                app_log.debug("Batch transaction result: %s", status)
+                if status not in (SUCCESS, UNCHANGED):
+                    raise APIException(self.txn.get_error())
+
+                for operation, result in zip(operations, results):
+                    method = operation[BATCH_KEY_METHOD]
+                    result[BATCH_KEY_STATUS] = BATCH_SUCCESS_STATUS[method]
+                self.set_status(httplib.OK)
+
+            self.set_header(HTTP_HEADER_CONTENT_TYPE, HTTP_CONTENT_TYPE_JSON)
+            self.write(json.dumps({BATCH_KEY_RESULTS: results}))
+
+        except APIException as e:
+            self.on_exception(e)
+
+        except ValueError as e:
+            self.set_status(httplib.BAD_REQUEST)
+            self.set_header(HTTP_HEADER_CONTENT_TYPE,
+                            HTTP_CONTENT_TYPE_JSON)
+            self.write(utils.to_json_error(e))
+
+        except Exception as e:
+            self.on_exception(e)
+
+        self.finish()
+
+    def get_operations(self, data):
+        if not isinstance(data, list) or not data:
+            raise DataValidationFailed("Batch body must be a non empty "
+                                       "list of operations")
+
+        if len(data) > BATCH_MAX_OPERATIONS:
+            raise DataValidationFailed("Batch supports up to %s operations"
+                                       % BATCH_MAX_OPERATIONS)
+
+        operations = []
+        for index, operation in enumerate(data):
+            if not isinstance(operation, dict) or \
+                    BATCH_KEY_METHOD not in operation or \
+                    BATCH_KEY_URI not in operation:
+                raise DataValidationFailed("Operation %s must have a %s "
+                                           "and an %s" % (index,
+                                                          BATCH_KEY_METHOD,
+                                                          BATCH_KEY_URI))
+
+            method = operation[BATCH_KEY_METHOD].upper()
+            if method not in BATCH_SUCCESS_STATUS:
+                raise DataValidationFailed("Operation %s: method '%s' is not "
+                                           "allowed in a batch" %
+                                           (index, method))
+
+            uri = re.sub("/{2,}", "/", operation[BATCH_KEY_URI]).rstrip('/')
+            if not uri.startswith(OVSDB_BASE_URI.rstrip('/')) or '?' in uri:
+                raise DataValidationFailed("Operation %s: invalid uri '%s'"
+                                           % (index, uri))
+
+            body = operation.get(BATCH_KEY_BODY)
+            if method != REQUEST_TYPE_DELETE and body is None:
+                raise DataValidationFailed("Operation %s must have a %s"
+                                           % (index, BATCH_KEY_BODY))
+
+            operations.append({BATCH_KEY_METHOD: method,
+                               BATCH_KEY_URI: uri,
+                               BATCH_KEY_BODY: body})
+
+        return operations
@@ -22,6 +22,7 @@ from tornado.log import app_log
 
 # Local imports
 from opsrest.handlers.base import BaseHandler
+from opsrest.custom.basecontroller import AcceptedUpdate
 from opsrest.exceptions import APIException, MethodNotAllowed, \
     LengthRequired, ParseError
 from opsrest.constants import\
@@ -131,10 +132,13 @@ class CustomRESTHandler(BaseHandler):
             except:
                 raise ParseError("Malformed JSON request body")
             query_args = self.request.query_arguments
-            yield self.controller.update(resource_id, data,
-                                         self.current_user,
-                                         query_args)
-            self.set_status(httplib.OK)
+            result = yield self.controller.update(resource_id, data,
+                                                  self.current_user,
+                                                  query_args)
+            if isinstance(result, AcceptedUpdate):
+                self.set_accepted(result)
+            else:
+                self.set_status(httplib.OK)
         except APIException as e:
             self.on_exception(e)
 
@@ -155,10 +159,13 @@ class CustomRESTHandler(BaseHandler):
             except:
                 raise ParseError("Malformed JSON request body")
             query_args = self.request.query_arguments
-            yield self.controller.patch(resource_id, data,
-                                        self.current_user,
-                                        query_args)
-            self.set_status(httplib.NO_CONTENT)
+            result = yield self.controller.patch(resource_id, data,
+                                                 self.current_user,
+                                                 query_args)
+            if isinstance(result, AcceptedUpdate):
+                self.set_accepted(result)
+            else:
+                self.set_status(httplib.NO_CONTENT)
 
         except APIException as e:
             self.on_exception(e)
@@ -184,3 +191,9 @@ class CustomRESTHandler(BaseHandler):
             self.on_exception(e)
 
         self.finish()
+
+    def set_accepted(self, result):
+        self.set_header("Location", result.uri)
+        self.set_status(httplib.ACCEPTED)
+        self.set_header(HTTP_HEADER_CONTENT_TYPE, HTTP_CONTENT_TYPE_JSON)
+        self.write(json.dumps(result.data))
@@ -17,14 +17,15 @@ from tornado.log import app_log
 
 import json
 import httplib
+from copy import deepcopy
 
 from opsrest.handlers import base
 from opsrest.parse import parse_url_path
 from opsrest.utils import utils
 from opsrest.constants import *
 from opsrest.exceptions import APIException, LengthRequired, \
-    ParameterNotAllowed, DataValidationFailed
-from opsrest.utils.getutils import get_filters_args
+    ParameterNotAllowed, DataValidationFailed, NotFound
+from opsrest.utils.getutils import get_filters_args, get_max_age_param
 
 
 from opsrest import get, post, delete, put, patch
@@ -102,17 +103,43 @@ class OVSDBAPIHandler(base.BaseHandler):
 
             app_log.debug("Query arguments %s" % self.request.query_arguments)
 
-            result = yield get.get_resource(self.idl, self.resource_path,
-                                            self.schema, self.request.path,
-                                            selector,
-                                            self.request.query_arguments,
-                                            fetch_readonly=True,
-                                            manager=self.ref_object.manager)
+            max_age = get_max_age_param(self.request.query_arguments,
+                                        self.request.headers)
+            if isinstance(max_age, dict):
+                self.successful_query(max_age)
+                self.finish()
+                return
+
+            # Large collections are written row by row
+            manager = self.ref_object.manager
+            links = []
+            streamed = yield get.stream_resource(self.idl, self.resource_path,
+                                                 self.schema, self,
+                                                 self.request.path, selector,
+                                                 self.request.query_arguments,
+                                                 fetch_readonly=True,
+                                                 manager=manager,
+                                                 max_age=max_age)
+            if streamed is True:
+                self.finish()
+                return
+            elif streamed:
+                result = streamed
+            else:
+                result = yield get.get_resource(self.idl, self.resource_path,
+                                                self.schema, self.request.path,
+                                                selector,
+                                                self.request.query_arguments,
+                                                fetch_readonly=True,
+                                                manager=manager, links=links,
+                                                max_age=max_age)
 
             if result is None:
                 self.set_status(httplib.NOT_FOUND)
             elif self.successful_query(result):
                 self.set_status(httplib.OK)
+                if links:
+                    self.set_header(HTTP_HEADER_LINK, ', '.join(links))
                 self.set_header(HTTP_HEADER_CONTENT_TYPE,
                                 HTTP_CONTENT_TYPE_JSON)
                 self.write(json.dumps(result))
@@ -135,27 +162,18 @@ class OVSDBAPIHandler(base.BaseHandler):
             # get the POST body
             post_data = json.loads(self.request.body)
 
-            # create a new ovsdb transaction
-            self.txn = self.ref_object.manager.get_new_transaction()
-
-            # post_resource performs data verficiation, prepares and
-            # commits the ovsdb transaction
-            result = post.post_resource(post_data, self.resource_path,
-                                        self.schema, self.txn,
-                                        self.idl)
+            # post_resource performs data verficiation and prepares
+            # the ovsdb transaction
+            def write(txn, commit):
+                return post.post_resource(deepcopy(post_data),
+                                          self.get_write_resource_path(),
+                                          self.schema, txn, self.idl, commit)
 
-            status = result.status
+            result = yield self.write_resource(write, post_data)
             resource_uri = self.request.path + "/" + result.index
 
-            if status == INCOMPLETE:
-                self.ref_object.manager.monitor_transaction(self.txn)
-                # on 'incomplete' state we wait until the transaction
-                # completes with either success or failure
-                yield self.txn.event.wait()
-                status = self.txn.status
-
             # complete transaction
-            self.transaction_complete(status)
+            self.transaction_complete(result.status)
 
             # set the http header to include URI
             self.set_header(HTTP_HEADER_LOCATION, resource_uri)
@@ -183,24 +201,18 @@ class OVSDBAPIHandler(base.BaseHandler):
 
             # get the PUT body
             update_data = json.loads(self.request.body)
-            # create a new ovsdb transaction
-            self.txn = self.ref_object.manager.get_new_transaction()
-
-            # put_resource performs data verfication, prepares and
-            # commits the ovsdb transaction
-            result = put.put_resource(update_data, self.resource_path,
-                                      self.schema, self.txn, self.idl)
-
-            status = result.status
-            if status == INCOMPLETE:
-                self.ref_object.manager.monitor_transaction(self.txn)
-                # on 'incomplete' state we wait until the transaction
-                # completes with either success or failure
-                yield self.txn.event.wait()
-                status = self.txn.status
+
+            # put_resource performs data verfication and prepares
+            # the ovsdb transaction
+            def write(txn, commit):
+                return put.put_resource(deepcopy(update_data),
+                                        self.get_write_resource_path(),
+                                        self.schema, txn, self.idl, commit)
+
+            result = yield self.write_resource(write)
 
             # complete transaction
-            self.transaction_complete(status)
+            self.transaction_complete(result.status)
 
         except APIException as e:
             self.on_exception(e)
@@ -225,26 +237,19 @@ class OVSDBAPIHandler(base.BaseHandler):
 
             # get the PATCH body
             update_data = json.loads(self.request.body)
-            # create a new ovsdb transaction
-            self.txn = self.ref_object.manager.get_new_transaction()
-
-            # patch_resource performs data verification, prepares and
-            # commits the ovsdb transaction
-            result = yield patch.patch_resource(update_data,
-                                                self.resource_path,
-                                                self.schema, self.txn,
-                                                self.idl, self.request.path)
-
-            status = result.status
-            if status == INCOMPLETE:
-                self.ref_object.manager.monitor_transaction(self.txn)
-                # on 'incomplete' state we wait until the transaction
-                # completes with either success or failure
-                yield self.txn.event.wait()
-                status = self.txn.status
+
+            # patch_resource performs data verification and prepares
+            # the ovsdb transaction
+            def write(txn, commit):
+                return patch.patch_resource(deepcopy(update_data),
+                                            self.get_write_resource_path(),
+                                            self.schema, txn, self.idl,
+                                            self.request.path, commit)
+
+            result = yield self.write_resource(write)
 
             # complete transaction
-            self.transaction_complete(status)
+            self.transaction_complete(result.status)
 
         except APIException as e:
             app_log.debug("PATCH APIException")
@@ -266,21 +271,15 @@ class OVSDBAPIHandler(base.BaseHandler):
     def delete(self):
 
         try:
-            self.txn = self.ref_object.manager.get_new_transaction()
-
-            result = delete.delete_resource(self.resource_path,
-                                            self.schema, self.txn,
-                                            self.idl)
-            status = result.status
-            if status == INCOMPLETE:
-                self.ref_object.manager.monitor_transaction(self.txn)
-                # on 'incomplete' state we wait until the transaction
-                # completes with either success or failure
-                yield self.txn.event.wait()
-                status = self.txn.status
+            def write(txn, commit):
+                return delete.delete_resource(self.get_write_resource_path(),
+                                              self.schema, txn,
+                                              self.idl, commit)
+
+            result = yield self.write_resource(write)
 
             # complete transaction
-            self.transaction_complete(status)
+            self.transaction_complete(result.status)
 
         except APIException as e:
             self.on_exception(e)
@@ -290,6 +289,52 @@ class OVSDBAPIHandler(base.BaseHandler):
 
         self.finish()
 
+    def get_write_resource_path(self):
+        '''
+        Parses the request path again when a write is applied, as
+        batched writes are applied after other writes may have changed
+        the resources parsed by prepare.
+        '''
+        resource_path = parse_url_path(self.request.path, self.schema,
+                                       self.idl, self.request.method)
+        if resource_path is None:
+            raise NotFound
+
+        return resource_path
+
+    @gen.coroutine
+    def write_resource(self, write, data=None):
+        '''
+        Commits the changes prepared by write(txn, commit) and returns
+        its OvsdbTransactionResult. With write batching enabled the
+        changes may be committed together with other requests' writes
+        changing other rows, data is the body of a POST.
+        '''
+        manager = self.ref_object.manager
+
+        if self.settings.get('write_batching'):
+            def get_keys():
+                return utils.get_write_keys(self.get_write_resource_path(),
+                                            self.schema, self.request.method,
+                                            data)
+
+            result, self.txn = yield manager.write_batcher.write(write,
+                                                                 get_keys)
+            raise gen.Return(result)
+
+        # create a new ovsdb transaction
+        self.txn = manager.get_new_transaction()
+
+        result = yield gen.maybe_future(write(self.txn, True))
+        if result.status == INCOMPLETE:
+            manager.monitor_transaction(self.txn)
+            # on 'incomplete' state we wait until the transaction
+            # completes with either success or failure
+            yield self.txn.event.wait()
+            result.status = self.txn.status
+
+        raise gen.Return(result)
+
     def transaction_complete(self, status):
 
         # TODO: The http status codes are currently
@@ -40,14 +40,19 @@ class WSNotificationsHandler(WSBaseHandler):
         super(WSNotificationsHandler, self).initialize(ref_object)
 
     @staticmethod
-    def send_notification_msg(sub_name, msg):
+    def send_notification_msg(sub_name, data):
+        """
+        Sends the encoded notification message and returns a Future
+        resolved once it is sent, or None if the subscriber's websocket
+        is gone.
+        """
         ws = WSBaseHandler.get_websocket(sub_name)
 
         if not ws:
             app_log.error("Websocket not found. Couldn't send notification.")
-            return
+            return None
 
-        ws.send_message(json.dumps(msg))
+        return ws.send_message(data)
 
     def _generate_id(self):
         """
@@ -20,11 +20,16 @@ from ovs.db import error
 from ovs.db.idl import SchemaHelper
 
 from ops.opsidl import OpsIdl
-from opsrest.transaction import OvsdbTransactionList, OvsdbTransaction
+from ops.dc import RunningConfigCache
+from opsrest.transaction import OvsdbTransactionTracker, OvsdbTransaction
+from opsrest.rowcache import RowJsonCache
+from opsrest.fetcher import ReadOnlyFetcher
+from opsrest.batcher import WriteBatcher
 from opsrest.constants import (
     CHANGES_CB_TYPE,
     ESTABLISHED_CB_TYPE,
     OVSDB_DEFAULT_CONNECTION_TIMEOUT,
+    ROW_JSON_CACHE_MAX_ENTRIES,
     INCOMPLETE
 )
 from opslib.restparser import ON_DEMAND_FETCHED_TABLES
@@ -48,7 +53,20 @@ class OvsdbConnectionManager:
         self.ovs_socket = None
         self.register_tables = None
         self.track_all = False
-        self.txn_timeout_handle = None
+        self.row_cache = None
+        self.readonly_fetcher = None
+        self.write_batcher = None
+        self.config_cache = None
+        self.create_helpers()
+
+    def create_helpers(self):
+        self.row_cache = RowJsonCache(ROW_JSON_CACHE_MAX_ENTRIES)
+        self.readonly_fetcher = ReadOnlyFetcher(self)
+        self.write_batcher = WriteBatcher(self)
+
+        # Running configuration kept between full-configuration reads
+        if self.rest_schema is not None:
+            self.config_cache = RunningConfigCache(self.rest_schema)
 
     def start(self, register_tables=None, track_all=False):
         try:
@@ -74,16 +92,24 @@ class OvsdbConnectionManager:
                 for table in self.register_tables:
                     self.schema_helper.register_table(str(table))
 
-            self.idl = OpsIdl(self.remote, self.schema_helper)
+            self.idl = self.create_idl()
             self.curr_seqno = self.idl.change_seqno
 
+            # Changed rows invalidate their cached JSON
+            self.idl.track_row_changes()
+            self.idl.config_cache = self.config_cache
+
+            # Replies complete the transactions in check_transactions
+            self.idl.track_txn_replies()
+            self.clear_caches()
+
             if self.track_all:
                 app_log.debug("Tracking all changes")
                 self.idl.track_add_all()
 
             # We do not reset transactions when the DB connection goes down
             if self.transactions is None:
-                self.transactions = OvsdbTransactionList()
+                self.transactions = OvsdbTransactionTracker()
 
             self.idl_init()
 
@@ -93,6 +119,9 @@ class OvsdbConnectionManager:
                 IOLoop.current().add_timeout(time.time() + self.timeout,
                                              self.start)
 
+    def create_idl(self):
+        return OpsIdl(self.remote, self.schema_helper, self.rest_schema)
+
     def stop(self):
         if self.ovs_socket:
             IOLoop.current().remove_handler(self.ovs_socket)
@@ -102,8 +131,6 @@ class OvsdbConnectionManager:
             IOLoop.current().remove_timeout(self.timeout_handle)
             self.timeout_handle = None
 
-        self.stop_transaction_timer()
-
         if self.idl:
             self.idl.close()
             self.idl = None
@@ -151,20 +178,42 @@ class OvsdbConnectionManager:
         self.connected = True
         self.curr_seqno = self.idl.change_seqno
         self.ovs_socket = self.idl._session.rpc.stream.socket
+
+        # Rows may have changed while the connection was down
+        self.idl.get_changed_rows()
+        self.clear_caches()
         IOLoop.current().add_handler(self.ovs_socket.fileno(),
                                      self.idl_run,
                                      IOLoop.READ | IOLoop.ERROR)
 
+        # Transactions in flight when the connection went down are
+        # completed with TRY_AGAIN
+        self.check_transactions()
+
         self.run_callbacks(ESTABLISHED_CB_TYPE)
 
+    def clear_caches(self):
+        if self.row_cache is not None:
+            self.row_cache.clear()
+        if self.readonly_fetcher is not None:
+            self.readonly_fetcher.clear()
+        if self.config_cache is not None:
+            self.config_cache.clear()
+
     def idl_check_and_update(self):
         self.idl.run()
 
         if self.curr_seqno != self.idl.change_seqno:
+            changed_rows = self.idl.get_changed_rows()
+            if self.row_cache is not None:
+                self.row_cache.invalidate_rows(changed_rows)
+            if self.config_cache is not None:
+                self.config_cache.invalidate_rows(changed_rows)
             self.run_callbacks(CHANGES_CB_TYPE)
 
-            if len(self.transactions.txn_list):
-                self.check_transactions()
+        # Replies that do not change the DB, e.g. errors, do not bump
+        # the seqno, so they are checked on every run
+        self.check_transactions()
 
         self.curr_seqno = self.idl.change_seqno
 
@@ -178,38 +227,23 @@ class OvsdbConnectionManager:
             self.idl_check_and_update()
 
     def check_transactions(self):
-        self.stop_transaction_timer()
-        txn_incomplete = False
-
-        for index, tx in enumerate(self.transactions.txn_list):
-            tx.commit()
-            # TODO: Handle all states
-            if tx.status is not INCOMPLETE:
-                self.transactions.txn_list.pop(index)
+        # Only the transactions whose reply arrived are completed
+        for request_id in self.idl.get_txn_replies():
+            tx = self.transactions.pop_txn(request_id)
+            if tx is not None:
+                tx.commit()
                 tx.event.set()
-            else:
-                txn_incomplete = True
-
-        if txn_incomplete:
-            self.start_transaction_timer()
 
     def get_new_transaction(self):
         return OvsdbTransaction(self.idl)
 
     def monitor_transaction(self, txn):
-        self.transactions.add_txn(txn)
-        self.start_transaction_timer()
-
-    def stop_transaction_timer(self):
-        if self.txn_timeout_handle:
-            IOLoop.current().remove_timeout(self.txn_timeout_handle)
-            self.txn_timeout_handle = None
-
-    def start_transaction_timer(self):
-        if not self.txn_timeout_handle:
-            self.txn_timeout_handle = \
-                IOLoop.current().add_timeout(time.time() + self.timeout,
-                                             self.check_transactions)
+        # The reply may have been processed before the transaction
+        # was given to monitor
+        if txn.commit() != INCOMPLETE:
+            txn.event.set()
+        else:
+            self.transactions.add_txn(txn)
 
     def add_callback(self, cb_type, callback):
         if cb_type in self._callbacks:
@@ -238,3 +272,13 @@ class OvsdbConnectionManager:
                                                table_schema.readonly_columns)
             else:
                 schema_helper.register_table(str(table_name))
+
+
+class OvsdbConfigDbManager(OvsdbConnectionManager):
+    """
+    Connection manager of the config DB replica. Only the saved
+    configurations are read from it, so it has no caches, read-only
+    fetcher or write batcher.
+    """
+    def create_helpers(self):
+        pass
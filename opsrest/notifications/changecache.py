@@ -0,0 +1,117 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+from tornado import gen
+
+from opsrest.notifications.subscription import (
+    get_columns_to_values,
+    get_row_values
+)
+from opsrest.notifications.utils import EncodedJson
+
+
+class NotificationChangeCache(object):
+    """
+    Values of the rows serialized for the notifications of the current
+    IDL seqno, keyed by (table, uuid, changed columns or subscription
+    filter, resource URI).
+    The rows do not change while the seqno does not, so all the
+    subscriptions to a row share its values, encoded in JSON once, and
+    the columns of a row selected by a category filter are computed
+    once, keyed by (table, uuid, selector). The cache only holds the
+    values of one seqno of one IDL.
+    """
+    def __init__(self):
+        self.seqno = None
+        self.values = {}
+        self.selected_columns = {}
+
+    def _check_seqno(self, idl):
+        seqno = (id(idl), idl.change_seqno)
+        if self.seqno != seqno:
+            self.seqno = seqno
+            self.values = {}
+            self.selected_columns = {}
+        return self.seqno
+
+    def get_selected_columns(self, subscription, row, schema, idl):
+        """
+        Returns the columns of the row in the category of the selector
+        of the subscription.
+        """
+        self._check_seqno(idl)
+        key = (subscription.table, row, subscription.selector)
+        if key not in self.selected_columns:
+            self.selected_columns[key] = \
+                subscription.get_selected_columns(row, schema, idl)
+        return self.selected_columns[key]
+
+    def _add_values(self, seqno, key, values, idl):
+        values = EncodedJson(values)
+
+        # Values got after the seqno changed are not kept
+        if seqno == self._check_seqno(idl):
+            self.values[key] = values
+        return values
+
+    @gen.coroutine
+    def get_row_values(self, row, table, schema, idl, resource_uri):
+        """
+        Returns the EncodedJson of all the columns of the row.
+        """
+        seqno = self._check_seqno(idl)
+        key = (table, row, None, resource_uri)
+        if key in self.values:
+            raise gen.Return(self.values[key])
+
+        values = yield get_row_values(row, table, schema, idl, resource_uri)
+        raise gen.Return(self._add_values(seqno, key, values, idl))
+
+    @gen.coroutine
+    def get_filtered_row_values(self, subscription, row, schema, idl,
+                                resource_uri):
+        """
+        Returns the EncodedJson of the columns of the row notified by
+        the subscription, shared by the subscriptions with the same
+        filter.
+        """
+        seqno = self._check_seqno(idl)
+        table = subscription.table
+        key = (table, row, (subscription.columns, subscription.selector),
+               resource_uri)
+        if key in self.values:
+            raise gen.Return(self.values[key])
+
+        values = yield self.get_row_values(row, table, schema, idl,
+                                           resource_uri)
+        values = values.value
+        columns = subscription.filter_columns(values.keys(), row, schema, idl,
+                                              self)
+        filtered = dict((column, values[column]) for column in columns)
+        raise gen.Return(self._add_values(seqno, key, filtered, idl))
+
+    @gen.coroutine
+    def get_columns_to_values(self, columns, row, table, schema, idl,
+                              resource_uri):
+        """
+        Returns the EncodedJson of the given columns of the row.
+        """
+        seqno = self._check_seqno(idl)
+        key = (table, row, frozenset(columns), resource_uri)
+        if key in self.values:
+            raise gen.Return(self.values[key])
+
+        values = yield get_columns_to_values(columns, row, table, schema,
+                                             idl, resource_uri)
+        raise gen.Return(self._add_values(seqno, key, values, idl))
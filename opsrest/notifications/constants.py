@@ -30,6 +30,18 @@ NOTIF_NEW_VALUES_FIELD = "new_values"
 UPDATE_TYPE_ADDED = "added"
 UPDATE_TYPE_MODIFIED = "modified"
 UPDATE_TYPE_DELETED = "deleted"
+UPDATE_TYPE_RESYNC = "resync"
+
+# Seconds between the notifications of a subscription without min_interval
+NOTIF_DEFAULT_MIN_INTERVAL = 0
+
+# Bytes written to the socket of a subscriber and not sent yet, above
+# which notifications are held and coalesced
+NOTIF_MAX_BUFFER_SIZE = 1024 * 1024
+
+# Updates held for a subscriber above which they are dropped and the
+# subscriptions are resynchronized
+NOTIF_MAX_PENDING_UPDATES = 10000
 
 # Subscriber attributes
 SUBSCRIBER_TYPE = "type"
@@ -41,3 +53,6 @@ SUBSCRIBER_OPEN_ERROR = "error"
 # Subscription attributes
 SUBSCRIPTION_NAME = "name"
 SUBSCRIPTION_URI = "resource"
+SUBSCRIPTION_MIN_INTERVAL = "min_interval"
+SUBSCRIPTION_COLUMNS = "columns"
+SUBSCRIPTION_SELECTOR = "selector"
@@ -22,6 +22,10 @@ class SubscriptionInvalidResource(SubscriptionException):
     pass
 
 
+class SubscriptionInvalidFilter(SubscriptionException):
+    pass
+
+
 class NotificationException(Exception):
     def __init__(self, details=None):
         self.details = details
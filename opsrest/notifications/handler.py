@@ -23,7 +23,8 @@ from opsrest.utils import utils
 from opsrest.constants import (
     CHANGES_CB_TYPE,
     OVSDB_SCHEMA_BACK_REFERENCE,
-    OVSDB_SCHEMA_TOP_LEVEL
+    OVSDB_SCHEMA_TOP_LEVEL,
+    VALID_CATEGORIES
 )
 from opsrest.handlers.websocket.notifications import WSNotificationsHandler
 from opsrest.notifications import utils as notifutils
@@ -32,12 +33,14 @@ from opsrest.notifications.subscription import (
     CollectionSubscription,
     RowSubscription
 )
+from opsrest.notifications.changecache import NotificationChangeCache
 from opsrest.notifications.exceptions import (
     NotificationException,
-    NotificationMismatch,
+    SubscriptionInvalidFilter,
     SubscriptionInvalidResource
 )
 from opsrest.notifications.monitor import OvsdbNotificationMonitor
+from opsrest.notifications.subscriberqueue import SubscriberQueue
 from opsrest.notifications.utils import lookup_subscriber_by_name
 from tornado import gen
 
@@ -46,8 +49,23 @@ class NotificationHandler():
     def __init__(self, schema, manager):
         self._subscriptions_by_table = {}
         self._subscriptions = {}
+
+        # Dispatch index of the subscriptions, so each changed row is
+        # matched with its subscriptions by lookup:
+        # (table, row uuid) to the row subscriptions of the row
+        self._row_subscriptions = {}
+        # (table, collection URI segments) to the collection subscriptions
+        self._collection_subscriptions = {}
+        # (table, row uuid) to the collection subscriptions tracking it
+        self._collection_rows = {}
+
+        # Values of the changed rows shared by all the subscriptions
+        self._change_cache = NotificationChangeCache()
         self._schema = schema
 
+        # Subscriber name to the notifications waiting to be sent to it
+        self._subscriber_queues = {}
+
         # Register for callbacks for subscription changes
         self._manager = manager
         self._subscriber_idl = self._manager.idl
@@ -57,22 +75,14 @@ class NotificationHandler():
         # Enable monitoring for the subscription table
         self._manager.idl.track_add_all_columns(consts.SUBSCRIPTION_TABLE)
 
-        # Register for callbacks for notifications of subscribed changes
-
-        # TODO: When there is a better way to manage second monitor, reenable.
-        # Currently reconnect times are too long and are too prone to missing
-        # notifications. Currently, it causes problems. For now, reuse monitor
-        # and add the callback to the manager. When this code is reenabled,
-        # remove the callback added to the manager.
-        # self._notification_monitor = \
-        #    OvsdbNotificationMonitor(manager.remote,
-        #                             manager.schema,
-        #                             self._schema,
-        #                             self.subscribed_changes_callback)
-
-        # TODO: Remove this code when second monitor is enabled
-        self._manager.add_callback(CHANGES_CB_TYPE,
-                                   self.subscribed_changes_callback)
+        # Register for callbacks for notifications of subscribed changes.
+        # The subscribed tables are monitored on a connection of their
+        # own, so tracking their changes does not load the main IDL.
+        self._notification_monitor = \
+            OvsdbNotificationMonitor(manager.remote,
+                                     manager.schema,
+                                     self._schema,
+                                     self.subscribed_changes_callback)
 
     @gen.coroutine
     def create_subscription(self, subscription_name, subscription_row,
@@ -132,6 +142,9 @@ class NotificationHandler():
                                            subscription_uri, resource_uri,
                                            resource.row)
 
+        subscription.min_interval = self._get_min_interval(subscription_row)
+        subscription.columns, subscription.selector = \
+            self._get_filter(subscription_row, resource.table)
         raise gen.Return(subscription)
 
     def get_collection_row_uuids(self, parent_resource, idl):
@@ -245,73 +258,172 @@ class NotificationHandler():
 
     @gen.coroutine
     def subscribed_changes_callback(self, manager, idl):
-        subscriber_notifications = {}
+        # Queues of the subscribers with new notifications
+        subscriber_notifications = set()
+        seqno = manager.curr_seqno
+
+        # Take the changes before yielding, the tracking info is cleared
+        # once the callbacks return
+        changes = []
+        for table in self._subscriptions_by_table:
+            table_changes = notifutils.get_table_changes_from_idl(table, idl)
+            if table_changes:
+                app_log.debug("Detected changes to subscribed table \"%s\"" %
+                              table)
+                changes.append((table, table_changes.items()))
+
+        for table, table_changes in changes:
+            for row_uuid, row_change_info in table_changes:
+                try:
+                    if notifutils.is_resource_added(row_change_info, seqno):
+                        yield self._dispatch_added(table, row_uuid, idl,
+                                                   subscriber_notifications)
+                    elif notifutils.is_resource_deleted(row_change_info,
+                                                        seqno):
+                        self._dispatch_deleted(table, row_uuid,
+                                               subscriber_notifications)
+                    elif notifutils.is_resource_modified(row_change_info,
+                                                         seqno):
+                        yield self._dispatch_modified(table, row_uuid,
+                                                      row_change_info.columns,
+                                                      idl,
+                                                      subscriber_notifications)
 
-        for table, subscriptions in self._subscriptions_by_table.iteritems():
-            if not notifutils.is_table_changed(table, idl):
+                except NotificationException as e:
+                    app_log.error("Error processing notification."
+                                  "Error: %s" % e.details)
+
+        for queue in subscriber_notifications:
+            queue.schedule()
+
+    @gen.coroutine
+    def _dispatch_added(self, table, row_uuid, idl, subscriber_notifications):
+        row = idl.tables[table].rows[row_uuid]
+
+        # The URI of the row is resolved once and matched with the
+        # collections subscribed by its prefixes
+        resource_uri = utils.get_reference_uri(table, row, self._schema, idl)
+        uri_trace = tuple(resource_uri.split('/'))
+
+        subscriptions = []
+        for length in range(1, len(uri_trace) + 1):
+            key = (table, uri_trace[:length])
+            subscriptions.extend(self._collection_subscriptions.get(key, ()))
+
+        if not subscriptions:
+            return
+
+        app_log.debug("Detected new resource %s added to collection" %
+                      resource_uri)
+
+        collection_rows = \
+            self._collection_rows.setdefault((table, row_uuid), set())
+        for subscription in subscriptions:
+            columns_to_values = \
+                yield subscription.get_row_values(row_uuid, resource_uri, idl,
+                                                  self._schema,
+                                                  self._change_cache)
+
+            collection_rows.add(subscription)
+            added = subscription.add_row(row_uuid, resource_uri,
+                                         columns_to_values)
+            self._add_notification(subscriber_notifications, subscription,
+                                   consts.UPDATE_TYPE_ADDED, added)
+
+    def _dispatch_deleted(self, table, row_uuid, subscriber_notifications):
+        for subscription in self._collection_rows.pop((table, row_uuid), ()):
+            app_log.debug("Detected resource deleted from collection")
+            deleted = subscription.remove_row(row_uuid)
+            self._add_notification(subscriber_notifications, subscription,
+                                   consts.UPDATE_TYPE_DELETED, deleted)
+
+        for subscription in self._row_subscriptions.get((table, row_uuid),
+                                                        ()):
+            self._add_notification(subscriber_notifications, subscription,
+                                   consts.UPDATE_TYPE_DELETED,
+                                   subscription.get_deleted_msg())
+
+    @gen.coroutine
+    def _dispatch_modified(self, table, row_uuid, columns, idl,
+                           subscriber_notifications):
+        subscriptions = self._row_subscriptions.get((table, row_uuid))
+        if not subscriptions:
+            return
+
+        for subscription in list(subscriptions):
+            # Changes of the columns not subscribed are dropped
+            subscribed_columns = \
+                subscription.filter_columns(columns, row_uuid, self._schema,
+                                            idl, self._change_cache)
+            if not subscribed_columns:
                 continue
 
-            app_log.debug("Detected changes to subscribed table \"%s\"" %
-                          table)
+            columns_to_values = \
+                yield self._change_cache.get_columns_to_values(
+                    subscribed_columns, row_uuid, table, self._schema, idl,
+                    subscription.resource_uri)
 
-            for subscription in subscriptions:
-                subs_name = subscription.subscriber_name
+            modified = subscription.get_modified_msg(columns_to_values)
+            self._add_notification(subscriber_notifications, subscription,
+                                   consts.UPDATE_TYPE_MODIFIED, modified)
 
-                if subs_name not in subscriber_notifications:
-                    subscriber_notifications[subs_name] = {}
+    def _add_notification(self, subscriber_notifications, subscription,
+                          update_type, update):
+        queue = self._get_subscriber_queue(subscription.subscriber_name)
+        queue.add_update(subscription, update_type, update)
+        subscriber_notifications.add(queue)
 
-                try:
-                    sub = subscriber_notifications[subs_name]
-                    added, modified, deleted = \
-                        yield subscription.get_changes(manager, idl,
-                                                       self._schema)
-
-                    self._add_updates(sub, consts.UPDATE_TYPE_ADDED, added)
-                    self._add_updates(sub, consts.UPDATE_TYPE_MODIFIED,
-                                      modified)
-                    self._add_updates(sub, consts.UPDATE_TYPE_DELETED, deleted)
-
-                except NotificationMismatch as e:
-                    app_log.debug(e.details)
-                except NotificationException as e:
-                    app_log.error("Error processing notification."
-                                  "Error: %s" % e.details)
+    def _get_subscriber_queue(self, subscriber_name):
+        if subscriber_name not in self._subscriber_queues:
+            self._subscriber_queues[subscriber_name] = \
+                SubscriberQueue(subscriber_name, self.notify_subscriber,
+                                self._get_current_values)
 
-        for subscriber_name, changes in subscriber_notifications.iteritems():
-            self.notify_subscriber(subscriber_name, changes,
-                                   self._subscriber_idl)
+        return self._subscriber_queues[subscriber_name]
+
+    def _get_current_values(self, subscription):
+        return subscription.get_initial_values(self._subscriber_idl,
+                                               self._schema,
+                                               self._change_cache)
 
     @gen.coroutine
     def get_initial_values_and_notify(self, idl, subscription):
-        notify_msg = {}
-        initial_values = yield subscription.get_initial_values(idl,
-                                                               self._schema)
+        initial_values = \
+            yield subscription.get_initial_values(idl, self._schema,
+                                                  self._change_cache)
 
         if initial_values:
-            self._add_updates(notify_msg, consts.UPDATE_TYPE_ADDED,
-                              initial_values)
-            self.notify_subscriber(subscription.subscriber_name, notify_msg,
-                                   idl)
-
-    def notify_subscriber(self, subscriber_name, changes, idl):
-        if not changes:
-            app_log.debug("No changes. Skip notification")
-            return
+            if not isinstance(initial_values, list):
+                initial_values = [initial_values]
 
+            queue = self._get_subscriber_queue(subscription.subscriber_name)
+            for update in initial_values:
+                queue.add_update(subscription, consts.UPDATE_TYPE_ADDED,
+                                 update)
+            queue.schedule()
+
+    def notify_subscriber(self, subscriber_name, data):
+        """
+        Sends the encoded notification message to the subscriber. Returns
+        a Future resolved once it is sent, or None if it is not sent.
+        """
         app_log.debug("Notifying subscriber %s." % subscriber_name)
-        subscriber_row = lookup_subscriber_by_name(idl, subscriber_name)
+        subscriber_row = lookup_subscriber_by_name(self._subscriber_idl,
+                                                   subscriber_name)
 
         if subscriber_row:
-            subscriber_type = self._get_subscriber_type(subscriber_row, idl)
+            subscriber_type = self._get_subscriber_type(subscriber_row,
+                                                        self._subscriber_idl)
 
             if subscriber_type == consts.SUBSCRIBER_TYPE_WS:
-                notif_msg = {consts.NOTIF_MSG: changes}
-                WSNotificationsHandler.send_notification_msg(subscriber_name,
-                                                             notif_msg)
+                return WSNotificationsHandler.send_notification_msg(
+                    subscriber_name, data)
             else:
                 app_log.error("Unsupported subscriber type: %s" %
                               subscriber_type)
 
+        return None
+
     def add_subscription(self, subscription_uuid, subscription):
         app_log.debug("Adding subscription: %s\n%s" %
                       (subscription_uuid, subscription))
@@ -321,13 +433,13 @@ class NotificationHandler():
         if subscription.table not in self._subscriptions_by_table:
             self._subscriptions_by_table[subscription.table] = set([])
 
-            # TODO: Reenable this when second monitor is available.
-            # self._notification_monitor.add_table_monitor(subscription.table)
-
-            # TODO: Remove this when second monitor is available.
-            self._manager.idl.track_add_all_columns(subscription.table)
-
         self._subscriptions_by_table[subscription.table].add(subscription)
+        self._index_subscription(subscription)
+
+        # Begin monitoring the table, or track the columns of the
+        # subscription as well
+        self._notification_monitor.add_table_monitor(
+            subscription.table, self._get_tracked_columns(subscription.table))
 
         # Add the subscription by name for reverse lookup
         self._subscriptions[subscription_uuid] = subscription
@@ -345,32 +457,79 @@ class NotificationHandler():
         if subscription and subscription.table in self._subscriptions_by_table:
             table = subscription.table
             self._subscriptions_by_table[table].discard(subscription)
+            self._unindex_subscription(subscription)
+
+            # Drop the notifications not sent yet
+            subscriber_name = subscription.subscriber_name
+            queue = self._subscriber_queues.get(subscriber_name)
+            if queue and queue.remove_subscription(subscription):
+                del self._subscriber_queues[subscriber_name]
 
             # If the table is no longer being monitored, remove tracking and
             # monitoring from the idl.
             if not self._subscriptions_by_table[table]:
                 # No longer need the table entry in the mapping.
                 del self._subscriptions_by_table[table]
+                self._notification_monitor.remove_table_monitor(table)
+            else:
+                # Stop tracking the columns no longer subscribed
+                self._notification_monitor.add_table_monitor(
+                    table, self._get_tracked_columns(table))
 
-                # TODO: Reeable this when second monitor is available
-                # Need to also remove tracking/monitoring
-                # self._notification_monitor.remove_table_monitor(table)
-
-                # TODO: Remove this when second monitor is available
-                self._manager.idl.track_remove_all_columns(subscription.table)
-
-    def _add_updates(self, subscriber_changes, update_type, updates):
-        if not updates:
-            return
-
-        if update_type not in subscriber_changes:
-            subscriber_changes[update_type] = []
-
-        if not isinstance(updates, list):
-            updates = [updates]
+    def _get_tracked_columns(self, table):
+        """
+        Returns the columns of the table subscribed to, None if all the
+        columns are.
+        """
+        tracked_columns = set()
+        for subscription in self._subscriptions_by_table[table]:
+            columns = subscription.get_tracked_columns(self._schema)
+            if columns is None:
+                return None
+            tracked_columns.update(columns)
+
+        # Index columns are tracked too, so rows added and deleted are
+        # tracked even if none of their subscribed columns are
+        table_schema = self._schema.ovs_tables[table]
+        tracked_columns.update(table_schema.index_columns or [])
+
+        return frozenset(tracked_columns)
+
+    def _index_subscription(self, subscription):
+        table = subscription.table
+        if isinstance(subscription, CollectionSubscription):
+            key = (table, tuple(subscription.uri_segments))
+            self._collection_subscriptions.setdefault(key,
+                                                      set()).add(subscription)
+
+            for row_uuid in subscription.rows_to_uri:
+                self._collection_rows.setdefault((table, row_uuid),
+                                                 set()).add(subscription)
+        else:
+            self._row_subscriptions.setdefault((table, subscription.row),
+                                               set()).add(subscription)
+
+    def _unindex_subscription(self, subscription):
+        table = subscription.table
+        if isinstance(subscription, CollectionSubscription):
+            keys = [(table, row_uuid) for row_uuid in subscription.rows_to_uri]
+            self._discard_from_index(self._collection_rows, keys,
+                                     subscription)
+            self._discard_from_index(self._collection_subscriptions,
+                                     [(table,
+                                       tuple(subscription.uri_segments))],
+                                     subscription)
+        else:
+            self._discard_from_index(self._row_subscriptions,
+                                     [(table, subscription.row)],
+                                     subscription)
 
-        for update in updates:
-            subscriber_changes[update_type].append(update)
+    def _discard_from_index(self, index, keys, subscription):
+        for key in keys:
+            if key in index:
+                index[key].discard(subscription)
+                if not index[key]:
+                    del index[key]
 
     def _get_subscriber_type(self, subscriber_row, idl):
         return utils.get_column_data_from_row(subscriber_row,
@@ -379,3 +538,65 @@ class NotificationHandler():
     def _get_subscriber_name(self, subscriber_row, idl):
         return utils.get_column_data_from_row(subscriber_row,
                                               consts.SUBSCRIBER_NAME)
+
+    def _get_min_interval(self, subscription_row):
+        """
+        Seconds between two notifications of the subscription, if the
+        schema of the subscription table has the column.
+        """
+        subscription_schema = \
+            self._schema.ovs_tables[consts.SUBSCRIPTION_TABLE]
+        if consts.SUBSCRIPTION_MIN_INTERVAL not in subscription_schema.config:
+            return consts.NOTIF_DEFAULT_MIN_INTERVAL
+
+        min_interval = \
+            utils.get_column_data_from_row(subscription_row,
+                                           consts.SUBSCRIPTION_MIN_INTERVAL)
+        if isinstance(min_interval, list):
+            min_interval = min_interval[0] if min_interval else None
+
+        if min_interval is None or min_interval < 0:
+            return consts.NOTIF_DEFAULT_MIN_INTERVAL
+
+        return min_interval
+
+    def _get_filter(self, subscription_row, table):
+        """
+        Returns the columns and the selector the subscription is limited
+        to, if the schema of the subscription table has the columns.
+        None if not limited.
+        """
+        subscription_schema = \
+            self._schema.ovs_tables[consts.SUBSCRIPTION_TABLE]
+
+        columns = None
+        if consts.SUBSCRIPTION_COLUMNS in subscription_schema.config:
+            columns = \
+                utils.get_column_data_from_row(subscription_row,
+                                               consts.SUBSCRIPTION_COLUMNS)
+            if columns:
+                table_schema = self._schema.ovs_tables[table]
+                for column in columns:
+                    if column not in table_schema.config and \
+                            column not in table_schema.status and \
+                            column not in table_schema.stats and \
+                            column not in table_schema.references:
+                        raise SubscriptionInvalidFilter("Invalid column " +
+                                                        column)
+                columns = frozenset(columns)
+            else:
+                columns = None
+
+        selector = None
+        if consts.SUBSCRIPTION_SELECTOR in subscription_schema.config:
+            selector = \
+                utils.get_column_data_from_row(subscription_row,
+                                               consts.SUBSCRIPTION_SELECTOR)
+            if isinstance(selector, list):
+                selector = selector[0] if selector else None
+
+            if selector is not None and selector not in VALID_CATEGORIES:
+                raise SubscriptionInvalidFilter("Invalid selector " +
+                                                selector)
+
+        return (columns, selector)
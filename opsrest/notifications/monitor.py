@@ -13,57 +13,117 @@
 #  under the License.
 
 from opsrest.manager import OvsdbConnectionManager
+from opsrest.notifications.notificationidl import NotificationIdl
 from tornado.log import app_log
 from opsrest.constants import CHANGES_CB_TYPE, ESTABLISHED_CB_TYPE
 
 
+class OvsdbNotificationManager(OvsdbConnectionManager):
+    """
+    Connection manager of the notification IDL. The running
+    configuration is not read from it, so it has no config cache.
+    """
+    def __init__(self, remote, schema, rest_schema, *args, **kwargs):
+        OvsdbConnectionManager.__init__(self, remote, schema, rest_schema,
+                                        *args, **kwargs)
+        self.config_cache = None
+
+    def create_idl(self):
+        return NotificationIdl(self.remote, self.schema_helper,
+                               self.rest_schema)
+
+
 class OvsdbNotificationMonitor:
+    """
+    Monitors the subscribed tables on a connection of its own, so the
+    change tracking of notifications is kept out of the IDL serving
+    the REST requests. The rows of a subscribed table are serialized
+    from the notification IDL, so the tables holding their parents and
+    referenced rows are monitored too, without tracking.
+    """
     def __init__(self, remote, schema, rest_schema, notification_callback):
         self.remote = remote
         self.schema = schema
         self.rest_schema = rest_schema
-        self.tables_monitored = set([])
-        self.manager = None
+        # Subscribed table to the columns whose changes are tracked, all
+        # if None
+        self.tables_monitored = {}
         self.notify_cb = notification_callback
-        self.established = False
 
-    def add_table_monitor(self, table):
+        # Monitored table to the number of subscribed tables needing it
+        self.table_refs = {}
+        self.manager = None
+        self.manager = self.start_new_manager()
+
+    @property
+    def idl(self):
+        return self.manager.idl if self.manager else None
+
+    def add_table_monitor(self, table, columns=None):
+        """
+        Monitors the table and tracks the changes of the given columns,
+        all if None. Called again to change the tracked columns.
+        """
         app_log.debug("Adding monitoring for table %s" % table)
 
         if table not in self.tables_monitored:
-            self.tables_monitored.add(table)
-            self.restart_monitoring()
+            for dependency in self.get_table_dependencies(table):
+                self.table_refs[dependency] = \
+                    self.table_refs.get(dependency, 0) + 1
+                if self.idl is not None:
+                    self.idl.add_table(dependency)
+
+        self.tables_monitored[table] = columns
+        if self.idl is not None:
+            self.idl.track_table(table, columns)
 
     def remove_table_monitor(self, table):
         app_log.debug("Removing monitoring for table %s" % table)
 
-        if table in self.tables_monitored:
-            self.tables_monitored.discard(table)
-            self.restart_monitoring()
-
-    def restart_monitoring(self):
-        app_log.debug("Restarting monitor..")
-
-        if self.manager:
-            # Check if there are any pending changes and notify before stopping
-            if self.established:
-                self.manager.idl_check_and_update()
-                self.established = False
-
-            self.manager.stop()
-
-        self.manager = self.start_new_manager()
+        if table not in self.tables_monitored:
+            return
+
+        del self.tables_monitored[table]
+        if self.idl is not None:
+            self.idl.untrack_table(table)
+
+        for dependency in self.get_table_dependencies(table):
+            self.table_refs[dependency] -= 1
+            if not self.table_refs[dependency]:
+                del self.table_refs[dependency]
+                if self.idl is not None:
+                    self.idl.remove_table(dependency)
+
+    def get_table_dependencies(self, table):
+        """
+        Returns the table and the tables needed to serialize its rows,
+        i.e. the tables of its ancestors and of the rows it references
+        along with their ancestors.
+        """
+        ovs_tables = self.rest_schema.ovs_tables
+        tables = set([])
+        for ref_table in [table] + [reference.ref_table for reference in
+                                    ovs_tables[table].references.values()]:
+            while ref_table is not None and ref_table not in tables:
+                tables.add(ref_table)
+                ref_table = ovs_tables[ref_table].parent
+
+        return tables
 
     def new_monitor_started_callback(self, manager, idl):
         app_log.debug("New monitor/manager started.")
-        self.established = True
+
+        # The IDL may have been created again while connecting
+        for table in self.table_refs:
+            idl.add_table(table)
+        for table, columns in self.tables_monitored.iteritems():
+            idl.track_table(table, columns)
 
     def start_new_manager(self):
         app_log.debug("Starting new manager")
 
-        manager = OvsdbConnectionManager(self.remote, self.schema,
-                                         self.rest_schema)
-        manager.start(self.tables_monitored, True)
+        manager = OvsdbNotificationManager(self.remote, self.schema,
+                                           self.rest_schema)
 
         # Add callback for detecting changes to subscribed resources
         manager.add_callback(CHANGES_CB_TYPE, self.notify_cb)
@@ -72,4 +132,7 @@ class OvsdbNotificationMonitor:
         # established
         manager.add_callback(ESTABLISHED_CB_TYPE,
                              self.new_monitor_started_callback)
+
+        # The monitored tables are added to the IDL once connected
+        manager.start()
         return manager
@@ -0,0 +1,200 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import ovs.jsonrpc
+from tornado.log import app_log
+
+from ops.opsidl import OpsIdl
+
+
+class NotificationIdl(OpsIdl):
+    """
+    IDL replicating only the tables added with add_table. Each table has
+    its own OVSDB monitor, whose id is the table name, so tables are
+    added and removed with monitor and monitor_cancel requests on the
+    open session. Nothing is downloaded again and the session is not
+    reconnected when the monitored tables change.
+
+    Changes of the tables given to track_table are tracked once the
+    initial contents of the table are received, so the rows already in
+    the table are not reported as added. Only the changes of the given
+    columns of a table are tracked, if any. After a reconnection, all the
+    tables are monitored again and changes made while disconnected are
+    not tracked.
+
+    The IDL is only meant for reading, it has no transaction or lock
+    support.
+    """
+    def __init__(self, remote, schema, extschema=None):
+        OpsIdl.__init__(self, remote, schema, extschema)
+        self.monitored_tables = set()
+
+        # Tracked table to its tracked columns, all if None
+        self.tracked_tables = {}
+
+        # JSON-RPC ids of the monitor requests in flight to their table
+        self._monitor_requests = {}
+        self._cancel_requests = set()
+
+    def add_table(self, table_name):
+        if table_name in self.monitored_tables:
+            return
+
+        self.monitored_tables.add(table_name)
+        self._send_table_monitor_request(table_name)
+
+    def remove_table(self, table_name):
+        if table_name not in self.monitored_tables:
+            return
+
+        self.untrack_table(table_name)
+        self.monitored_tables.discard(table_name)
+
+        if self._session.is_connected():
+            msg = ovs.jsonrpc.Message.create_request("monitor_cancel",
+                                                     [table_name])
+            self._cancel_requests.add(msg.id)
+            self._session.send(msg)
+
+        self._clear_table(table_name)
+
+    def track_table(self, table_name, columns=None):
+        if table_name in self.tracked_tables:
+            if self.tracked_tables[table_name] == columns:
+                return
+            self.untrack_table(table_name)
+
+        self.tracked_tables[table_name] = columns
+
+        # Otherwise tracked once its contents are received
+        if self._is_table_ready(table_name):
+            self._track_columns(table_name)
+
+    def untrack_table(self, table_name):
+        if table_name in self.tracked_tables:
+            del self.tracked_tables[table_name]
+            self.track_remove_all_columns(table_name)
+
+    def _track_columns(self, table_name):
+        columns = self.tracked_tables[table_name]
+        if columns is None:
+            self.track_add_all_columns(table_name)
+        else:
+            for column in columns:
+                self.track_add_column(table_name, column)
+
+    def run(self):
+        """
+        Processes a batch of messages from the database server, as
+        Idl.run does for the updates of the table monitors. Returns True
+        if the IDL changed.
+        """
+        initial_change_seqno = self.change_seqno
+        self._session.run()
+        for i in xrange(50):
+            if not self._session.is_connected():
+                break
+
+            seqno = self._session.get_seqno()
+            if seqno != self._last_seqno:
+                self._last_seqno = seqno
+                self._send_monitor_requests()
+
+                # The connection is the change, tables come later
+                self.change_seqno += 1
+                break
+
+            msg = self._session.recv()
+            if msg is None:
+                break
+
+            if (msg.type == ovs.jsonrpc.Message.T_NOTIFY and
+                    msg.method == "update" and len(msg.params) == 2 and
+                    msg.params[0] in self.monitored_tables and
+                    self._is_table_ready(msg.params[0])):
+                self._Idl__parse_update(msg.params[1])
+            elif (msg.type in (ovs.jsonrpc.Message.T_REPLY,
+                               ovs.jsonrpc.Message.T_ERROR) and
+                    msg.id in self._monitor_requests):
+                self._process_monitor_reply(msg)
+            elif (msg.type in (ovs.jsonrpc.Message.T_REPLY,
+                               ovs.jsonrpc.Message.T_ERROR) and
+                    msg.id in self._cancel_requests):
+                self._cancel_requests.discard(msg.id)
+            elif (msg.type == ovs.jsonrpc.Message.T_REPLY and
+                    msg.id == "echo"):
+                # Reply to our echo request, ignored as in Idl.run
+                pass
+            else:
+                app_log.debug("Notification IDL received unexpected %s "
+                              "message" %
+                              ovs.jsonrpc.Message.type_to_string(msg.type))
+
+        return initial_change_seqno != self.change_seqno
+
+    def _is_table_ready(self, table_name):
+        return table_name not in self._monitor_requests.values()
+
+    def _send_monitor_requests(self):
+        # Reconnected, the requests of the previous session are lost
+        self._monitor_requests = {}
+        self._cancel_requests = set()
+
+        for table_name in self.monitored_tables:
+            if table_name in self.tracked_tables:
+                self.track_remove_all_columns(table_name)
+            self._send_table_monitor_request(table_name)
+
+    def _send_table_monitor_request(self, table_name):
+        if not self._session.is_connected() or \
+                self._last_seqno != self._session.get_seqno():
+            # Sent by run once connected
+            return
+
+        table = self.tables[table_name]
+        columns = [column for column in table.columns.keys()
+                   if column not in self.readonly.get(table_name, ())]
+
+        msg = ovs.jsonrpc.Message.create_request(
+            "monitor", [self._db.name, table_name,
+                        {table_name: {"columns": columns}}])
+        self._monitor_requests[msg.id] = table_name
+        self._session.send(msg)
+
+    def _process_monitor_reply(self, msg):
+        table_name = self._monitor_requests.pop(msg.id)
+
+        # Removed, or removed and added again, meanwhile
+        if table_name not in self.monitored_tables or \
+                not self._is_table_ready(table_name):
+            return
+
+        if msg.type == ovs.jsonrpc.Message.T_ERROR:
+            app_log.error("Failed to monitor table %s: %s" %
+                          (table_name, msg.error))
+            return
+
+        self.change_seqno += 1
+        self._clear_table(table_name)
+        self._Idl__parse_update(msg.result)
+
+        if table_name in self.tracked_tables:
+            self._track_columns(table_name)
+
+    def _clear_table(self, table_name):
+        # Rows are deleted one by one to keep the maps of OpsIdl up to
+        # date, the table is not tracked at this point
+        table = self.tables[table_name]
+        for uuid in table.rows.keys():
+            self._Idl__process_update(table, uuid, {}, None)
@@ -0,0 +1,248 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+from collections import OrderedDict
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.log import app_log
+
+from opsrest.notifications.constants import (
+    NOTIF_MAX_BUFFER_SIZE,
+    NOTIF_MAX_PENDING_UPDATES,
+    NOTIF_MSG,
+    NOTIF_NEW_VALUES_FIELD,
+    NOTIF_RESOURCE_FIELD,
+    NOTIF_SUBSCRIPTION_FIELD,
+    UPDATE_TYPE_ADDED,
+    UPDATE_TYPE_DELETED,
+    UPDATE_TYPE_MODIFIED,
+    UPDATE_TYPE_RESYNC
+)
+from opsrest.notifications.subscription import construct_modified_msg
+from opsrest.notifications.utils import EncodedJson, encode_json
+
+
+def merge_modified_msgs(old, new):
+    """
+    Returns the modified message of both changes, with the latest
+    values of the columns.
+    """
+    values = {}
+    for msg in (old, new):
+        new_values = msg[NOTIF_NEW_VALUES_FIELD]
+        if isinstance(new_values, EncodedJson):
+            new_values = new_values.value
+        values.update(new_values)
+
+    return construct_modified_msg(new[NOTIF_SUBSCRIPTION_FIELD],
+                                  new[NOTIF_RESOURCE_FIELD], values)
+
+
+class SubscriptionUpdates(object):
+    """
+    Updates of a subscription waiting to be sent. Modifications of the
+    same resource are coalesced into one.
+    """
+    def __init__(self, subscription):
+        self.subscription = subscription
+        self.last_sent = None
+        self.resync = False
+        self.clear()
+
+    def clear(self):
+        self.added = []
+        self.modified = OrderedDict()
+        self.deleted = []
+
+    def __len__(self):
+        return len(self.added) + len(self.modified) + len(self.deleted)
+
+    def is_pending(self):
+        return self.resync or len(self) > 0
+
+    def get_due_time(self):
+        if self.last_sent is None:
+            return 0
+        return self.last_sent + self.subscription.min_interval
+
+    def add(self, update_type, update):
+        if update_type == UPDATE_TYPE_MODIFIED:
+            resource_uri = update[NOTIF_RESOURCE_FIELD]
+            if resource_uri in self.modified:
+                update = merge_modified_msgs(self.modified[resource_uri],
+                                             update)
+            self.modified[resource_uri] = update
+        elif update_type == UPDATE_TYPE_ADDED:
+            self.added.append(update)
+        else:
+            self.deleted.append(update)
+
+    def take(self, changes):
+        """
+        Moves the updates into the changes of a notification message.
+        """
+        for update_type, updates in ((UPDATE_TYPE_ADDED, self.added),
+                                     (UPDATE_TYPE_MODIFIED,
+                                      self.modified.values()),
+                                     (UPDATE_TYPE_DELETED, self.deleted)):
+            if updates:
+                changes.setdefault(update_type, []).extend(updates)
+
+        self.clear()
+
+
+class SubscriberQueue(object):
+    """
+    Notifications waiting to be sent to a subscriber. The updates of a
+    subscription are sent at most once every min_interval seconds of the
+    subscription, modifications of a resource within that window being
+    coalesced. Updates are also held while more than
+    NOTIF_MAX_BUFFER_SIZE bytes written to the socket are not sent yet.
+    When more than NOTIF_MAX_PENDING_UPDATES updates are held, they are
+    all dropped: the next notification has a resync entry for each
+    subscription, followed by the current values of its resources as
+    added updates.
+
+    send(subscriber_name, data) writes an encoded message and returns
+    a Future resolved once it is sent, or None if the subscriber is
+    gone. get_initial_values(subscription) is a coroutine returning the
+    added updates of the current values of the subscription.
+    """
+    def __init__(self, subscriber_name, send, get_initial_values):
+        self.subscriber_name = subscriber_name
+        self._send = send
+        self._get_initial_values = get_initial_values
+
+        self.updates = {}
+        self.pending = 0
+        self.buffered = 0
+
+        self._timeout = None
+        self._timeout_deadline = None
+        self._flushing = False
+
+    def remove_subscription(self, subscription):
+        """
+        Drops the updates of the subscription and returns True if no
+        subscription is left.
+        """
+        updates = self.updates.pop(subscription, None)
+        if updates is not None:
+            self.pending -= len(updates)
+        return not self.updates
+
+    def add_update(self, subscription, update_type, update):
+        if subscription not in self.updates:
+            self.updates[subscription] = SubscriptionUpdates(subscription)
+
+        updates = self.updates[subscription]
+        self.pending -= len(updates)
+        updates.add(update_type, update)
+        self.pending += len(updates)
+
+        if self.pending > NOTIF_MAX_PENDING_UPDATES:
+            app_log.error("Subscriber %s is too slow, dropping its "
+                          "notifications to resync" % self.subscriber_name)
+            for updates in self.updates.itervalues():
+                updates.clear()
+                updates.resync = True
+            self.pending = 0
+
+    def schedule(self):
+        """
+        Sends the updates that are due, and schedules the others.
+        """
+        if self._flushing or self.buffered > NOTIF_MAX_BUFFER_SIZE:
+            # Scheduled again once done
+            return
+
+        pending = [updates.get_due_time()
+                   for updates in self.updates.itervalues()
+                   if updates.is_pending()]
+        if not pending:
+            return
+
+        deadline = min(pending)
+        io_loop = IOLoop.current()
+        if deadline <= io_loop.time():
+            io_loop.add_callback(self.flush)
+        elif self._timeout is None or deadline < self._timeout_deadline:
+            if self._timeout is not None:
+                io_loop.remove_timeout(self._timeout)
+            self._timeout = io_loop.call_at(deadline, self._on_timeout)
+            self._timeout_deadline = deadline
+
+    def _on_timeout(self):
+        self._timeout = None
+        self._timeout_deadline = None
+        self.flush()
+
+    @gen.coroutine
+    def flush(self):
+        if self._flushing:
+            return
+
+        self._flushing = True
+        try:
+            changes = {}
+            now = IOLoop.current().time()
+            for updates in self.updates.values():
+                if not updates.is_pending() or updates.get_due_time() > now:
+                    continue
+
+                if updates.resync:
+                    updates.resync = False
+                    subscription = updates.subscription
+                    resync = {NOTIF_SUBSCRIPTION_FIELD:
+                              subscription.subscription_uri}
+                    changes.setdefault(UPDATE_TYPE_RESYNC,
+                                       []).append(resync)
+
+                    initial_values = \
+                        yield self._get_initial_values(subscription)
+                    if initial_values:
+                        if not isinstance(initial_values, list):
+                            initial_values = [initial_values]
+                        changes.setdefault(UPDATE_TYPE_ADDED,
+                                           []).extend(initial_values)
+
+                self.pending -= len(updates)
+                updates.take(changes)
+                updates.last_sent = now
+
+            if changes:
+                self._write(changes)
+        except Exception as e:
+            app_log.error("Error sending notifications to %s: %s" %
+                          (self.subscriber_name, e))
+        finally:
+            self._flushing = False
+
+        self.schedule()
+
+    def _write(self, changes):
+        data = encode_json({NOTIF_MSG: changes})
+        future = self._send(self.subscriber_name, data)
+        if future is None:
+            return
+
+        size = len(data)
+        self.buffered += size
+
+        def on_sent(future):
+            self.buffered -= size
+            self.schedule()
+
+        future.add_done_callback(on_sent)
@@ -13,27 +13,18 @@
 #  under the License.
 
 from opsrest.utils.utils import (
-    get_reference_uri,
+    get_serialization_plan,
     row_ovs_column_to_json
 )
 from opsrest.get import get_row_json, get_column_json
-from opsrest.notifications.utils import (
-    get_table_changes_from_idl,
-    is_resource_added,
-    is_resource_deleted,
-    is_resource_modified
-)
 from opsrest.notifications.constants import (
+    NOTIF_DEFAULT_MIN_INTERVAL,
     NOTIF_SUBSCRIPTION_FIELD,
     NOTIF_RESOURCE_FIELD,
     NOTIF_NEW_VALUES_FIELD,
     NOTIF_VALUES_FIELD
 )
-from opsrest.notifications.exceptions import (
-    NotificationMismatch,
-    NotificationValueError
-)
-from tornado.log import app_log
+from opsrest.notifications.exceptions import NotificationValueError
 from tornado import gen
 
 
@@ -58,8 +49,7 @@ def construct_deleted_msg(subscription_uri, resource_uri):
 
 
 @gen.coroutine
-def get_row_initial_values(row, table, schema, idl, resource_uri,
-                           subscription_uri):
+def get_row_values(row, table, schema, idl, resource_uri):
     resource_data = yield get_row_json(row, table, schema, idl, resource_uri)
 
     # Remove categories returned by get_row_json
@@ -67,8 +57,53 @@ def get_row_initial_values(row, table, schema, idl, resource_uri,
     for category, column_data in resource_data.iteritems():
         columns_to_values.update(column_data)
 
-    raise gen.Return(construct_added_msg(subscription_uri, resource_uri,
-                                         columns_to_values))
+    raise gen.Return(columns_to_values)
+
+
+@gen.coroutine
+def get_columns_to_values(columns, row, table, schema, idl, resource_uri):
+    column_to_values = {}
+    schema_table = schema.ovs_tables[table]
+
+    for column in columns:
+        data = None
+
+        if column in schema_table.references:
+            data = yield get_column_json(column, row, table, schema, idl,
+                                         resource_uri)
+        else:
+            ovs_column = None
+
+            if column in schema_table.config:
+                ovs_column = schema_table.config[column]
+            elif column in schema_table.stats:
+                ovs_column = schema_table.stats[column]
+            elif column in schema_table.status:
+                ovs_column = schema_table.status[column]
+            else:
+                raise NotificationValueError("Attribute not found")
+
+            resource_row = idl.tables[table].rows[row]
+            data = row_ovs_column_to_json(resource_row, ovs_column)
+
+        column_to_values[column] = data
+
+    raise gen.Return(column_to_values)
+
+
+def get_category_columns(table_schema, category, plan=None):
+    """
+    Returns the names of the columns of the category, references
+    included, in the serialization plan. The default plan of the table
+    is used if no plan is given.
+    """
+    if plan is None:
+        plan = table_schema.serialization_plan
+
+    columns = set(plan.keys[category])
+    columns.update(name for name, reference, ref_category in plan.references
+                   if ref_category == category)
+    return columns
 
 
 class Subscription(object):
@@ -77,16 +112,88 @@ class Subscription(object):
         self.subscriber_name = subscriber_name
         self.subscription_uri = subscription_uri
 
-    def get_initial_values(self, idl, schema):
-        pass
+        # Seconds between two notifications of the subscription
+        self.min_interval = NOTIF_DEFAULT_MIN_INTERVAL
+
+        # Only the given columns (a frozenset) and the columns of the
+        # given category are notified, all columns if None
+        self.columns = None
+        self.selector = None
+
+    def is_filtered(self):
+        return self.columns is not None or self.selector is not None
+
+    def get_tracked_columns(self, schema):
+        """
+        Returns the columns whose changes are tracked for the
+        subscription, None to track all the columns.
+        """
+        if self.columns is not None:
+            return self.columns
+
+        table_schema = schema.ovs_tables[self.table]
+
+        # The category of dynamic columns depends on the row values
+        if self.selector is not None and not table_schema.dynamic:
+            return get_category_columns(table_schema, self.selector)
+
+        return None
+
+    def get_selected_columns(self, row, schema, idl):
+        """
+        Returns the columns of the row in the category of the selector.
+        """
+        table_schema = schema.ovs_tables[self.table]
+
+        # The category of dynamic columns depends on the row values
+        plan = None
+        if table_schema.dynamic:
+            plan = get_serialization_plan(idl.tables[self.table].rows[row],
+                                          table_schema)
+
+        return get_category_columns(table_schema, self.selector, plan)
+
+    def filter_columns(self, columns, row, schema, idl, cache=None):
+        """
+        Returns the columns notified by the subscription among the given
+        columns of the row. The columns of the selector are taken from
+        the NotificationChangeCache if given.
+        """
+        if self.columns is not None:
+            columns = [column for column in columns if column in self.columns]
+
+        if self.selector is not None and columns:
+            if cache is not None:
+                selected = cache.get_selected_columns(self, row, schema, idl)
+            else:
+                selected = self.get_selected_columns(row, schema, idl)
+            columns = [column for column in columns if column in selected]
+
+        return columns
 
-    def get_changes(self, manager, idl, schema):
+    def get_row_values(self, row, resource_uri, idl, schema, cache):
+        """
+        Returns the EncodedJson of the values of the row notified by the
+        subscription.
+        """
+        if not self.is_filtered():
+            return cache.get_row_values(row, self.table, schema, idl,
+                                        resource_uri)
+
+        return cache.get_filtered_row_values(self, row, schema, idl,
+                                             resource_uri)
+
+    def get_initial_values(self, idl, schema, cache):
         pass
 
     def __str__(self):
         info_str = "Table: %s\n" % self.table
         info_str += "Subscriber Name: %s\n" % self.subscriber_name
         info_str += "Subscription URI: %s\n" % self.subscription_uri
+        info_str += "Min Interval: %s\n" % self.min_interval
+        info_str += "Columns: %s\n" % \
+            (sorted(self.columns) if self.columns is not None else None)
+        info_str += "Selector: %s\n" % self.selector
         return info_str
 
 
@@ -101,69 +208,20 @@ class RowSubscription(Subscription):
         self.row = row
 
     @gen.coroutine
-    def get_initial_values(self, idl, schema):
-        values = yield get_row_initial_values(self.row, self.table, schema,
-                                              idl, self.resource_uri,
-                                              self.subscription_uri)
-        raise gen.Return(values)
-
-    @gen.coroutine
-    def get_changes(self, manager, idl, schema):
-        deleted = None
-        modified = None
-
-        # Check if current subscription is in the list of changes
-        table_changes = get_table_changes_from_idl(self.table, idl)
-        if self.row not in table_changes:
-            raise NotificationMismatch("Row not found in changes.")
-
-        row_change_info = table_changes[self.row]
-
-        # Check if it was deleted or modified
-        if is_resource_modified(row_change_info, manager.curr_seqno):
-            updated_cols = row_change_info.columns
-            columns_to_values = yield self.get_columns_to_values(updated_cols,
-                                                                 idl, schema)
-            modified = construct_modified_msg(self.subscription_uri,
-                                              self.resource_uri,
-                                              columns_to_values)
-        elif is_resource_deleted(row_change_info, manager.curr_seqno):
-            deleted = construct_deleted_msg(self.subscription_uri,
-                                            self.resource_uri)
-        else:
-            raise NotificationMismatch("No changes detected")
+    def get_initial_values(self, idl, schema, cache):
+        values = yield self.get_row_values(self.row, self.resource_uri, idl,
+                                           schema, cache)
+        raise gen.Return(construct_added_msg(self.subscription_uri,
+                                             self.resource_uri, values))
 
-        raise gen.Return((None, modified, deleted))
+    def get_modified_msg(self, columns_to_values):
+        return construct_modified_msg(self.subscription_uri,
+                                      self.resource_uri,
+                                      columns_to_values)
 
-    @gen.coroutine
-    def get_columns_to_values(self, columns, idl, schema):
-        column_to_values = {}
-        schema_table = schema.ovs_tables[self.table]
-
-        for column in columns:
-            data = None
-
-            if column in schema_table.references:
-                data = yield get_column_json(column, self.row, self.table,
-                                             schema, idl, self.resource_uri)
-            else:
-                ovs_column = None
-
-                if column in schema_table.config:
-                    ovs_column = schema_table.config[column]
-                elif column in schema_table.stats:
-                    ovs_column = schema_table.stats[column]
-                elif column in schema_table.status:
-                    ovs_column = schema_table.status[column]
-                else:
-                    raise NotificationValueError("Attribute not found")
-
-                resource_row = idl.tables[self.table].rows[self.row]
-                data = row_ovs_column_to_json(resource_row, ovs_column)
-
-            column_to_values[column] = data
-
-        raise gen.Return(column_to_values)
+    def get_deleted_msg(self):
+        return construct_deleted_msg(self.subscription_uri,
+                                     self.resource_uri)
 
     def __str__(self):
         info_str = super(RowSubscription, self).__str__()
@@ -187,82 +245,33 @@ class CollectionSubscription(Subscription):
         self.rows_to_uri = rows_to_uri
 
     @gen.coroutine
-    def get_initial_values(self, idl, schema):
+    def get_initial_values(self, idl, schema, cache):
         initial_values = []
 
         for row_uuid, resource_uri in self.rows_to_uri.iteritems():
-            data = yield get_row_initial_values(row_uuid, self.table, schema,
-                                                idl, resource_uri,
-                                                self.subscription_uri)
-
-            if data:
-                initial_values.append(data)
+            values = yield self.get_row_values(row_uuid, resource_uri, idl,
+                                               schema, cache)
+            initial_values.append(construct_added_msg(self.subscription_uri,
+                                                      resource_uri, values))
 
         raise gen.Return(initial_values)
 
-    @gen.coroutine
-    def get_changes(self, manager, idl, schema):
-        table_changes = get_table_changes_from_idl(self.table, idl)
-        added = []
-        deleted = []
-
-        for row_uuid, row_change_info in table_changes.iteritems():
-            # Check for additions
-            if is_resource_added(row_change_info, manager.curr_seqno):
-                app_log.debug("Detected new resource added to collection")
-
-                row = idl.tables[self.table].rows[row_uuid]
-
-                # Since added, need to check if it's part of the subscribed
-                # collection URI. Get URI trace for this resource.
-                resource_uri = get_reference_uri(self.table, row, schema, idl)
-                uri_trace = resource_uri.split('/')
-
-                app_log.debug("URI of added resource retrieved: %s" %
-                              resource_uri)
-
-                # Lengths of the resource URI should be greater than the
-                # collection's URI.
-                if len(uri_trace) < len(self.uri_segments):
-                    raise NotificationMismatch("URI not a part of "
-                                               "the collection. Skip.")
-
-                for idx, segment in enumerate(self.uri_segments):
-                    # TODO: In the future, for wildcards, also check for *
-                    if segment != uri_trace[idx]:
-                        # This resource change is not a part of a subscribed
-                        # collection.
-                        app_log.debug("Parents did not match. %s != %s" %
-                                      (segment, uri_trace[idx]))
-                        raise NotificationMismatch("Subscription mismatch.")
-
-                # Add new entry
-                self.rows_to_uri[row_uuid] = resource_uri
-
-                added_data = \
-                    yield get_row_initial_values(row_uuid, self.table,
-                                                 schema, idl,
-                                                 resource_uri,
-                                                 self.subscription_uri)
-
-                added.append(added_data)
-
-            elif is_resource_deleted(row_change_info, manager.curr_seqno):
-                app_log.debug("Detected resource deleted from collection")
-
-                # Check if it's part of a collection that we were tracking
-                if row_uuid in self.rows_to_uri:
-                    app_log.debug("Row found in subscription.")
-
-                    # Grab the resource URI before it's deleted.
-                    data = construct_deleted_msg(self.subscription_uri,
-                                                 self.rows_to_uri[row_uuid])
-                    deleted.append(data)
-                    del self.rows_to_uri[row_uuid]
-            else:
-                raise NotificationMismatch("No changes detected")
-
-        raise gen.Return((added, None, deleted))
+    def add_row(self, row_uuid, resource_uri, columns_to_values):
+        """
+        Starts tracking a row added to the collection and returns its
+        added message.
+        """
+        self.rows_to_uri[row_uuid] = resource_uri
+        return construct_added_msg(self.subscription_uri, resource_uri,
+                                   columns_to_values)
+
+    def remove_row(self, row_uuid):
+        """
+        Stops tracking a row deleted from the collection and returns
+        its deleted message.
+        """
+        resource_uri = self.rows_to_uri.pop(row_uuid)
+        return construct_deleted_msg(self.subscription_uri, resource_uri)
 
     def __str__(self):
         info_str = super(CollectionSubscription, self).__str__()
@@ -12,6 +12,8 @@
 #  License for the specific language governing permissions and limitations
 #  under the License.
 
+import json
+
 from opsrest.notifications.constants import (
     SUBSCRIBER_NAME,
     SUBSCRIBER_TABLE
@@ -43,3 +45,42 @@ def is_table_changed(table, idl):
 
 def lookup_subscriber_by_name(idl, subscriber_name):
     return idl.index_to_row_lookup([subscriber_name], SUBSCRIBER_TABLE)
+
+
+class EncodedJson(object):
+    """
+    A JSON value encoded once, on first use, and embedded as is by
+    encode_json in every message containing it.
+    """
+    def __init__(self, value):
+        self.value = value
+        self._encoded = None
+
+    def encode(self):
+        if self._encoded is None:
+            self._encoded = json.dumps(self.value)
+        return self._encoded
+
+
+def encode_json(data):
+    """
+    Same output as json.dumps, with the EncodedJson values of data
+    copied in already encoded.
+    """
+    if isinstance(data, EncodedJson):
+        return data.encode()
+    elif isinstance(data, dict):
+        return '{' + ', '.join('%s: %s' % (_encode_key(key),
+                                           encode_json(value))
+                               for key, value in data.iteritems()) + '}'
+    elif isinstance(data, list):
+        return '[' + ', '.join(encode_json(value) for value in data) + ']'
+    else:
+        return json.dumps(data)
+
+
+def _encode_key(key):
+    # json.dumps turns non string keys into strings
+    if not isinstance(key, basestring):
+        key = json.dumps(key)
+    return json.dumps(key)
@@ -78,147 +78,205 @@ def parse_url_path(path, schema, idl, http_method='GET'):
     return None
 
 
-def parse(path, resource, schema, idl, http_method):
+class Route(object):
+    '''
+    A precompiled transition of the URI route trie. Each table is a node
+    and each path segment that is allowed after a resource of that table
+    (a forward child column or a plural name) is an edge to the next
+    resource. Index values are bound to rows at request time.
+      - Route.table: table of the next resource
+      - Route.relation: relationship of the next resource to the current
+      - Route.column: forward child column, None for other relations
+      - Route.indexes: index columns to bind, None if indexed by uuid
+    '''
+    def __init__(self, table, relation, column=None, indexes=None,
+                 n_max=None, kv_key_type=None):
+        self.table = table
+        self.relation = relation
+        self.column = column
+        self.indexes = indexes
+        self.n_max = n_max
+        self.kv_key_type = kv_key_type
+
+
+def compile_routes(schema):
+    """
+    Builds the URI route trie from the REST schema.
+    Returns a {table: {path segment: Route}} dictionary.
+    """
+    ovs_tables = schema.ovs_tables
+    routes = {}
+
+    for table_name, table in ovs_tables.iteritems():
+        edges = {}
+
+        # top-level reference or back referenced child
+        for plural_name, name in schema.plural_name_map.iteritems():
+            if name in table.children:
+                relation = OVSDB_SCHEMA_BACK_REFERENCE
+            elif table_name == OVSDB_SCHEMA_SYSTEM_TABLE and \
+                    ovs_tables[name].parent is None:
+                relation = OVSDB_SCHEMA_TOP_LEVEL
+            else:
+                continue
 
-    if not path:
+            edges[plural_name] = Route(name, relation,
+                                       indexes=_get_route_indexes(schema,
+                                                                  name))
+
+        # forward referenced children take precedence
+        for column in table.children:
+            if column not in table.columns or column not in table.references:
+                continue
+
+            reference = table.references[column]
+            kv_key_type = None
+            if reference.kv_type:
+                kv_key_type = reference.kv_key_type.name
+
+            edges[column] = Route(reference.ref_table, OVSDB_SCHEMA_CHILD,
+                                  column, _get_route_indexes(
+                                      schema, reference.ref_table),
+                                  reference.n_max, kv_key_type)
+
+        routes[table_name] = edges
+
+    return routes
+
+
+def _get_route_indexes(schema, table):
+    indexes = schema.ovs_tables[table].indexes
+    if indexes[0] == 'uuid':
         return None
+    return indexes
 
-    ovs_tables = schema.ovs_tables
-    table_names = ovs_tables.keys()
-    new_resource = None
 
-    # check if path[0] is a forward referenced child of resource.table
-    if path[0] in ovs_tables[resource.table].columns \
-            and path[0] in ovs_tables[resource.table].children:
+def get_routes(schema):
+    """
+    Returns the URI route trie of the schema, compiling it on first use.
+    """
+    routes = getattr(schema, 'uri_routes', None)
+    if routes is None:
+        routes = compile_routes(schema)
+        schema.uri_routes = routes
+    return routes
 
-        resource.relation = OVSDB_SCHEMA_CHILD
-        resource.column = path[0]
-        _max = schema.ovs_tables[resource.table].references[resource.column].n_max
-        app_log.debug("%s is a forward child in %s" % (path[0],
-                      resource.table))
 
-        child_table = ovs_tables[resource.table].references[resource.column].ref_table
-        new_resource = Resource(child_table, schema)
-        resource.next = new_resource
+def parse(path, resource, schema, idl, http_method):
 
-        # index columns
-        indexes = ovs_tables[new_resource.table].indexes if \
-                ovs_tables[new_resource.table].indexes[0] != 'uuid' else None
-        path = path[1:]
+    routes = get_routes(schema)
 
-        if not path and _max > 1:
-            # done parsing uri
-            return
+    while path:
+        route = routes[resource.table].get(path[0])
+        if route is None:
+            app_log.debug('URI not allowed: relationship does not exist')
+            raise Exception
 
-        if _max == 1:
-            parent = idl.tables[resource.table].rows[resource.row]
-            child_row = parent.__getattr__(resource.column)
-            if not child_row and path:
-                raise Exception
-            elif not child_row and not path:
-                return
-            elif isinstance(child_row, list):
-                new_resource.row = child_row[0].uuid
-            elif isinstance(child_row, dict):
-                new_resource.row = child_row.values()[0].uuid
-                new_resource.index = child_row.keys()[0]
-
-        elif indexes:
-            if len(path) < len(indexes):
-                # not enough indices
-                raise Exception
+        resource.relation = route.relation
+        new_resource = Resource(route.table, schema)
+        resource.next = new_resource
+        path = path[1:]
 
-            index_list = path[0:len(indexes)]
-            row = verify_index(new_resource, resource, index_list, schema, idl)
-            if row is None:
-                # row with index doesn't exist
-                raise Exception
+        if route.relation == OVSDB_SCHEMA_CHILD:
+            resource.column = route.column
+            app_log.debug("%s is a forward child in %s" % (route.column,
+                          resource.table))
 
-            new_resource.row = row.uuid
-            new_resource.index = index_list
-            path = path[len(index_list):]
+            if not path and route.n_max > 1:
+                # done parsing uri
+                return
 
+            path = bind_child(path, route, resource, new_resource,
+                              schema, idl)
+            if path is None:
+                return
         else:
-            # children are either an ordered list or a dict
-            parent = idl.tables[resource.table].rows[resource.row]
-            children = parent.__getattr__(resource.column)
-            if not children:
-                raise Exception
+            app_log.debug("%s is a %s in %s" % (route.table, route.relation,
+                          resource.table))
+
+            # done processing URI
+            if not path:
+                return
 
-            index = path[0]
-            if isinstance(children, dict):
-                column = schema.ovs_tables[resource.table].references[resource.column]
-                key_type = column.kv_key_type.name
-                if key_type  == 'integer':
-                    index = int(index)
-                elif key_type == 'uuid':
+            # URI has an index to a resource
+            if route.indexes:
+                if len(path) < len(route.indexes):
                     raise Exception
-            else:
-                # ordered list
-                index = int(index)
 
-            try:
-                row = children[index]
+                index_list = path[0:len(route.indexes)]
+                row = verify_index(new_resource, resource, index_list,
+                                   schema, idl)
                 new_resource.row = row.uuid
-                new_resource.index = index
-                path = path[1:]
-            except:
-                # not found
-                raise Exception
+                new_resource.index = index_list
+                path = path[len(index_list):]
 
-    # top-level reference or back referenced child
-    elif path[0] in schema.plural_name_map:
-        # check if path[0] is a back referenced child of resource.table
-        path[0] = schema.plural_name_map[path[0]]
-        if path[0] in ovs_tables[resource.table].children:
-            resource.relation = OVSDB_SCHEMA_BACK_REFERENCE
-            new_resource = Resource(path[0], schema)
-            resource.next = new_resource
-            app_log.debug("%s is a backward child in %s"
-                          % (path[0], resource.table))
-
-        # or if path[0] is a top level table
-        elif resource.table == OVSDB_SCHEMA_SYSTEM_TABLE and \
-                ovs_tables[path[0]].parent is None:
-                    resource.relation = OVSDB_SCHEMA_TOP_LEVEL
-                    new_resource = Resource(path[0], schema)
-                    resource.next = new_resource
-                    app_log.debug("%s is a top level table" % (path[0]))
-
-        # do not proceed if relationship cannot be ascertained
-        if not resource.relation:
-            app_log.debug('URI not allowed: relationship does not exist')
+        app_log.debug("table: %s, row: %s, column: %s, relation: %s"
+                      % (resource.table, str(resource.row),
+                          str(resource.column), str(resource.relation)))
+
+        resource = new_resource
+
+
+def bind_child(path, route, resource, new_resource, schema, idl):
+    """
+    Binds the index of a forward referenced child to its row.
+    Returns the remaining path, or None if parsing is done.
+    """
+    if route.n_max == 1:
+        parent = idl.tables[resource.table].rows[resource.row]
+        child_row = parent.__getattr__(resource.column)
+        if not child_row and path:
+            raise Exception
+        elif not child_row and not path:
+            return None
+        elif isinstance(child_row, list):
+            new_resource.row = child_row[0].uuid
+        elif isinstance(child_row, dict):
+            new_resource.row = child_row.values()[0].uuid
+            new_resource.index = child_row.keys()[0]
+
+    elif route.indexes:
+        if len(path) < len(route.indexes):
+            # not enough indices
             raise Exception
 
-        indexes = ovs_tables[new_resource.table].indexes if \
-                ovs_tables[new_resource.table].indexes[0] != 'uuid' else None
-        path = path[1:]
+        index_list = path[0:len(route.indexes)]
+        row = verify_index(new_resource, resource, index_list, schema, idl)
+        if row is None:
+            # row with index doesn't exist
+            raise Exception
 
-        # done processing URI
-        if not path:
-            return
-        # URI has an index to a resource
-        elif indexes:
+        new_resource.row = row.uuid
+        new_resource.index = index_list
+        path = path[len(index_list):]
+
+    else:
+        # children are either an ordered list or a dict
+        parent = idl.tables[resource.table].rows[resource.row]
+        children = parent.__getattr__(resource.column)
+        if not children:
+            raise Exception
 
-            if len(path) < len(indexes):
+        index = path[0]
+        if isinstance(children, dict):
+            if route.kv_key_type == 'integer':
+                index = int(index)
+            elif route.kv_key_type == 'uuid':
                 raise Exception
+        else:
+            # ordered list
+            index = int(index)
 
-            index_list = path[0:len(indexes)]
-            row = verify_index(new_resource, resource, index_list, schema, idl)
+        try:
+            row = children[index]
             new_resource.row = row.uuid
-            new_resource.index = index_list
-            path = path[len(index_list):]
-
-    if not new_resource:
-        app_log.debug('URI not allowed: relationship does not exist')
-        raise Exception
-
-    app_log.debug("table: %s, row: %s, column: %s, relation: %s"
-                  % (resource.table, str(resource.row),
-                      str(resource.column), str(resource.relation)))
+            new_resource.index = index
+            path = path[1:]
+        except:
+            # not found
+            raise Exception
 
-    # continue processing the path further
-    parse(path, new_resource, schema, idl, http_method)
+    return path
 
 
 def verify_index(resource, parent, index_values, schema, idl):
@@ -240,8 +298,10 @@ def verify_index(resource, parent, index_values, schema, idl):
             return False
 
         dbtable = idl.tables[resource.table]
-        row = utils.index_to_row(index_values, schema.ovs_tables[resource.table], dbtable)
-        if row.__getattr__(_refCol).uuid == parent.row:
+        row = utils.index_to_row(index_values,
+                                 schema.ovs_tables[resource.table], dbtable,
+                                 parent.row)
+        if row is not None and row.__getattr__(_refCol).uuid == parent.row:
             return row
         else:
             return None
@@ -30,7 +30,7 @@ from tornado import gen
 
 
 @gen.coroutine
-def patch_resource(data, resource, schema, txn, idl, uri):
+def patch_resource(data, resource, schema, txn, idl, uri, commit=True):
 
     # Allow PATCH operation on System table
     if resource is None:
@@ -96,7 +96,7 @@ def patch_resource(data, resource, schema, txn, idl, uri):
             app_log.debug(e.error)
             raise DataValidationFailed(e.error)
 
-    result = txn.commit()
+    result = txn.commit() if commit else UNCOMMITTED
     raise gen.Return(OvsdbTransactionResult(result))
 
 
@@ -22,7 +22,7 @@ from opsvalidator.error import ValidationError
 from tornado.log import app_log
 
 
-def post_resource(data, resource, schema, txn, idl):
+def post_resource(data, resource, schema, txn, idl, commit=True):
     """
     /system/bridges: POST allowed as we are adding a new Bridge
                      to a child table
@@ -99,6 +99,6 @@ def post_resource(data, resource, schema, txn, idl):
         raise DataValidationFailed(e.error)
 
     index = utils.create_index(schema, verified_data, resource, new_row)
-    result = txn.commit()
+    result = txn.commit() if commit else UNCOMMITTED
 
-    return OvsdbTransactionResult(result, index)
+    return OvsdbTransactionResult(result, index, new_row)
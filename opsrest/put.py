@@ -22,7 +22,7 @@ from opsvalidator.error import ValidationError
 from tornado.log import app_log
 
 
-def put_resource(data, resource, schema, txn, idl):
+def put_resource(data, resource, schema, txn, idl, commit=True):
 
     # Allow PUT operation on System table
     if resource is None:
@@ -103,5 +103,5 @@ def put_resource(data, resource, schema, txn, idl):
         app_log.debug(e.error)
         raise DataValidationFailed(e.error)
 
-    result = txn.commit()
+    result = txn.commit() if commit else UNCOMMITTED
     return OvsdbTransactionResult(result)
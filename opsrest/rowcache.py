@@ -0,0 +1,105 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+from collections import OrderedDict
+
+from tornado.log import app_log
+
+
+class RowJsonCache:
+    '''
+    LRU cache of the categorized JSON of a row as returned by
+    get.get_row_json. Entries are keyed by a tuple starting with
+    (table, uuid). The JSON of a row embeds the URIs of the rows it
+    references, so each entry is stored with the (table, uuid) of every
+    row its JSON depends on, and is invalidated when the IDL reports
+    any of them as changed.
+    '''
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+        # (table, uuid) to the keys of the entries depending on the row,
+        # and key to the rows its entry depends on
+        self._keys_by_row = {}
+        self._rows_by_key = {}
+
+    def get(self, key):
+        data = self._entries.pop(key, None)
+        if data is None:
+            return None
+
+        # Move the entry to the most recently used end
+        self._entries[key] = data
+        return _copy_categories(data)
+
+    def set(self, key, data, dependencies=()):
+        """
+        Stores the data of the row key[:2], depending on the rows of
+        dependencies as well.
+        """
+        if self.max_entries <= 0:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        elif len(self._entries) >= self.max_entries:
+            self._evict()
+
+        rows = set(dependencies)
+        rows.add(key[:2])
+
+        self._entries[key] = _copy_categories(data)
+        self._rows_by_key[key] = rows
+        for row in rows:
+            self._keys_by_row.setdefault(row, set()).add(key)
+
+    def invalidate(self, table, uuid):
+        keys = self._keys_by_row.pop((table, uuid), None)
+        if keys:
+            for key in list(keys):
+                self._remove(key)
+
+    def invalidate_rows(self, changed_rows):
+        for table, uuid in changed_rows:
+            self.invalidate(table, uuid)
+
+    def clear(self):
+        app_log.debug("Clearing row JSON cache")
+        self._entries.clear()
+        self._keys_by_row.clear()
+        self._rows_by_key.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self):
+        key = next(iter(self._entries))
+        self._remove(key)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        for row in self._rows_by_key.pop(key, ()):
+            keys = self._keys_by_row.get(row)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_row[row]
+
+
+def _copy_categories(data):
+    # Callers may remove keys from the categories (e.g. keys query
+    # argument), so the cached dictionaries are never handed out
+    return dict((category, dict(values))
+                for category, values in data.iteritems())
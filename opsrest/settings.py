@@ -36,6 +36,7 @@ settings['ovs_remote'] = 'unix:/var/run/openvswitch/db.sock'
 settings['ovs_schema'] = '/usr/share/openvswitch/vswitch.ovsschema'
 settings['ext_schema'] = '/usr/share/openvswitch/openswitch.opsschema'
 settings['auth_enabled'] = True
+settings['write_batching'] = False
 settings['cfg_db_schema'] = '/usr/share/openvswitch/configdb.ovsschema'
 
 settings["account_schema"] = os.path.join(os.path.dirname(custom.__file__),
@@ -1,4 +1,4 @@
-# Copyright (C) 2015 Hewlett Packard Enterprise Development LP
+# Copyright (C) 2015-2016 Hewlett Packard Enterprise Development LP
 #
 #  Licensed under the Apache License, Version 2.0 (the "License"); you may
 #  not use this file except in compliance with the License. You may obtain
@@ -17,12 +17,23 @@ import json
 from tornado.locks import Event
 
 
-class OvsdbTransactionList:
+class OvsdbTransactionTracker:
+    '''
+    Keeps the pending transactions by the JSON-RPC id of their transact
+    request, so the reply to a request completes only the transaction
+    that sent it.
+    '''
     def __init__(self):
-        self.txn_list = []
+        self.txns = {}
 
     def add_txn(self, txn):
-        self.txn_list.append(txn)
+        self.txns[txn.get_request_id()] = txn
+
+    def pop_txn(self, request_id):
+        return self.txns.pop(request_id, None)
+
+    def __len__(self):
+        return len(self.txns)
 
 
 class OvsdbTransaction:
@@ -42,11 +53,35 @@ class OvsdbTransaction:
         if self.txn is not None:
             self.txn.abort()
 
+    def get_updates(self):
+        '''
+        Returns the set of the (row uuid, column) pairs the transaction
+        really changes, the column is None for the rows inserted or
+        deleted.
+        '''
+        updates = set()
+        for row in self.txn._txn_rows.itervalues():
+            if row._changes is None or row._data is None:
+                updates.add((row.uuid, None))
+                continue
+
+            for column, datum in row._changes.iteritems():
+                if row._data[column] != datum:
+                    updates.add((row.uuid, column))
+
+        return updates
+
+    def get_request_id(self):
+        return self.txn._request_id
+
     def get_error(self):
         return json.loads(self.txn.get_error())
 
 
 class OvsdbTransactionResult:
-    def __init__(self, status, index=None):
+    def __init__(self, status, index=None, row=None):
         self.status = status
         self.index = index
+
+        # Row created by a POST
+        self.row = row
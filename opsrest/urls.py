@@ -16,11 +16,13 @@ from opsrest.handlers.staticcontent import StaticContentHandler
 from opsrest.handlers.login import LoginHandler
 from opsrest.handlers.logout import LogoutHandler
 from opsrest.handlers.ovsdbapi import OVSDBAPIHandler
+from opsrest.handlers.batch import BatchHandler
 from opsrest.handlers.customrest import CustomRESTHandler
 from opsrest.handlers.websocket.notifications import WSNotificationsHandler
 from custom.logcontroller import LogController
 from custom.accountcontroller import AccountController
 from custom.configcontroller import ConfigController
+from custom.configjobcontroller import ConfigJobController
 
 REGEX_RESOURCE_ID = '?(?P<resource_id>[A-Za-z0-9-_]+[$]?)?/?'
 
@@ -30,6 +32,7 @@ url_patterns =\
      (r'/rest/v1/login', LoginHandler),
      (r'/rest/v1/logout', LogoutHandler),
      (r'/rest/v1/ws/notifications', WSNotificationsHandler),
+     (r'/rest/v1/batch', BatchHandler),
      (r'/rest/v1/system', OVSDBAPIHandler),
      (r'/rest/v1/system/.*', OVSDBAPIHandler)]
 
@@ -39,7 +42,9 @@ custom_url_patterns =\
      # TODO new handler for account API to replace /account above
      (r'/rest/v1/account', CustomRESTHandler, AccountController),
      (r'/rest/v1/system/full-configuration', CustomRESTHandler,
-      ConfigController)]
+      ConfigController),
+     (r'/rest/v1/system/full-configuration/jobs/' + REGEX_RESOURCE_ID,
+      CustomRESTHandler, ConfigJobController)]
 
 static_url_patterns =\
     [(r"/api/(.*)", StaticContentHandler,
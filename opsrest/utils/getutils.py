@@ -17,6 +17,9 @@ from opsrest.utils import utils
 from opsrest.verify import convert_string_to_value_by_type
 from opsrest.exceptions import DataValidationFailed
 
+import base64
+import bisect
+import json
 import re
 
 
@@ -44,6 +47,41 @@ def get_depth_param(query_arguments):
     return depth
 
 
+def get_max_age_param(query_arguments, headers=None):
+    """
+    Returns the seconds the on demand fetched read-only columns may be
+    reused, from the max-age query argument or else the max-age or
+    no-cache directives of the Cache-Control header. None when the
+    request does not ask for any.
+    """
+    max_age_param = get_query_arg(REST_QUERY_PARAM_MAX_AGE, query_arguments)
+
+    if max_age_param is None and headers is not None:
+        cache_control = headers.get(HTTP_HEADER_CACHE_CONTROL, '')
+        for directive in cache_control.split(','):
+            directive = directive.strip().lower()
+            if directive == 'no-cache':
+                max_age_param = '0'
+            elif directive.startswith(REST_QUERY_PARAM_MAX_AGE + '='):
+                max_age_param = directive.split('=', 1)[1]
+
+    if max_age_param is None:
+        return None
+
+    try:
+        max_age = int(max_age_param)
+        if max_age < 0 or max_age > READONLY_FETCH_MAX_AGE_LIMIT:
+            raise ValueError
+    except ValueError:
+        error_json = utils.to_json_error("Max-age parameter must be a " +
+                                         "number greater or equal than 0 " +
+                                         "and lower or equal than " +
+                                         str(READONLY_FETCH_MAX_AGE_LIMIT))
+        return {ERROR: error_json}
+
+    return max_age
+
+
 def get_query_arg(name, query_arguments):
     arg = None
     if query_arguments is not None and name in query_arguments:
@@ -140,8 +178,30 @@ def validate_query_args(sorting_args, filter_args, pagination_args,
         error_json = utils.to_json_error("Pagination indexes must be numbers")
         return {ERROR: error_json}
 
+    # An empty cursor requests the first page
+    cursor = get_query_arg(REST_QUERY_PARAM_CURSOR, query_arguments)
+    if cursor is not None:
+        if offset is not None:
+            error_json = utils.to_json_error("Pagination cursor can't be " +
+                                             "used with offset", None,
+                                             REST_QUERY_PARAM_CURSOR)
+            return {ERROR: error_json}
+
+        if limit is not None and limit <= 0:
+            error_json = utils.to_json_error("Pagination index out of range",
+                                             None, REST_QUERY_PARAM_LIMIT)
+            return {ERROR: error_json}
+
+        if cursor and decode_cursor(cursor) is None:
+            error_json = utils.to_json_error("Invalid pagination cursor",
+                                             None, REST_QUERY_PARAM_CURSOR)
+            return {ERROR: error_json}
+
+        pagination_args[REST_QUERY_PARAM_CURSOR] = cursor
+
     if depth == 0 and (sorting_args or filter_args or keys_args or
-                       offset is not None or limit is not None):
+                       offset is not None or limit is not None or
+                       cursor is not None):
         error_json = utils.to_json_error("Sort, filter, keys and " +
                                          "pagination parameters are only " +
                                          "supported for depth > 0")
@@ -163,6 +223,7 @@ def validate_non_plural_query_args(query_arguments):
     if REST_QUERY_PARAM_SORTING in query_arguments or \
             REST_QUERY_PARAM_OFFSET in query_arguments or \
             REST_QUERY_PARAM_LIMIT in query_arguments or \
+            REST_QUERY_PARAM_CURSOR in query_arguments or \
             REST_QUERY_PARAM_KEYS in query_arguments:
         return error_json
 
@@ -181,6 +242,9 @@ def validate_non_plural_query_args(query_arguments):
     if REST_QUERY_PARAM_DEPTH in query_arguments:
         valid_keys_count += 1
 
+    if REST_QUERY_PARAM_MAX_AGE in query_arguments:
+        valid_keys_count += 1
+
     invalid_keys_count = len(query_arguments) - valid_keys_count
 
     if invalid_keys_count > 0:
@@ -271,7 +335,8 @@ def get_filters_args(query_arguments, schema, resource=None):
             # NOTE any new query keys should be added to this condition
             if key in (REST_QUERY_PARAM_LIMIT, REST_QUERY_PARAM_OFFSET,
                        REST_QUERY_PARAM_DEPTH, REST_QUERY_PARAM_SORTING,
-                       REST_QUERY_PARAM_SELECTOR, REST_QUERY_PARAM_KEYS):
+                       REST_QUERY_PARAM_SELECTOR, REST_QUERY_PARAM_KEYS,
+                       REST_QUERY_PARAM_CURSOR, REST_QUERY_PARAM_MAX_AGE):
                 continue
             elif key in valid_keys:
                 filters[key] = []
@@ -322,6 +387,200 @@ def post_process_get_data(get_data, sorting_args, filter_args, offset, limit,
     return processed_get_data
 
 
+def plan_collection_rows(rows, table, schema, selector, sorting_args,
+                         filter_args, offset=None, limit=None):
+    """
+    Query planner for collection GETs. Filters, sorts and paginates
+    the ovs.db.idl.Row list on the values of the filter and sort
+    columns only, so that just the returned page has to be serialized.
+    Semantics are the same as post_process_get_data on the JSON rows.
+
+    Returns the selected rows, an error dictionary if pagination is
+    out of range, or None if the query needs the serialized rows
+    (e.g. a filter or sort on a reference column).
+    """
+    sort_columns = []
+    reverse_sort = False
+    if sorting_args:
+        sort_columns = sorting_args[:-1]
+        reverse_sort = sorting_args[-1]
+
+    columns = get_plan_columns(table, schema, selector,
+                               filter_args.keys() + sort_columns)
+    if columns is None:
+        return None
+
+    selected = []
+    for row in rows:
+        values = get_row_plan_values(row, columns)
+        if filter_args and \
+                not filter_get_results([values], filter_args, schema, table):
+            continue
+
+        sort_key = tuple(process_sort_value(values, column, False)
+                         for column in sort_columns)
+        selected.append((sort_key, row))
+
+    if sort_columns:
+        selected.sort(key=lambda item: item[0], reverse=reverse_sort)
+
+    return paginate_get_results([row for unused, row in selected],
+                                offset, limit)
+
+
+def get_plan_columns(table, schema, selector, column_names):
+    """
+    Returns the {column: OVSColumn} dictionary used to evaluate the
+    given columns on IDL rows, or None if one of them cannot be
+    evaluated before serialization.
+    """
+    table_schema = schema.ovs_tables[table]
+    columns = {}
+    for column in set(column_names):
+        ovs_column = _get_plannable_column(column, table_schema, selector)
+        if ovs_column is False:
+            return None
+        columns[column] = ovs_column
+    return columns
+
+
+def get_row_plan_values(row, columns):
+    # Same values as get_row_json, empty values are left out
+    values = {}
+    for column, ovs_column in columns.iteritems():
+        if ovs_column is None:
+            continue
+        value = utils.row_ovs_column_to_json(row, ovs_column)
+        if not is_empty_value(value):
+            values[column] = value
+    return values
+
+
+def encode_cursor(direction, key):
+    """
+    Returns the opaque pagination cursor of a position in a collection.
+    direction is either 'next' or 'prev' and key is the sort key of
+    the row next to the position, ending with the row UUID.
+    """
+    return base64.urlsafe_b64encode(json.dumps([direction, list(key)]))
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (direction, key) of a cursor or None if it is invalid.
+    """
+    try:
+        direction, key = json.loads(base64.urlsafe_b64decode(str(cursor)))
+    except Exception:
+        return None
+
+    if direction not in (CURSOR_NEXT, CURSOR_PREV) or \
+            not isinstance(key, list) or not key:
+        return None
+
+    return (direction, _to_tuple(key))
+
+
+def seek_cursor_page(keys, cursor, limit, reverse=False, accept=None):
+    """
+    Returns a page of a collection given its keys in ascending order,
+    each one ending with the row UUID. The page starts right after the
+    key of a 'next' cursor, or ends right before the key of a 'prev'
+    cursor, in ascending order or descending order if reverse is True.
+    An empty cursor is the first page. Keys for which accept returns
+    False are skipped.
+
+    Returns (page_keys, prev_key, next_key), where prev_key and
+    next_key are None when there are no more rows in that direction.
+    """
+    direction = CURSOR_NEXT
+    if cursor:
+        direction, key = decode_cursor(cursor)
+
+    # Walk the keys from the cursor in the requested direction
+    forward = (direction == CURSOR_NEXT) != reverse
+    if not cursor:
+        start = len(keys) - 1 if reverse else 0
+    elif forward:
+        start = bisect.bisect_right(keys, key)
+    else:
+        start = bisect.bisect_left(keys, key) - 1
+    step = 1 if forward else -1
+
+    page = []
+    position = start
+    while 0 <= position < len(keys) and len(page) < limit:
+        if accept is None or accept(keys[position]):
+            page.append(keys[position])
+        position += step
+
+    more_after = _has_accepted_key(keys, position, step, accept)
+    more_before = cursor and _has_accepted_key(keys, start - step, -step,
+                                               accept)
+
+    # Page in the display order of the collection
+    if step < 0:
+        page.reverse()
+    if reverse:
+        page.reverse()
+
+    if direction == CURSOR_PREV:
+        more_before, more_after = more_after, more_before
+
+    prev_key = page[0] if page and more_before else None
+    next_key = page[-1] if page and more_after else None
+    return (page, prev_key, next_key)
+
+
+def _has_accepted_key(keys, position, step, accept):
+    while 0 <= position < len(keys):
+        if accept is None or accept(keys[position]):
+            return True
+        position += step
+    return False
+
+
+def get_cursor_sort_key(values, sort_columns):
+    # The key must survive the JSON encoding of cursors
+    return _to_tuple(tuple(process_sort_value(values, column, False)
+                           for column in sort_columns))
+
+
+def _to_tuple(value):
+    # JSON turns the tuples of a sort key into lists and its strings
+    # into unicode
+    if isinstance(value, (list, tuple)):
+        return tuple(_to_tuple(item) for item in value)
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def _get_plannable_column(column, table_schema, selector):
+    """
+    Returns the OVSColumn to evaluate, None if the column is not part
+    of the selected category, or False if it cannot be evaluated
+    before serialization.
+    """
+    if column in table_schema.references:
+        return False
+
+    # The category of a dynamic column depends on the row
+    if column in table_schema.dynamic and selector is not None:
+        return False
+
+    for category, category_columns in \
+            ((OVSDB_SCHEMA_CONFIG, table_schema.config),
+             (OVSDB_SCHEMA_STATS, table_schema.stats),
+             (OVSDB_SCHEMA_STATUS, table_schema.status)):
+        if column in category_columns:
+            if selector is None or selector == category:
+                return category_columns[column]
+            return None
+
+    return False
+
+
 def filter_get_results(get_data, filters, schema, table=None,
                        categorized=False):
     filtered_data = []
@@ -19,6 +19,7 @@ import types
 import uuid
 import re
 import urllib
+import json
 
 from opsrest.resource import Resource
 from opsrest.constants import *
@@ -27,7 +28,6 @@ from tornado.log import app_log
 from opsrest.exceptions import DataValidationFailed
 from tornado.options import options
 from tornado import gen
-from opslib.restparser import ON_DEMAND_FETCHED_TABLES
 
 
 def get_row_from_resource(resource, idl):
@@ -388,6 +388,45 @@ def row_ovs_column_to_json(row, ovs_column):
     return to_json(attribute, value_type)
 
 
+def get_serialization_plan(row, table_schema):
+    """
+    Returns the OVSSerializationPlan of the row, which depends on the
+    row values for tables with dynamic categories.
+    """
+    return table_schema.get_serialization_plan(
+        lambda column: get_column_data_from_row(row, column))
+
+
+def row_to_json_by_plan(row, plan, categories, with_empty_values=False,
+                        columns=None):
+    """
+    Serializes the non-reference columns of the row that belong to
+    the given categories following an OVSSerializationPlan. Empty
+    values are left out unless with_empty_values is True. If columns
+    is given, only those columns are serialized.
+    Returns a category to column data dictionary.
+    """
+    data = {}
+    for category in categories:
+        category_data = {}
+        for name, column, is_scalar, value_type in plan.columns[category]:
+            if columns is not None and name not in columns:
+                continue
+
+            # Same conversion as row_ovs_column_to_json
+            value = row.__getattr__(name)
+            if is_scalar and type(value) is list:
+                value = value[0] if value else None
+            value = to_json(value, value_type)
+
+            if with_empty_values or \
+                    not (value is None or value == {} or value == []):
+                category_data[name] = value
+        data[category] = category_data
+
+    return data
+
+
 def row_to_json(row, column_keys):
 
     data_json = {}
@@ -540,16 +579,69 @@ def list_to_json(data, value_type=None):
     return data_json
 
 
-def index_to_row(index_values, table_schema, dbtable):
+def index_to_row(index_values, table_schema, dbtable, parent_uuid=None):
     """
     This subroutine fetches the row reference using index_values.
     index_values is a list which contains the combination indices
-    that are used to identify a resource.
+    that are used to identify a resource, as unquoted by split_path.
+    parent_uuid is the UUID of the parent row for back referenced
+    children, whose 'parent' column is part of the table index.
     """
     indexes = table_schema.indexes
     if len(index_values) != len(indexes):
         return None
 
+    index_values = [str(value) for value in index_values]
+
+    if indexes == ['uuid']:
+        try:
+            return dbtable.rows.get(uuid.UUID(index_values[0]))
+        except ValueError:
+            return None
+
+    index = _get_index_map_key(index_values, table_schema, dbtable,
+                               parent_uuid)
+    if index is None:
+        return _index_to_row_scan(index_values, table_schema, dbtable)
+
+    row = dbtable.index_map.get(index)
+    if row is None or row.uuid not in dbtable.rows:
+        return None
+
+    return row
+
+
+def _get_index_map_key(index_values, table_schema, dbtable, parent_uuid):
+    """
+    Builds the OpsIdl index_map key of a row from the REST index values.
+    Returns None if the table index cannot be resolved through the map.
+    """
+    if getattr(dbtable, 'index_map', None) is None or not dbtable.indexes:
+        return None
+
+    values = dict(zip(table_schema.indexes, index_values))
+    for column in table_schema.index_columns:
+        if column in values:
+            if column in table_schema.references:
+                return None
+        elif (column in table_schema.references and
+                table_schema.references[column].relation ==
+                OVSDB_SCHEMA_PARENT and parent_uuid is not None):
+            values[column] = str(parent_uuid)
+        else:
+            return None
+
+    index = []
+    for column in dbtable.indexes[0]:
+        if column.name not in values:
+            return None
+        index.append(values[column.name])
+
+    return tuple(index)
+
+
+def _index_to_row_scan(index_values, table_schema, dbtable):
+    indexes = table_schema.indexes
     for row in dbtable.rows.itervalues():
         i = 0
         for index, value in zip(indexes, index_values):
@@ -611,6 +703,49 @@ def create_index(schema, data, resource, row):
     return str(index)
 
 
+def get_write_keys(resource, schema, method, data=None):
+    """
+    Returns the set of keys of what a write request changes, so the
+    write batcher does not merge conflicting writes: the (table, uuid)
+    of the row written, or for a POST the (parent uuid, table, index)
+    of the new row, the parent being None for top-level tables. A POST
+    of a row indexed by UUID never conflicts.
+    """
+    while resource.next is not None and resource.next.next is not None:
+        resource = resource.next
+
+    if method != REQUEST_TYPE_CREATE:
+        target = resource.next or resource
+        return set([(target.table, target.row)])
+
+    if resource.next is None:
+        return set()
+
+    table = resource.next.table
+    indexes = schema.ovs_tables[table].indexes
+    config = {}
+    if isinstance(data, dict):
+        config = data.get(OVSDB_SCHEMA_CONFIG) or {}
+
+    if len(indexes) == 1 and indexes[0] == 'uuid':
+        if resource.relation != OVSDB_SCHEMA_CHILD:
+            return set()
+        ref = schema.ovs_tables[resource.table].references[resource.column]
+        if not ref.kv_type:
+            return set()
+        indexes = [ref.keyname]
+
+    # Values of the request body may be lists or dictionaries
+    index = tuple(json.dumps(config.get(column), sort_keys=True)
+                  for column in indexes)
+
+    parent = None
+    if resource.relation != OVSDB_SCHEMA_TOP_LEVEL:
+        parent = resource.row
+
+    return set([(parent, table, index)])
+
+
 def row_to_index(row, table, restschema, idl, parent_row=None):
 
     index = None
@@ -633,7 +768,10 @@ def row_to_index(row, table, restschema, idl, parent_row=None):
                     # TODO: check if this row exists in parent table
                     parent_rows = [parent_row]
                 else:
-                    parent_rows = idl.tables[parent].rows.values()
+                    # only the row owning this child needs to be checked
+                    owner = idl.parent_reference_lookup(row.uuid, table,
+                                                        parent, column_name)
+                    parent_rows = [owner[0]] if owner else []
 
                 for item in parent_rows:
                     column_data = item.__getattr__(column_name)
@@ -750,17 +888,10 @@ def get_parent_row(table_name, child_row, column, schema, idl):
     Returns idl.Row object
     """
     table = schema.ovs_tables[table_name]
-    for uuid, row_ref in idl.tables[table_name].rows.iteritems():
-        reflist = get_column_data_from_row(row_ref, column)
-        for value in reflist:
-            if table.references[column].kv_type:
-                db_col = row_ref.__getattr__(column)
-                row_value = db_col[value]
-                if row_value.uuid == child_row.uuid:
-                    return row_ref, value
-            else:
-                if value.uuid == child_row.uuid:
-                    return row_ref, None
+    child_table = table.references[column].ref_table
+    # The IDL keeps a child UUID to parent row map for child references
+    return idl.parent_reference_lookup(child_row.uuid, child_table,
+                                       table_name, column)
 
 
 def get_table_key(row, table_name, schema, idl, forward_ref=True):
@@ -840,18 +971,11 @@ def exec_validators_with_resource(idl, schema, resource, http_method):
 
     elif child_resource.row is None and resource.relation == OVSDB_SCHEMA_BACK_REFERENCE:
         p_row = idl.tables[p_table_name].rows[resource.row]
-        refcol = None
-        refkeys = schema.ovs_tables[table_name].references
-        for key, value in refkeys.iteritems():
-            if (value.relation == OVSDB_SCHEMA_PARENT and
-                    value.ref_table == p_table_name):
-                refcol = key
-                break
-
-        for row in idl.tables[child_resource.table].rows.itervalues():
-            if row.__getattr__(refcol) == p_row:
-                validator.exec_validators(idl, schema, table_name, row,
-                                          http_method, p_table_name, p_row)
+        children = get_back_reference_children(p_row, p_table_name,
+                                               table_name, schema, idl)
+        for row in children or []:
+            validator.exec_validators(idl, schema, table_name, row,
+                                      http_method, p_table_name, p_row)
     else:
         row = idl.tables[table_name].rows[child_resource.row]
         validator.exec_validators(idl, schema, table_name, row, http_method,
@@ -880,6 +1004,10 @@ def update_category_keys(keys, row, idl, schema, table):
         -schema: RestSchema
         -idl: Idl instance
         -table: table name
+
+    The returned keys are the precompiled category view of the row
+    values. Views are shared, the key dictionaries and their columns
+    must not be modified.
     """
     if row is None \
             or not isinstance(row, (ovs.db.idl.Row, dict)):
@@ -898,63 +1026,22 @@ def update_category_keys(keys, row, idl, schema, table):
                       "have dynamic columns")
         return keys
 
-    # Get all columns
-    columns = {}
-    columns.update(keys[OVSDB_SCHEMA_CONFIG])
-    columns.update(keys[OVSDB_SCHEMA_STATUS])
-    columns.update(keys[OVSDB_SCHEMA_STATS])
-    references = keys[OVSDB_SCHEMA_REFERENCE]
-
-    dynamic_columns = ovs_table.dynamic
-    for column_name, category_obj in dynamic_columns.iteritems():
-        # Store the column used to get the category value
-        if category_obj.follows is not None:
-            source_column = category_obj.follows
-        elif category_obj.per_value is not None:
-            source_column = column_name
-
-        column_data = None
-        # Get column data from follows/per_value
-        if isinstance(row, ovs.db.idl.Row):
-            column_data = get_column_data_from_row(row, source_column)
-        elif isinstance(row, dict):
-            if source_column in row:
-                column_data = row[source_column]
-            else:
+    if isinstance(row, ovs.db.idl.Row):
+        plan = get_serialization_plan(row, ovs_table)
+    else:
+        def get_value(source_column):
+            if source_column not in row:
+                column_name = ovs_table.dynamic_followers[source_column][0]
                 app_log.debug("per-value column '%s' is not present"
                               % source_column)
                 raise Exception("Attribute '%s' is required "
                                 "by attribute '%s'."
                                 % (source_column, column_name))
+            return row[source_column]
 
-        # Set the new category
-        # Get new category for that value using per-value data
-        new_category = \
-            columns[source_column].category.per_value[column_data]
-
-        # Store old category
-        if column_name in references:
-            prev_category = references[column_name].category.value
-        else:
-            prev_category = columns[column_name].category.value
+        plan = ovs_table.get_serialization_plan(get_value)
 
-        # Check if the category changed
-        if prev_category != new_category:
-            if column_name in columns:
-                orig_columns = keys[prev_category]
-                dest_columns = keys[new_category]
-                # Change the category
-                column = orig_columns[column_name]
-                column.category.value = new_category
-                dest_columns[column_name] = column
-                orig_columns.pop(column_name)
-
-            # If the column is at references change the category
-            if column_name in references:
-                reference = references[column_name]
-                reference.category.value = new_category
-
-    return keys
+    return dict(plan.keys)
 
 
 def update_resource_keys(resource, schema, idl, data=None):
@@ -1023,16 +1110,10 @@ def row_to_uri(row, table, schema, idl):
                     if column.relation == OVSDB_SCHEMA_CHILD and column.ref_table == table:
                         break
 
-                for item in idl.tables[parent_table].rows.itervalues():
-                    children = item.__getattr__(name)
-                    if isinstance(children, ovs.db.idl.Row):
-                        children = [children]
-                    elif isinstance(children, dict):
-                        children = children.values()
-
-                    if row in children:
-                        parent_row = item
-                        break
+                parent = idl.parent_reference_lookup(row.uuid, table,
+                                                     parent_table, name)
+                if parent is not None:
+                    parent_row = parent[0]
 
                 _max = column.n_max
                 if _max == 1:
@@ -1052,6 +1133,41 @@ def row_to_uri(row, table, schema, idl):
     uri = REST_VERSION_PATH + '/'.join(path)
     return uri
 
+def get_ancestor_rows(row, table, schema, idl):
+    """
+    Returns the (table, row) pairs of the ancestors of the row, i.e. the
+    rows whose index is part of the URI of the row as built by
+    row_to_uri, closest first.
+    """
+    ancestors = []
+    while row and schema.ovs_tables[table].parent:
+        parent_table = schema.ovs_tables[table].parent
+        parent_row = None
+        if table in schema.ovs_tables[parent_table].children:
+            # backward
+            for name, column in schema.ovs_tables[table].references.iteritems():
+                if column.relation == OVSDB_SCHEMA_PARENT:
+                    parent_row = row.__getattr__(name)
+                    break
+        else:
+            # forward
+            for name, column in schema.ovs_tables[parent_table].references.iteritems():
+                if column.relation == OVSDB_SCHEMA_CHILD and column.ref_table == table:
+                    parent = idl.parent_reference_lookup(row.uuid, table,
+                                                         parent_table, name)
+                    if parent is not None:
+                        parent_row = parent[0]
+                    break
+
+        if parent_row:
+            ancestors.append((parent_table, parent_row))
+
+        row = parent_row
+        table = parent_table
+
+    return ancestors
+
+
 def get_back_reference_children(parent, parent_table, child_table, schema, idl):
     references = schema.ovs_tables[child_table].references
     refcol = None
@@ -1063,6 +1179,10 @@ def get_back_reference_children(parent, parent_table, child_table, schema, idl):
     if refcol is None:
         return None
 
+    # OpsIdl keeps a parent UUID to children map for back references
+    if refcol in getattr(idl.tables[child_table], 'parent_columns', ()):
+        return idl.back_reference_lookup(parent.uuid, child_table)
+
     children = []
     for row in idl.tables[child_table].rows.itervalues():
         if row.__getattr__(refcol) == parent:
@@ -1070,32 +1190,19 @@ def get_back_reference_children(parent, parent_table, child_table, schema, idl):
     return children
 
 @gen.coroutine
-def fetch_readonly_columns(schema, table, idl, manager, rows):
+def fetch_readonly_columns(schema, table, idl, manager, rows, max_age=None):
     """
     Fetches the columns that were registered as read-only from the DB.
+    Rows fetched less than max_age seconds ago are not fetched again.
     The method utilizes commit_block. Top-level caller should invoke this
     in a coroutine.
     """
-    if table in ON_DEMAND_FETCHED_TABLES:
-        app_log.debug("Fetching read-only columns..")
-        table_schema = schema.ovs_tables[table]
-        txn = manager.get_new_transaction()
-
-        for row in rows:
-            for column in table_schema.readonly_columns:
-                row.fetch(column)
-
-        status = txn.commit()
-        if status == INCOMPLETE:
-            manager.monitor_transaction(txn)
-            yield txn.event.wait()
-            status = txn.status
-
-        app_log.debug("Fetching status: %s" % status)
+    yield manager.readonly_fetcher.fetch(schema, {table: rows}, max_age)
 
 
 @gen.coroutine
-def fetch_readonly_columns_for_table(schema, table, idl, manager):
+def fetch_readonly_columns_for_table(schema, table, idl, manager,
+                                     max_age=None):
     """
     Fetches the columns that were registered as read-only from the DB
     for all rows in the table.
@@ -1103,18 +1210,4 @@ def fetch_readonly_columns_for_table(schema, table, idl, manager):
     The method utilizes commit_block. Top-level caller should invoke this
     in a coroutine.
     """
-    if table in ON_DEMAND_FETCHED_TABLES:
-        app_log.debug("Fetching read-only columns for table..")
-        table_schema = schema.ovs_tables[table]
-        txn = manager.get_new_transaction()
-
-        for column in table_schema.readonly_columns:
-            txn.txn.fetch_table(table, column)
-
-        status = txn.commit()
-        if status == INCOMPLETE:
-            manager.monitor_transaction(txn)
-            yield txn.event.wait()
-            status = txn.status
-
-        app_log.debug("Fetching status: %s" % status)
+    yield manager.readonly_fetcher.fetch(schema, {table: None}, max_age)
@@ -73,13 +73,13 @@ def diag_basic_handler(argv):
     for conn in HTTPS_server._connections:
         buff += "  Client IP is %s\n" % conn.context
     buff += "Transactions list:\n"
-    buff += "  Index\t  Status\n"
-    buff += "  ---------------\n"
+    buff += "  Request id\t  Status\n"
+    buff += "  --------------------\n"
     transactions = app.manager.transactions
-    for index, txn in enumerate(transactions.txn_list):
-        buff += "  %s\t  %s\n" % (index, txn.status)
+    for request_id, txn in transactions.txns.iteritems():
+        buff += "  %s\t  %s\n" % (request_id, txn.status)
     buff += "Total number of pending "\
-            "transactions is %s" % len(transactions.txn_list)
+            "transactions is %s" % len(transactions)
     return buff
 
 
@@ -0,0 +1,86 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 inside the switch, no ovsdb-server is needed
+import sys
+import time
+import uuid
+
+import ovs.db.data
+from ovs.db.idl import SchemaHelper
+
+from opslib import restparser
+from ops.opsidl import OpsIdl
+from opsrest.parse import parse_url_path
+from opsrest.settings import settings
+from opsrest.utils import utils
+
+'''
+Benchmark of the per-request URI parse time against the size of the Port
+table. The IDL is filled in memory and the index lookup through the
+OpsIdl index_map is compared to the previous linear scan of the table.
+'''
+TABLE_SIZES = [10, 100, 1000, 5000]
+ITERATIONS = 200
+
+rest_schema = restparser.parseSchema(settings['ext_schema'])
+
+
+def populate_idl(size):
+    schema_helper = SchemaHelper(settings['ovs_schema'])
+    schema_helper.register_all()
+    idl = OpsIdl(settings['ovs_remote'], schema_helper, rest_schema)
+
+    process_update = idl._Idl__process_update
+    system = idl.tables['System']
+    column = system.columns.values()[0]
+    process_update(system, uuid.uuid4(), None,
+                   {column.name: ovs.db.data.Datum.default(column.type).to_json()})
+    for i in range(size):
+        process_update(idl.tables['Port'], uuid.uuid4(), None,
+                       {'name': 'port%d' % i})
+    return idl
+
+
+def time_parse(idl, path):
+    start = time.time()
+    for i in range(ITERATIONS):
+        resource = parse_url_path(path, rest_schema, idl)
+        if resource is None or resource.next.row is None:
+            sys.exit('failed to parse %s' % path)
+    return (time.time() - start) * 1000 / ITERATIONS
+
+
+def main():
+    index_to_row = utils.index_to_row
+    print('%10s %15s %15s' % ('rows', 'scan (ms)', 'index (ms)'))
+    for size in TABLE_SIZES:
+        idl = populate_idl(size)
+        path = '/rest/v1/system/ports/port%d' % (size - 1)
+
+        # Previous behavior, scan every row of the table
+        utils.index_to_row = \
+            lambda values, schema, table, parent_uuid=None: \
+            utils._index_to_row_scan(values, schema, table)
+        scan = time_parse(idl, path)
+
+        utils.index_to_row = index_to_row
+        lookup = time_parse(idl, path)
+
+        print('%10d %15.4f %15.4f' % (size, scan, lookup))
+        idl.close()
+
+
+if __name__ == '__main__':
+    main()
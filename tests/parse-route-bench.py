@@ -0,0 +1,223 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2, no ovsdb-server or schema files are needed
+import sys
+import time
+import uuid
+
+from opsrest import parse
+from opsrest.constants import *
+from opsrest.resource import Resource
+
+'''
+Microbenchmark of parse_url_path with the precompiled URI route trie.
+A schema with NUM_TABLES top-level tables is generated, each table
+having back referenced children and a forward key/value child. The
+resources parsed are first checked against the ones the previous
+parser, which walked the schema for every path segment, returned.
+'''
+NUM_TABLES = 200
+NUM_ROWS = 20
+ITERATIONS = 2000
+
+
+class Column(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class KeyType(object):
+    name = 'integer'
+
+
+class Reference(object):
+    def __init__(self, ref_table, relation, n_max=1, kv_type=False):
+        self.ref_table = ref_table
+        self.relation = relation
+        self.n_max = n_max
+        self.kv_type = kv_type
+        self.kv_key_type = KeyType()
+
+
+class Table(object):
+    def __init__(self, name, parent=None, index_columns=None):
+        self.name = name
+        self.parent = parent
+        self.config = {}
+        self.status = {}
+        self.stats = {}
+        self.references = {}
+        self.columns = []
+        self.children = []
+        self.index_columns = index_columns or []
+        self.indexes = [column for column in self.index_columns
+                        if column != 'parent'] or ['uuid']
+
+
+class Schema(object):
+    def __init__(self):
+        self.ovs_tables = {}
+        self.plural_name_map = {}
+
+
+class Row(object):
+    def __init__(self, **data):
+        self.uuid = uuid.uuid4()
+        self._data = data
+
+    def __getattr__(self, name):
+        if name not in self._data:
+            raise AttributeError(name)
+        return self._data[name]
+
+
+class DbTable(object):
+    def __init__(self, index_columns):
+        self.rows = {}
+        self.index_map = {}
+        self.indexes = [[Column(name) for name in index_columns]]
+
+    def add(self, row, index):
+        self.rows[row.uuid] = row
+        if index:
+            self.index_map[index] = row
+
+
+class Idl(object):
+    def __init__(self):
+        self.tables = {}
+
+
+def generate():
+    schema = Schema()
+    idl = Idl()
+
+    schema.ovs_tables['System'] = Table('System')
+    idl.tables['System'] = DbTable([])
+    idl.tables['System'].add(Row(), None)
+
+    for i in range(NUM_TABLES):
+        name = 'Table%d' % i
+        child = 'Child%d' % i
+        item = 'Item%d' % i
+
+        table = Table(name, index_columns=['name'])
+        table.columns.append('items')
+        table.children.extend(['items', child])
+        table.references['items'] = Reference(item, OVSDB_SCHEMA_CHILD,
+                                              NUM_ROWS, True)
+        schema.ovs_tables[name] = table
+        schema.plural_name_map['tables%d' % i] = name
+
+        child_table = Table(child, name, ['parent', 'name'])
+        child_table.references['parent'] = Reference(name,
+                                                     OVSDB_SCHEMA_PARENT)
+        schema.ovs_tables[child] = child_table
+        schema.plural_name_map['children%d' % i] = child
+
+        schema.ovs_tables[item] = Table(item, name)
+
+        idl.tables[name] = DbTable(['name'])
+        idl.tables[child] = DbTable(['parent', 'name'])
+        idl.tables[item] = DbTable([])
+
+        for j in range(NUM_ROWS):
+            items = {}
+            for k in range(NUM_ROWS):
+                items[k] = Row()
+                idl.tables[item].add(items[k], None)
+
+            row = Row(name='t%d' % j, items=items)
+            idl.tables[name].add(row, ('t%d' % j,))
+
+            for k in range(NUM_ROWS):
+                child_row = Row(name='c%d' % k, parent=row)
+                idl.tables[child].add(child_row,
+                                      (str(row.uuid), 'c%d' % k))
+
+    return schema, idl
+
+
+def get_expected_resources(idl, last):
+    '''
+    Returns the (table, row, column, relation, index) chains that the
+    previous parser produced for the benchmarked paths.
+    '''
+    system = idl.tables['System'].rows.keys()[0]
+    name = 'Table%d' % last
+    row = idl.tables[name].index_map[('t3',)]
+    child = idl.tables['Child%d' % last].index_map[(str(row.uuid), 'c7')]
+    item = row.items[2]
+
+    system_resource = ('System', system, None, OVSDB_SCHEMA_TOP_LEVEL, None)
+    return [
+        ('/system/tables%d' % last,
+         [system_resource, (name, None, None, None, None)]),
+        ('/system/tables%d/t3' % last,
+         [system_resource, (name, row.uuid, None, None, ['t3'])]),
+        ('/system/tables%d/t3/children%d/c7' % (last, last),
+         [system_resource,
+          (name, row.uuid, None, OVSDB_SCHEMA_BACK_REFERENCE, ['t3']),
+          ('Child%d' % last, child.uuid, None, None, ['c7'])]),
+        ('/system/tables%d/t3/items/2' % last,
+         [system_resource,
+          (name, row.uuid, 'items', OVSDB_SCHEMA_CHILD, ['t3']),
+          ('Item%d' % last, item.uuid, None, None, 2)])]
+
+
+def parse_path(parser, path, schema, idl):
+    system = idl.tables['System'].rows.keys()[0]
+    resource = Resource('System', schema, system)
+    parser(parse.split_path(path)[1:], resource, schema, idl, 'GET')
+    return resource
+
+
+def to_list(resource):
+    path = []
+    while resource is not None:
+        path.append((resource.table, resource.row, resource.column,
+                     resource.relation, resource.index))
+        resource = resource.next
+    return path
+
+
+def time_parse(parser, paths, schema, idl):
+    start = time.time()
+    for i in range(ITERATIONS):
+        for path in paths:
+            parse_path(parser, path, schema, idl)
+    return (time.time() - start) * 1000000 / (ITERATIONS * len(paths))
+
+
+def main():
+    schema, idl = generate()
+    expected = get_expected_resources(idl, NUM_TABLES - 1)
+    paths = [path for path, resources in expected]
+
+    start = time.time()
+    parse.get_routes(schema)
+    print('route trie compiled in %.2f ms' % ((time.time() - start) * 1000))
+
+    for path, resources in expected:
+        if to_list(parse_path(parse.parse, path, schema, idl)) != resources:
+            sys.exit('unexpected resources for %s' % path)
+
+    print('%20s %15s' % ('parser', 'usec/path'))
+    print('%20s %15.2f' % ('route trie',
+                           time_parse(parse.parse, paths, schema, idl)))
+
+
+if __name__ == '__main__':
+    main()
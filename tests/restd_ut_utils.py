@@ -0,0 +1,184 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+'''
+Helpers of the unit tests, which run with Python2 and no ovsdb-server.
+The IDL replica is filled in memory from a small schema with the same
+kinds of relations as the switch schema:
+
+- System, the root table, with the VRF children and the Port references
+- VRF, child of System indexed by name
+- Static_Route, back referenced child of VRF indexed by (vrf, prefix),
+  with a reference to a Port
+- Port, top-level table indexed by name
+'''
+
+import uuid
+
+from ovs.db.idl import SchemaHelper
+
+from ops.opsidl import OpsIdl
+from opslib.restparser import RESTSchema, is_immutable
+
+OVS_REMOTE = 'unix:/nonexistent'
+
+_CONFIG = 'configuration'
+_STATUS = 'status'
+
+EXT_SCHEMA = {
+    'name': 'Test',
+    'version': '1.0.0',
+    'tables': {
+        'System': {
+            'isRoot': True,
+            'maxRows': 1,
+            'columns': {
+                'hostname': {'type': 'string', 'category': _CONFIG},
+                'vrfs': {'type': {'key': {'type': 'uuid',
+                                          'refTable': 'VRF'},
+                                  'min': 0, 'max': 'unlimited'},
+                         'relationship': '1:m', 'category': _CONFIG},
+                'ports': {'type': {'key': {'type': 'uuid',
+                                           'refTable': 'Port'},
+                                   'min': 0, 'max': 'unlimited'},
+                          'relationship': 'reference', 'category': _CONFIG}
+            }
+        },
+        'VRF': {
+            'columns': {
+                'name': {'type': 'string', 'category': _CONFIG}
+            },
+            'indexes': [['name']]
+        },
+        'Static_Route': {
+            'columns': {
+                'prefix': {'type': 'string', 'category': _CONFIG},
+                'metric': {'type': {'key': 'integer', 'min': 0, 'max': 1},
+                           'category': _CONFIG},
+                'vrf': {'type': {'key': {'type': 'uuid', 'refTable': 'VRF'}},
+                        'relationship': 'm:1', 'category': _CONFIG},
+                'port': {'type': {'key': {'type': 'uuid', 'refTable': 'Port'},
+                                  'min': 0, 'max': 1},
+                         'relationship': 'reference', 'category': _CONFIG}
+            },
+            'indexes': [['vrf', 'prefix']]
+        },
+        'Port': {
+            'isRoot': True,
+            'columns': {
+                'name': {'type': 'string', 'category': _CONFIG},
+                'mtu': {'type': {'key': 'integer', 'min': 0, 'max': 1},
+                        'category': _CONFIG},
+                'link_state': {'type': {'key': 'string', 'min': 0, 'max': 1},
+                               'category': _STATUS}
+            },
+            'indexes': [['name']]
+        }
+    }
+}
+
+
+def _ovs_schema():
+    # The OVSDB schema is the extended schema without the REST attributes
+    tables = {}
+    for table_name, table in EXT_SCHEMA['tables'].iteritems():
+        columns = dict((name, {'type': column['type']})
+                       for name, column in table['columns'].iteritems())
+        ovs_table = {'columns': columns}
+        for key in ('isRoot', 'maxRows', 'indexes'):
+            if key in table:
+                ovs_table[key] = table[key]
+        tables[table_name] = ovs_table
+
+    return {'name': EXT_SCHEMA['name'], 'version': EXT_SCHEMA['version'],
+            'tables': tables}
+
+
+def get_rest_schema():
+    # Same as restparser.parseSchema
+    rest_schema = RESTSchema.from_json(EXT_SCHEMA, False)
+    for name, table in rest_schema.ovs_tables.iteritems():
+        table.mutable = not is_immutable(name, rest_schema)
+    return rest_schema
+
+
+def get_schema_helper():
+    return SchemaHelper(schema_json=_ovs_schema())
+
+
+class MemoryDb(object):
+    '''
+    An OpsIdl whose rows are created, updated and deleted in memory as
+    if the updates came from the server. Values are given in OVSDB JSON
+    notation, with references given as Row objects.
+    '''
+
+    def __init__(self, rest_schema=None, idl_class=OpsIdl):
+        if rest_schema is None:
+            rest_schema = get_rest_schema()
+
+        self.rest_schema = rest_schema
+        schema_helper = get_schema_helper()
+        schema_helper.register_all()
+        self.idl = idl_class(OVS_REMOTE, schema_helper, rest_schema)
+        self.idl.track_row_changes()
+
+    def _to_json(self, values):
+        row_json = {}
+        for column, value in values.iteritems():
+            if hasattr(value, 'uuid'):
+                value = ['uuid', str(value.uuid)]
+            elif isinstance(value, list):
+                value = ['set', [['uuid', str(item.uuid)]
+                                 if hasattr(item, 'uuid') else item
+                                 for item in value]]
+            row_json[column] = value
+        return row_json
+
+    def insert(self, table_name, **values):
+        table = self.idl.tables[table_name]
+        row_uuid = uuid.uuid4()
+        self.idl._Idl__process_update(table, row_uuid, None,
+                                      self._to_json(values))
+        return table.rows[row_uuid]
+
+    def update(self, row, **values):
+        table = row._table
+        row_json = self._to_json(values)
+        self.idl._Idl__process_update(table, row.uuid, row_json, row_json)
+        return table.rows[row.uuid]
+
+    def delete(self, row):
+        self.idl._Idl__process_update(row._table, row.uuid, {}, None)
+
+    def get_changed_rows(self):
+        return self.idl.get_changed_rows()
+
+
+def populate(db, vrfs=('red', 'blue'), routes=4, ports=2):
+    '''
+    Fills the DB with the System row, the VRFs, ports port<i> and, in
+    every VRF, routes 10.0.<i>.0/24 referencing the ports in turn.
+    Returns the System row.
+    '''
+    port_rows = [db.insert('Port', name='port%d' % i)
+                 for i in range(ports)]
+    vrf_rows = [db.insert('VRF', name=name) for name in vrfs]
+    for vrf in vrf_rows:
+        for i in range(routes):
+            db.insert('Static_Route', prefix='10.0.%d.0/24' % i, vrf=vrf,
+                      port=port_rows[i % len(port_rows)])
+
+    return db.insert('System', hostname='switch', vrfs=vrf_rows,
+                     ports=port_rows)
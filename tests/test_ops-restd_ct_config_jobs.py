@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import pytest
+
+from opsvsi.docker import *
+from opsvsi.opsvsitest import *
+
+import json
+import httplib
+import time
+
+from opsvsiutils.restutils.utils import execute_request, login, \
+    get_switch_ip, rest_sanity_check, get_server_crt, remove_server_crt
+
+NUM_OF_SWITCHES = 1
+NUM_HOSTS_PER_SWITCH = 0
+
+CONFIG_PATH = "/rest/v1/system/full-configuration"
+JOBS_PATH = CONFIG_PATH + "/jobs"
+JOB_POLL_RETRIES = 30
+
+
+class myTopo(Topo):
+    """
+    Default network configuration for these tests
+    """
+    def build(self, hsts=0, sws=1, **_opts):
+        self.hsts = hsts
+        self.sws = sws
+        self.addSwitch("s1")
+
+
+@pytest.fixture
+def netop_login(request):
+    request.cls.test_var.cookie_header = login(request.cls.test_var.switch_ip)
+
+
+class ConfigJobsTest(OpsVsiTest):
+    def setupNet(self):
+        self.net = Mininet(topo=myTopo(hsts=NUM_HOSTS_PER_SWITCH,
+                                       sws=NUM_OF_SWITCHES,
+                                       hopts=self.getHostOpts(),
+                                       sopts=self.getSwitchOpts()),
+                           switch=VsiOpenSwitch,
+                           host=None,
+                           link=None,
+                           controller=None,
+                           build=True)
+
+        self.switch_ip = get_switch_ip(self.net.switches[0])
+        self.cookie_header = None
+
+    def get(self, path):
+        info("\n########## Executing GET to '%s' ##########\n" % path)
+        status_code, response_data = execute_request(
+            path, "GET", None, self.switch_ip, xtra_header=self.cookie_header)
+
+        assert status_code == httplib.OK, \
+            "Unexpected status code. Received: %s Response data: %s " % \
+            (status_code, response_data)
+
+        return json.loads(response_data)
+
+    def test_async_put_job(self):
+        info("\n########## Test Asynchronous PUT Job ##########\n")
+        config = self.get(CONFIG_PATH)
+
+        path = CONFIG_PATH + "?async=true"
+        info("\n########## Executing PUT to '%s' ##########\n" % path)
+        status_code, response_data = execute_request(
+            path, "PUT", json.dumps(config), self.switch_ip,
+            xtra_header=self.cookie_header)
+
+        assert status_code == httplib.ACCEPTED, \
+            "Unexpected status code. Received: %s Response data: %s " % \
+            (status_code, response_data)
+
+        job_uri = json.loads(response_data)["uri"]
+        assert job_uri.startswith(JOBS_PATH + "/"), \
+            "Unexpected job URI: %s" % job_uri
+
+        # The job URI is served by the job controller
+        for i in range(JOB_POLL_RETRIES):
+            job = self.get(job_uri)
+            if job["state"] in ("completed", "failed"):
+                break
+            time.sleep(1)
+
+        assert job["uri"] == job_uri
+        assert job["state"] == "completed", "Job failed: %s" % job["error"]
+
+        jobs = self.get(JOBS_PATH)
+        assert job_uri in [job["uri"] for job in jobs]
+
+        info("\n########## End Test Asynchronous PUT Job ##########\n")
+
+
+class TestConfigJobs:
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def setup_class(cls):
+        TestConfigJobs.test_var = ConfigJobsTest()
+        get_server_crt(cls.test_var.net.switches[0])
+        rest_sanity_check(cls.test_var.switch_ip)
+
+    def teardown_class(cls):
+        TestConfigJobs.test_var.net.stop()
+        remove_server_crt()
+
+    def setup_method(self, method):
+        pass
+
+    def teardown_method(self, method):
+        pass
+
+    def __del__(self):
+        del self.test_var
+
+    def test_call_async_put_job(self, netop_login):
+        self.test_var.test_async_put_job()
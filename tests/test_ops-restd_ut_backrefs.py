@@ -0,0 +1,62 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import pytest
+
+from ops import _write
+from ops.opsidl import OpsIdl
+from opsrest.utils import utils
+
+from restd_ut_utils import MemoryDb, populate
+
+
+def schemaless_idl(remote, schema_helper, extschema):
+    # An OpsIdl built without the extended schema has no back
+    # reference map
+    return OpsIdl(remote, schema_helper)
+
+
+@pytest.fixture(params=[OpsIdl, schemaless_idl])
+def db(request):
+    db = MemoryDb(idl_class=request.param)
+    populate(db)
+    return db
+
+
+def get_vrf(db, name):
+    for row in db.idl.tables['VRF'].rows.itervalues():
+        if row.name == name:
+            return row
+
+
+def get_prefixes(rows):
+    return sorted(row.prefix for row in rows)
+
+
+def test_backward_children(db):
+    red = get_vrf(db, 'red')
+    expected = ['10.0.%d.0/24' % i for i in range(4)]
+
+    assert get_prefixes(_write.get_backward_children(
+        red, 'VRF', 'Static_Route', db.rest_schema, db.idl)) == expected
+    assert get_prefixes(utils.get_back_reference_children(
+        red, 'VRF', 'Static_Route', db.rest_schema, db.idl)) == expected
+
+
+def test_no_parent_column(db):
+    red = get_vrf(db, 'red')
+    assert _write.get_backward_children(red, 'VRF', 'Port', db.rest_schema,
+                                        db.idl) == []
@@ -0,0 +1,107 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import httplib
+
+from tornado.ioloop import IOLoop
+
+from opsrest.batch import OperationBatch
+from opsrest.constants import BATCH_KEY_STATUS, BATCH_KEY_LOCATION, \
+    BATCH_KEY_METHOD, BATCH_KEY_URI, BATCH_KEY_BODY
+from opsrest.transaction import OvsdbTransaction
+
+from restd_ut_utils import MemoryDb, populate
+
+PORTS_URI = '/rest/v1/system/ports'
+VRFS_URI = '/rest/v1/system/vrfs'
+
+
+def operation(method, uri, body=None):
+    return {BATCH_KEY_METHOD: method, BATCH_KEY_URI: uri,
+            BATCH_KEY_BODY: body}
+
+
+def prepare(db, operations):
+    txn = OvsdbTransaction(db.idl)
+    batch = OperationBatch(db.rest_schema, db.idl, txn)
+    results, failed = IOLoop.current().run_sync(
+        lambda: batch.prepare_all(operations))
+    return txn, results, failed
+
+
+def get_port(db, name):
+    for row in db.idl.tables['Port'].rows.itervalues():
+        if row.name == name:
+            return row
+
+
+def test_patch_resource_created_by_batch():
+    db = MemoryDb()
+    populate(db)
+
+    txn, results, failed = prepare(db, [
+        operation('POST', PORTS_URI, {'configuration': {'name': 'port9'}}),
+        operation('PATCH', PORTS_URI + '/port9',
+                  [{'op': 'add', 'path': '/mtu', 'value': 9000}]),
+        operation('PUT', VRFS_URI + '/red', {'configuration': {
+            'name': 'red'}})])
+
+    assert failed is None
+    assert results[0][BATCH_KEY_LOCATION] == PORTS_URI + '/port9'
+    assert get_port(db, 'port9').mtu == [9000]
+    txn.abort()
+
+
+def test_child_created_by_batch():
+    db = MemoryDb()
+    populate(db)
+
+    txn, results, failed = prepare(db, [
+        operation('POST', VRFS_URI, {'configuration': {'name': 'green'}}),
+        operation('PUT', VRFS_URI + '/green',
+                  {'configuration': {'name': 'green'}}),
+        operation('DELETE', VRFS_URI + '/green'),
+        operation('DELETE', VRFS_URI + '/green')])
+
+    # Deleted by the previous operation
+    assert failed == 3
+    assert [result[BATCH_KEY_STATUS] for result in results[3:]] == \
+        [httplib.NOT_FOUND]
+    txn.abort()
+
+
+def test_failed_operation_rolls_back():
+    db = MemoryDb()
+    populate(db)
+
+    txn, results, failed = prepare(db, [
+        operation('POST', PORTS_URI, {'configuration': {'name': 'port9'}}),
+        operation('PATCH', PORTS_URI + '/port0',
+                  [{'op': 'add', 'path': '/mtu', 'value': 1500}]),
+        operation('PATCH', PORTS_URI + '/missing',
+                  [{'op': 'add', 'path': '/mtu', 'value': 1500}]),
+        operation('DELETE', PORTS_URI + '/port1')])
+
+    assert failed == 2
+    assert [result[BATCH_KEY_STATUS] for result in results] == \
+        [httplib.FAILED_DEPENDENCY, httplib.FAILED_DEPENDENCY,
+         httplib.NOT_FOUND, httplib.FAILED_DEPENDENCY]
+
+    # As the handler does
+    txn.abort()
+    assert get_port(db, 'port9') is None
+    assert get_port(db, 'port0').mtu == []
+    assert get_port(db, 'port1') is not None
@@ -0,0 +1,222 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import pytest
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from opsrest.batcher import WriteBatcher
+from opsrest.constants import SUCCESS, ERROR, UNCHANGED, UNCOMMITTED
+from opsrest.exceptions import DataValidationFailed
+from opsrest.parse import parse_url_path
+from opsrest.transaction import OvsdbTransaction, OvsdbTransactionResult
+from opsrest.utils import utils
+
+from restd_ut_utils import MemoryDb, populate
+
+
+class Txn(object):
+    def __init__(self, status):
+        self.status = status
+        self.writes = []
+        self.aborted = False
+
+    def commit(self):
+        if isinstance(self.status, Exception):
+            raise self.status
+        return self.status
+
+    def get_updates(self):
+        return set(name for name in self.writes if name is not None)
+
+    def abort(self):
+        self.aborted = True
+
+
+class Manager(object):
+    def __init__(self, statuses=()):
+        # Status of the commits, in order, then SUCCESS
+        self.statuses = list(statuses)
+        self.txns = []
+
+    def get_new_transaction(self):
+        status = self.statuses.pop(0) if self.statuses else SUCCESS
+        self.txns.append(Txn(status))
+        return self.txns[-1]
+
+
+def apply_write(name, fail=False):
+    # Writes named None change nothing
+    def apply(txn, commit):
+        if fail:
+            raise DataValidationFailed(name)
+        txn.writes.append(name)
+        return OvsdbTransactionResult(UNCOMMITTED)
+    return apply
+
+
+def run_writes(batcher, writes):
+    @gen.coroutine
+    def run():
+        futures = [batcher.write(apply_write(name, fail),
+                                 lambda keys=keys: keys)
+                   for name, keys, fail in writes]
+        results = []
+        for future in futures:
+            try:
+                result, txn = yield future
+                results.append((result.status, txn))
+            except (DataValidationFailed, RuntimeError) as e:
+                results.append((e, None))
+        raise gen.Return(results)
+
+    return IOLoop.current().run_sync(run)
+
+
+def test_disjoint_writes_share_a_transaction():
+    manager = Manager()
+    results = run_writes(WriteBatcher(manager), [
+        ('a', set([('Port', 1)]), False),
+        ('b', set([('Port', 2)]), False),
+        ('c', set(), False)])
+
+    assert len(manager.txns) == 1
+    assert manager.txns[0].writes == ['a', 'b', 'c']
+    assert [status for status, txn in results] == [SUCCESS] * 3
+
+
+def test_conflicting_writes_wait_for_next_batch():
+    manager = Manager()
+    run_writes(WriteBatcher(manager), [
+        ('a', set([('Port', 1)]), False),
+        ('b', set([('Port', 1), ('Port', 2)]), False),
+        ('c', set([('Port', 2)]), False),
+        ('d', set([('Port', 3)]), False)])
+
+    assert [txn.writes for txn in manager.txns] == [['a', 'c', 'd'], ['b']]
+
+
+def test_failed_write_falls_back_to_one_transaction_each():
+    manager = Manager()
+    results = run_writes(WriteBatcher(manager), [
+        ('a', set([('Port', 1)]), False),
+        ('b', set([('Port', 2)]), True),
+        ('c', set([('Port', 3)]), False)])
+
+    assert manager.txns[0].aborted
+    assert [txn.writes for txn in manager.txns[1:]] == [['a'], [], ['c']]
+    assert results[0] == (SUCCESS, manager.txns[1])
+    assert isinstance(results[1][0], DataValidationFailed)
+    assert results[2] == (SUCCESS, manager.txns[3])
+
+
+def test_failed_commit_falls_back_to_one_transaction_each():
+    manager = Manager([ERROR, SUCCESS, ERROR])
+    results = run_writes(WriteBatcher(manager), [
+        ('a', set([('Port', 1)]), False),
+        ('b', set([('Port', 2)]), False)])
+
+    assert [txn.writes for txn in manager.txns] == [['a', 'b'], ['a'], ['b']]
+    assert [status for status, txn in results] == [SUCCESS, ERROR]
+
+
+def test_unchanged_writes_of_a_batch():
+    manager = Manager()
+    results = run_writes(WriteBatcher(manager), [
+        ('a', set([('Port', 1)]), False),
+        (None, set([('Port', 2)]), False)])
+
+    assert len(manager.txns) == 1
+    assert [status for status, txn in results] == [SUCCESS, UNCHANGED]
+
+
+def test_raising_commit_fails_the_batch():
+    manager = Manager([RuntimeError('commit')])
+    batcher = WriteBatcher(manager)
+    results = run_writes(batcher, [
+        ('a', set([('Port', 1)]), False),
+        ('b', set([('Port', 2)]), False),
+        ('c', set([('Port', 1)]), False)])
+
+    # The batch is not retried, the conflicting write commits after it
+    assert manager.txns[0].aborted
+    assert [txn.writes for txn in manager.txns] == [['a', 'b'], ['c']]
+    assert [type(error) for error, txn in results[:2]] == [RuntimeError] * 2
+    assert results[2] == (SUCCESS, manager.txns[1])
+    assert not batcher._running
+
+
+@pytest.fixture
+def db():
+    db = MemoryDb()
+    populate(db)
+    return db
+
+
+def get_keys(db, path, method, data=None):
+    resource = parse_url_path(path, db.rest_schema, db.idl, method)
+    return utils.get_write_keys(resource, db.rest_schema, method, data)
+
+
+def test_write_keys_are_rows(db):
+    port = db.idl.index_to_row_lookup(['port0'], 'Port')
+    assert get_keys(db, '/rest/v1/system/ports/port0', 'PUT') == \
+        set([('Port', port.uuid)])
+    assert get_keys(db, '/rest/v1/system/ports/port0', 'DELETE') == \
+        get_keys(db, '/rest/v1/system/ports/port0', 'PATCH')
+
+    system = db.idl.tables['System'].rows.values()[0]
+    assert get_keys(db, '/rest/v1/system', 'PUT') == \
+        set([('System', system.uuid)])
+
+
+def test_write_keys_follow_renames(db):
+    port = db.idl.index_to_row_lookup(['port0'], 'Port')
+    keys = get_keys(db, '/rest/v1/system/ports/port0', 'PUT')
+
+    db.update(port, name='renamed')
+    assert get_keys(db, '/rest/v1/system/ports/renamed', 'PUT') == keys
+    assert parse_url_path('/rest/v1/system/ports/port0', db.rest_schema,
+                          db.idl, 'PUT') is None
+
+
+def test_post_keys_are_parent_table_and_index(db):
+    routes = '/rest/v1/system/vrfs/%s/static_routes'
+    route = {'configuration': {'prefix': '10.1.0.0/16'}}
+    other_route = {'configuration': {'prefix': '10.2.0.0/16'}}
+
+    keys = get_keys(db, routes % 'red', 'POST', route)
+    assert keys == get_keys(db, routes % 'red', 'POST', route)
+    assert keys != get_keys(db, routes % 'blue', 'POST', route)
+    assert keys != get_keys(db, routes % 'red', 'POST', other_route)
+
+    port = {'configuration': {'name': 'port9'}}
+    assert get_keys(db, '/rest/v1/system/ports', 'POST', port) == \
+        set([(None, 'Port', ('"port9"',))])
+
+
+def test_transaction_updates(db):
+    txn = OvsdbTransaction(db.idl)
+    port = db.idl.index_to_row_lookup(['port0'], 'Port')
+
+    port.name = 'port0'
+    assert txn.get_updates() == set()
+
+    port.name = 'renamed'
+    row = txn.insert(db.idl.tables['VRF'])
+    assert txn.get_updates() == set([(port.uuid, 'name'), (row.uuid, None)])
+    txn.abort()
@@ -0,0 +1,246 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import copy
+
+import pytest
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+import ops.dc
+from opsrest import configjob
+from opsrest.configjob import ConfigJobQueue
+from opsrest.custom.basecontroller import AcceptedUpdate
+from opsrest.custom.configcontroller import ConfigController
+from opsrest.custom.configjobcontroller import ConfigJobController
+from opsrest.constants import SUCCESS, CONFIG_JOB_MAX_DIFFS, \
+    CONFIG_JOB_STATE_COMPLETED
+
+from restd_ut_utils import MemoryDb, populate
+
+
+class Txn(object):
+    txn = None
+
+    def abort(self):
+        pass
+
+
+class Manager(object):
+    def __init__(self, db):
+        self.db = db
+        self.idl = db.idl
+        self.connected = True
+        self.config_cache = ops.dc.RunningConfigCache(db.rest_schema)
+        db.get_changed_rows()
+
+    def idl_check_and_update(self):
+        self.config_cache.invalidate_rows(self.db.get_changed_rows())
+
+    def get_new_transaction(self):
+        return Txn()
+
+
+@pytest.fixture
+def manager():
+    db = MemoryDb()
+    populate(db, ports=4)
+    return Manager(db)
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    # The unchanged set of each write
+    writes = []
+
+    def write(data, extschema, idl, txn=None, block=False, cache=None,
+              unchanged=None):
+        writes.append(unchanged)
+        return (SUCCESS, None)
+
+    monkeypatch.setattr(ops.dc, 'write', write)
+    return writes
+
+
+def run_job(manager, data):
+    queue = ConfigJobQueue(manager, manager.db.rest_schema)
+
+    @gen.coroutine
+    def run():
+        job = queue.submit(data)
+        while not job.is_finished():
+            yield gen.moment
+        raise gen.Return(job)
+
+    return IOLoop.current().run_sync(run)
+
+
+def test_job_states(manager, writes, monkeypatch):
+    monkeypatch.setattr(configjob, 'CONFIG_JOBS_MAX_FINISHED', 2)
+    queue = ConfigJobQueue(manager, manager.db.rest_schema)
+
+    @gen.coroutine
+    def run():
+        jobs = [queue.submit({}) for i in range(3)]
+        while not jobs[-1].is_finished():
+            yield gen.moment
+        raise gen.Return(jobs)
+
+    jobs = IOLoop.current().run_sync(run)
+    data = jobs[-1].to_json()
+    assert data['state'] == CONFIG_JOB_STATE_COMPLETED
+    assert data['status'] == SUCCESS
+    assert data['uri'].endswith('/jobs/3')
+
+    # Only the last finished jobs are kept
+    assert [job.id for job in queue.get_jobs()] == ['2', '3']
+    assert queue.get_job('1') is None
+
+
+def test_snapshot_is_read_across_iterations(manager):
+    queue = ConfigJobQueue(manager, manager.db.rest_schema)
+    iterations = []
+
+    @gen.coroutine
+    def read():
+        future = queue._read_running_config()
+        while not future.done():
+            iterations.append(None)
+            yield gen.moment
+        raise gen.Return(future.result())
+
+    running_config = IOLoop.current().run_sync(read)
+
+    # One iteration per top-level row: the ports and the System row
+    assert len(iterations) >= 5
+    assert running_config == ops.dc.read(manager.db.rest_schema,
+                                         manager.idl)
+
+
+def test_rows_changed_while_reading(manager):
+    queue = ConfigJobQueue(manager, manager.db.rest_schema)
+    port = manager.idl.index_to_row_lookup(['port3'], 'Port')
+
+    @gen.coroutine
+    def change():
+        yield gen.moment
+        manager.db.update(port, mtu=1500)
+        manager.idl_check_and_update()
+
+    IOLoop.current().add_callback(change)
+    running_config = IOLoop.current().run_sync(queue._read_running_config)
+    assert running_config['Port']['port3']['mtu'] == [1500]
+    assert running_config == ops.dc.read(manager.db.rest_schema,
+                                         manager.idl)
+
+
+def test_unchanged_config(manager, writes):
+    data = copy.deepcopy(ops.dc.read(manager.db.rest_schema, manager.idl))
+    job = run_job(manager, data)
+
+    assert job.status == SUCCESS
+    assert len(writes) == 1 and () in writes[0]
+
+
+def test_stale_diff_is_computed_again(manager, writes, monkeypatch):
+    data = copy.deepcopy(ops.dc.read(manager.db.rest_schema, manager.idl))
+    port = manager.idl.index_to_row_lookup(['port0'], 'Port')
+    diffs = []
+
+    run_in_thread = configjob.run_in_thread
+
+    def run_diff(func, *args):
+        # The running config changes during the first diff only
+        if not diffs:
+            manager.db.update(port, mtu=1500)
+            manager.idl_check_and_update()
+        diffs.append(None)
+        return run_in_thread(func, *args)
+
+    monkeypatch.setattr(configjob, 'run_in_thread', run_diff)
+    run_job(manager, data)
+
+    assert len(diffs) == 2
+    assert ('Port', 'port0') not in writes[0]
+    assert ('Port', 'port1') in writes[0]
+
+
+def test_always_stale_diff(manager, writes, monkeypatch):
+    data = copy.deepcopy(ops.dc.read(manager.db.rest_schema, manager.idl))
+    port = manager.idl.index_to_row_lookup(['port0'], 'Port')
+    diffs = []
+
+    run_in_thread = configjob.run_in_thread
+
+    def run_diff(func, *args):
+        diffs.append(None)
+        manager.db.update(port, mtu=len(diffs))
+        manager.idl_check_and_update()
+        return run_in_thread(func, *args)
+
+    monkeypatch.setattr(configjob, 'run_in_thread', run_diff)
+    run_job(manager, data)
+
+    assert len(diffs) == CONFIG_JOB_MAX_DIFFS
+    assert writes == [set()]
+
+
+def test_disconnected_while_reading(manager, writes):
+    @gen.coroutine
+    def disconnect():
+        yield gen.moment
+        manager.connected = False
+
+    IOLoop.current().add_callback(disconnect)
+    job = run_job(manager, {})
+    assert job.error == 'OVSDB is not connected'
+    assert not writes
+
+
+def test_disconnected_while_diffing(manager, writes, monkeypatch):
+    run_in_thread = configjob.run_in_thread
+
+    def run_diff(func, *args):
+        manager.connected = False
+        return run_in_thread(func, *args)
+
+    monkeypatch.setattr(configjob, 'run_in_thread', run_diff)
+    job = run_job(manager, {})
+    assert job.error == 'OVSDB is not connected'
+    assert not writes
+
+
+class Context(object):
+    def __init__(self, manager):
+        self.manager = manager
+        self.restschema = manager.db.rest_schema
+        self.config_jobs = ConfigJobQueue(manager, self.restschema)
+
+
+def test_async_update_is_accepted(manager, writes):
+    context = Context(manager)
+
+    @gen.coroutine
+    def run():
+        result = yield ConfigController(context).update(
+            None, {}, None, {'async': ['true']})
+        job_id = result.uri.rsplit('/', 1)[-1]
+        job = yield ConfigJobController(context).get(job_id)
+        raise gen.Return((result, job))
+
+    result, job = IOLoop.current().run_sync(run)
+    assert isinstance(result, AcceptedUpdate)
+    assert result.uri == result.data['uri'] == job['uri']
@@ -0,0 +1,159 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import urlparse
+import uuid
+
+from tornado.ioloop import IOLoop
+
+from opsrest.get import get_resource
+from opsrest.parse import parse_url_path
+from opsrest.utils import getutils
+
+from restd_ut_utils import MemoryDb, populate
+
+ROUTES_URI = '/rest/v1/system/vrfs/red/static_routes'
+
+
+def get_page(db, query, cursor='', uri=ROUTES_URI):
+    query = dict((name, [value]) for name, value in query.iteritems())
+    query['depth'] = ['1']
+    query['cursor'] = [cursor]
+
+    links = []
+    resource = parse_url_path(uri, db.rest_schema, db.idl)
+    data = IOLoop.current().run_sync(
+        lambda: get_resource(db.idl, resource, db.rest_schema, uri,
+                             query_arguments=query, links=links))
+
+    cursors = {}
+    for link in links:
+        link_uri, rel = link.split('; ')
+        query = urlparse.parse_qs(urlparse.urlparse(link_uri[1:-1]).query)
+        cursors[rel[len('rel="'):-1]] = query['cursor'][0]
+
+    prefixes = [row['configuration']['prefix'] for row in data]
+    return prefixes, cursors
+
+
+def walk(db, query):
+    prefixes, cursors = get_page(db, query)
+    while 'next' in cursors:
+        page, cursors = get_page(db, query, cursors['next'])
+        prefixes.extend(page)
+    return prefixes
+
+
+def get_vrf(db, name):
+    return db.idl.index_to_row_lookup([name], 'VRF')
+
+
+def test_walk_index_order():
+    db = MemoryDb()
+    populate(db, routes=7)
+
+    prefixes = walk(db, {'limit': '3'})
+    assert prefixes == ['10.0.%d.0/24' % i for i in range(7)]
+
+
+def test_walk_sorted_descending():
+    db = MemoryDb()
+    populate(db, routes=7)
+
+    prefixes = walk(db, {'limit': '2', 'sort': '-prefix'})
+    assert prefixes == ['10.0.%d.0/24' % i for i in reversed(range(7))]
+
+
+def test_prev_page():
+    db = MemoryDb()
+    populate(db, routes=6)
+
+    first, cursors = get_page(db, {'limit': '2'})
+    second, cursors = get_page(db, {'limit': '2'}, cursors['next'])
+    assert second == ['10.0.2.0/24', '10.0.3.0/24']
+
+    page, cursors = get_page(db, {'limit': '2'}, cursors['prev'])
+    assert page == first
+    assert 'prev' not in cursors
+
+
+def test_inserts_and_deletes_between_pages():
+    db = MemoryDb()
+    populate(db, routes=6)
+    red = get_vrf(db, 'red')
+
+    page, cursors = get_page(db, {'limit': '2', 'sort': 'prefix'})
+    assert page == ['10.0.0.0/24', '10.0.1.0/24']
+
+    # Before the cursor, after the cursor and in another VRF
+    db.insert('Static_Route', prefix='10.0.0.128/25', vrf=red)
+    db.insert('Static_Route', prefix='10.0.2.128/25', vrf=red)
+    db.insert('Static_Route', prefix='10.0.1.128/25', vrf=get_vrf(db, 'blue'))
+    for row in db.idl.tables['Static_Route'].rows.values():
+        if row.vrf == red and row.prefix == '10.0.2.0/24':
+            db.delete(row)
+
+    page, cursors = get_page(db, {'limit': '2', 'sort': 'prefix'},
+                             cursors['next'])
+    assert page == ['10.0.2.128/25', '10.0.3.0/24']
+
+
+def test_sort_order_follows_updates():
+    db = MemoryDb()
+    populate(db, routes=4)
+    query = {'limit': '10', 'sort': 'metric,prefix'}
+
+    for row in db.idl.tables['Static_Route'].rows.values():
+        db.update(row, metric=10)
+    assert walk(db, query) == ['10.0.%d.0/24' % i for i in range(4)]
+
+    for row in db.idl.tables['Static_Route'].rows.values():
+        if row.prefix == '10.0.3.0/24':
+            db.update(row, metric=5)
+    assert walk(db, query) == ['10.0.3.0/24', '10.0.0.0/24',
+                               '10.0.1.0/24', '10.0.2.0/24']
+
+
+def test_sorted_index_lookup_per_parent():
+    db = MemoryDb()
+    populate(db, routes=3)
+    idl = db.idl
+    red = get_vrf(db, 'red')
+
+    keys = idl.sorted_index_lookup('Static_Route', red.uuid)
+    assert len(keys) == 3
+    assert len(idl.sorted_index_lookup('Static_Route')) == 6
+
+    # Moved to another parent
+    route = idl.tables['Static_Route'].rows[uuid.UUID(keys[0][-1])]
+    db.update(route, vrf=get_vrf(db, 'blue'))
+    assert len(idl.sorted_index_lookup('Static_Route', red.uuid)) == 2
+
+    expected = sorted(
+        (idl._get_index_key(row, idl.tables['Static_Route']), str(row.uuid))
+        for row in idl.back_reference_lookup(red.uuid, 'Static_Route'))
+    assert idl.sorted_index_lookup('Static_Route', red.uuid) == expected
+
+
+def test_decode_cursor_key_types():
+    key = (('10.0.1.0/24',), 'a-uuid')
+    direction, decoded = getutils.decode_cursor(
+        getutils.encode_cursor('next', key))
+
+    assert direction == 'next'
+    assert decoded == key
+    assert type(decoded[0][0]) is str
+    assert type(decoded[1]) is str
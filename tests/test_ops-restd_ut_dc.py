@@ -0,0 +1,144 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import copy
+
+import pytest
+from ovs.db.idl import Transaction
+
+import ops.dc
+import ops._read
+import ops.utils
+
+from restd_ut_utils import MemoryDb, populate
+
+ROUTE = '10.0.1.0%2F24'
+
+
+@pytest.fixture
+def db():
+    db = MemoryDb()
+    populate(db, routes=2)
+    db.get_changed_rows()
+    return db
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    # (function, table) of the rows read and of the rows set up
+    calls = []
+
+    get_row_data = ops._read._get_row_data
+
+    def read_row(row, table_name, *args):
+        calls.append(('read', table_name))
+        return get_row_data(row, table_name, *args)
+
+    set_config_columns = ops.utils.set_config_columns
+
+    def set_row(row_data, row, table_name, *args):
+        calls.append(('set', table_name))
+        return set_config_columns(row_data, row, table_name, *args)
+
+    monkeypatch.setattr(ops._read, '_get_row_data', read_row)
+    monkeypatch.setattr(ops.utils, 'set_config_columns', set_row)
+    return calls
+
+
+def change_route(config):
+    config['System']['vrfs']['red']['Static_Route'][ROUTE]['metric'] = 5
+
+
+def get_route(db, vrf_name, prefix):
+    for row in db.idl.tables['Static_Route'].rows.itervalues():
+        if row.vrf.name == vrf_name and row.prefix == prefix:
+            return row
+
+
+def write(db, data, **kwargs):
+    txn = Transaction(db.idl)
+    ops.dc.write(data, db.rest_schema, db.idl, txn, **kwargs)
+    txn.abort()
+
+
+def test_diff_paths(db):
+    running_config = ops.dc.read(db.rest_schema, db.idl)
+    data = copy.deepcopy(running_config)
+    assert () in ops.dc.diff(data, running_config)
+
+    change_route(data)
+    unchanged = ops.dc.diff(data, running_config)
+    assert ('Port', 'port0') in unchanged
+    assert ('System', 'vrfs', 'blue') in unchanged
+    assert ('System', 'vrfs', 'red', 'Static_Route',
+            '10.0.0.0%2F24') in unchanged
+    for path in [(), ('System',), ('System', 'vrfs', 'red'),
+                 ('System', 'vrfs', 'red', 'Static_Route', ROUTE)]:
+        assert path not in unchanged
+
+
+def test_write_skips_unchanged_rows(db, calls):
+    data = ops.dc.read(db.rest_schema, db.idl)
+    data['Port']['port1']['mtu'] = 9000
+    unchanged = ops.dc.diff(data, ops.dc.read(db.rest_schema, db.idl))
+    assert ('System',) in unchanged
+
+    del calls[:]
+    write(db, data, unchanged=unchanged)
+    assert calls == [('set', 'Port')]
+
+
+def test_unchanged_config(db, calls):
+    data = copy.deepcopy(ops.dc.read(db.rest_schema, db.idl))
+
+    del calls[:]
+    write(db, data)
+    assert not [call for call in calls if call[0] == 'set']
+
+
+def test_unchanged_paths_of_copies(db, calls):
+    # The same data in new dictionaries is still unchanged
+    data = ops.dc.read(db.rest_schema, db.idl)
+    unchanged = ops.dc.diff(copy.deepcopy(data), data)
+
+    del calls[:]
+    write(db, data, unchanged=unchanged)
+    assert not calls
+
+
+def test_write_reuses_idl_cache(db, calls):
+    db.idl.config_cache = ops.dc.RunningConfigCache(db.rest_schema)
+
+    data = ops.dc.read(db.rest_schema, db.idl)
+    del calls[:]
+    write(db, copy.deepcopy(data))
+    rows = len([call for call in calls if call[0] == 'read'])
+
+    # Only the changed row and its ancestors are read again
+    del calls[:]
+    db.update(get_route(db, 'red', '10.0.1.0/24'), metric=7)
+    db.idl.config_cache.invalidate_rows(db.get_changed_rows())
+    write(db, copy.deepcopy(data))
+    reads = sorted(call for call in calls if call[0] == 'read')
+    assert reads == [('read', 'Static_Route'), ('read', 'System'),
+                     ('read', 'VRF')]
+    assert rows > len(reads)
+
+    # The given cache is used instead
+    del calls[:]
+    write(db, copy.deepcopy(data),
+          cache=ops.dc.RunningConfigCache(db.rest_schema))
+    assert len([call for call in calls if call[0] == 'read']) == rows
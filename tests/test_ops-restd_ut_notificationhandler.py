@@ -0,0 +1,273 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import json
+
+import pytest
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+from opsrest.notifications import handler as notificationhandler
+from opsrest.notifications.constants import (
+    NOTIF_MSG,
+    UPDATE_TYPE_ADDED,
+    UPDATE_TYPE_DELETED,
+    UPDATE_TYPE_MODIFIED
+)
+from opsrest.notifications.handler import NotificationHandler
+from opsrest.notifications.subscription import (
+    CollectionSubscription,
+    RowSubscription
+)
+from opsrest.utils import utils
+
+from restd_ut_utils import MemoryDb, populate
+
+ROUTES_URI = '/rest/v1/system/vrfs/%s/static_routes'
+
+
+class Monitor(object):
+    '''
+    Notification monitor recording the tracked columns of each table.
+    '''
+
+    def __init__(self, remote, schema, rest_schema, notification_callback):
+        self.tables_monitored = {}
+
+    def add_table_monitor(self, table, columns=None):
+        self.tables_monitored[table] = columns
+
+    def remove_table_monitor(self, table):
+        del self.tables_monitored[table]
+
+
+class Change(object):
+    '''
+    Change tracking information of a row, as returned by track_get.
+    '''
+
+    def __init__(self, create=0, update=0, delete=0, columns=()):
+        self.create_seqno = create
+        self.update_seqno = update
+        self.delete_seqno = delete
+        self.columns = list(columns)
+
+
+class Manager(object):
+    remote = None
+    schema = None
+
+    def __init__(self, db):
+        self.db = db
+        self.idl = db.idl
+        self.curr_seqno = 0
+
+        # Table to {row uuid: Change}
+        self.changes = {}
+        self.idl.track_get = lambda table: self.changes.get(table, {})
+        self.idl.track_add_all_columns = lambda table: None
+
+        # (subscriber, changes) of the notification messages sent
+        self.messages = []
+
+    def add_callback(self, callback_type, callback):
+        pass
+
+    def send(self, subscriber_name, data):
+        self.messages.append((subscriber_name, json.loads(data)[NOTIF_MSG]))
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(notificationhandler, 'OvsdbNotificationMonitor',
+                        Monitor)
+    db = MemoryDb()
+    populate(db)
+    return Manager(db)
+
+
+@pytest.fixture
+def handler(manager, monkeypatch):
+    handler = NotificationHandler(manager.db.rest_schema, manager)
+    monkeypatch.setattr(handler, 'notify_subscriber', manager.send)
+    return handler
+
+
+def get_row_uri(db, row, table):
+    return utils.get_reference_uri(table, row, db.rest_schema, db.idl)
+
+
+def get_port(db, name):
+    return db.idl.index_to_row_lookup([name], 'Port')
+
+
+def get_routes(db, vrf_name):
+    return [row for row in db.idl.tables['Static_Route'].rows.itervalues()
+            if row.vrf.name == vrf_name]
+
+
+def subscribe_row(handler, db, name, row, table, columns=None,
+                  selector=None):
+    subscription = RowSubscription(table, name, '/subscriptions/' + name,
+                                   get_row_uri(db, row, table), row.uuid)
+    subscription.columns = columns
+    subscription.selector = selector
+    handler.add_subscription(name, subscription)
+    return subscription
+
+
+def subscribe_routes(handler, db, name, vrf_name, columns=None):
+    rows_to_uri = dict((row.uuid, get_row_uri(db, row, 'Static_Route'))
+                       for row in get_routes(db, vrf_name))
+    subscription = CollectionSubscription('Static_Route', name,
+                                          '/subscriptions/' + name,
+                                          ROUTES_URI % vrf_name, rows_to_uri)
+    subscription.columns = columns
+    handler.add_subscription(name, subscription)
+    return subscription
+
+
+def dispatch(handler, manager, changes):
+    '''
+    Runs the notification callback for the changes, then lets the
+    subscriber queues send their messages.
+    '''
+    manager.changes = changes
+    manager.messages = []
+
+    @gen.coroutine
+    def run():
+        yield handler.subscribed_changes_callback(manager, manager.idl)
+        for i in range(3):
+            yield gen.moment
+
+    IOLoop.current().run_sync(run)
+    return dict(manager.messages)
+
+
+def test_modified_rows_dispatched_to_their_subscriptions(handler, manager):
+    db = manager.db
+    port0 = get_port(db, 'port0')
+    port1 = get_port(db, 'port1')
+    subscribe_row(handler, db, 'sub0', port0, 'Port')
+    subscribe_row(handler, db, 'sub1', port1, 'Port')
+
+    db.update(port0, mtu=1500)
+    messages = dispatch(handler, manager, {'Port': {
+        port0.uuid: Change(update=1, columns=['mtu'])}})
+
+    assert messages.keys() == ['sub0']
+    modified = messages['sub0'][UPDATE_TYPE_MODIFIED]
+    assert modified[0]['resource'] == '/rest/v1/system/ports/port0'
+    assert modified[0]['new_values'] == {'mtu': 1500}
+
+
+def test_added_and_deleted_rows_of_collections(handler, manager):
+    db = manager.db
+    red = subscribe_routes(handler, db, 'red', 'red')
+    subscribe_routes(handler, db, 'blue', 'blue')
+
+    vrf = db.idl.index_to_row_lookup(['red'], 'VRF')
+    route = db.insert('Static_Route', prefix='10.9.0.0/16', vrf=vrf)
+    messages = dispatch(handler, manager, {'Static_Route': {
+        route.uuid: Change(create=1)}})
+
+    assert messages.keys() == ['red']
+    added = messages['red'][UPDATE_TYPE_ADDED]
+    assert added[0]['resource'] == get_row_uri(db, route, 'Static_Route')
+    assert route.uuid in red.rows_to_uri
+
+    db.delete(route)
+    messages = dispatch(handler, manager, {'Static_Route': {
+        route.uuid: Change(delete=1)}})
+
+    assert messages.keys() == ['red']
+    assert len(messages['red'][UPDATE_TYPE_DELETED]) == 1
+    assert ('Static_Route', route.uuid) not in handler._collection_rows
+
+
+def test_removed_subscriptions_are_unindexed(handler, manager):
+    db = manager.db
+    subscribe_row(handler, db, 'port', get_port(db, 'port0'), 'Port')
+    subscribe_routes(handler, db, 'routes', 'red')
+
+    handler.remove_subscription('port')
+    handler.remove_subscription('routes')
+
+    assert not handler._row_subscriptions
+    assert not handler._collection_subscriptions
+    assert not handler._collection_rows
+    assert not handler._notification_monitor.tables_monitored
+
+
+def test_tracked_columns_of_subscriptions(handler, manager):
+    db = manager.db
+    port0 = get_port(db, 'port0')
+    monitored = handler._notification_monitor.tables_monitored
+
+    subscribe_row(handler, db, 'mtu', port0, 'Port', frozenset(['mtu']))
+
+    # Index columns are tracked for the rows added and deleted
+    assert monitored['Port'] == frozenset(['mtu', 'name'])
+
+    subscribe_row(handler, db, 'status', port0, 'Port', selector='status')
+    assert monitored['Port'] == frozenset(['mtu', 'name', 'link_state'])
+
+    subscribe_row(handler, db, 'all', port0, 'Port')
+    assert monitored['Port'] is None
+
+    handler.remove_subscription('all')
+    handler.remove_subscription('status')
+    assert monitored['Port'] == frozenset(['mtu', 'name'])
+
+
+def test_changes_of_filtered_columns(handler, manager):
+    db = manager.db
+    port0 = get_port(db, 'port0')
+
+    subscribe_row(handler, db, 'mtu', port0, 'Port', frozenset(['mtu']))
+    subscribe_row(handler, db, 'status', port0, 'Port', selector='status')
+
+    db.update(port0, mtu=1500, link_state='up')
+    messages = dispatch(handler, manager, {'Port': {
+        port0.uuid: Change(update=1, columns=['mtu', 'link_state'])}})
+    assert messages['mtu'][UPDATE_TYPE_MODIFIED][0]['new_values'] == \
+        {'mtu': 1500}
+    assert messages['status'][UPDATE_TYPE_MODIFIED][0]['new_values'] == \
+        {'link_state': 'up'}
+
+    # Changes of the columns not subscribed are dropped
+    db.update(port0, mtu=9000)
+    messages = dispatch(handler, manager, {'Port': {
+        port0.uuid: Change(update=1, columns=['mtu'])}})
+    assert messages.keys() == ['mtu']
+
+
+def test_added_rows_with_filtered_columns(handler, manager):
+    db = manager.db
+    subscribe_routes(handler, db, 'routes', 'red', frozenset(['prefix']))
+
+    vrf = db.idl.index_to_row_lookup(['red'], 'VRF')
+    route = db.insert('Static_Route', prefix='10.9.0.0/16', vrf=vrf,
+                      metric=5)
+    messages = dispatch(handler, manager, {'Static_Route': {
+        route.uuid: Change(create=1)}})
+    assert messages['routes'][UPDATE_TYPE_ADDED][0]['values'] == \
+        {'prefix': '10.9.0.0/16'}
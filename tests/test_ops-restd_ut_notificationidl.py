@@ -0,0 +1,205 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import uuid
+
+import pytest
+from ovs.jsonrpc import Message
+
+from opsrest.notifications import notificationidl
+from opsrest.notifications.monitor import OvsdbNotificationMonitor
+from opsrest.notifications.notificationidl import NotificationIdl
+
+from restd_ut_utils import OVS_REMOTE, get_rest_schema, get_schema_helper
+
+
+class Session(object):
+    '''
+    JSON-RPC session of the IDL, the messages received are queued in
+    received and the messages sent are kept in sent.
+    '''
+
+    def __init__(self):
+        self.received = []
+        self.sent = []
+        self.seqno = 1
+        self.connected = True
+
+    def run(self):
+        pass
+
+    def is_connected(self):
+        return self.connected
+
+    def get_seqno(self):
+        return self.seqno
+
+    def recv(self):
+        return self.received.pop(0) if self.received else None
+
+    def send(self, msg):
+        self.sent.append(msg)
+        return 0
+
+    def close(self):
+        pass
+
+    def take_sent(self):
+        sent = [(msg.method, msg.params[-1]) for msg in self.sent]
+        self.sent = []
+        return sent
+
+    def reply(self, table, rows):
+        # Replies to the monitor request of the table
+        for msg in self.sent:
+            if msg.method == 'monitor' and msg.params[1] == table:
+                self.received.append(Message.create_reply(
+                    {table: rows} if rows else {}, msg.id))
+
+
+@pytest.fixture
+def idl():
+    schema_helper = get_schema_helper()
+    schema_helper.register_all()
+    idl = NotificationIdl(OVS_REMOTE, schema_helper, get_rest_schema())
+    idl._session.close()
+    idl._session = Session()
+
+    # Change tracking of the server side, (table, column) pairs
+    idl.tracked = set()
+    idl.track_add_all_columns = \
+        lambda table: idl.tracked.add((table, None))
+    idl.track_add_column = \
+        lambda table, column: idl.tracked.add((table, column))
+    idl.track_remove_all_columns = \
+        lambda table: idl.tracked.difference_update(
+            [item for item in idl.tracked if item[0] == table])
+    return idl
+
+
+def new_row(**values):
+    return {str(uuid.uuid4()): {'new': values}}
+
+
+def get_names(idl, table):
+    return sorted(row.name for row in idl.tables[table].rows.itervalues())
+
+
+def test_tables_monitored_once_connected(idl):
+    idl.add_table('Port')
+    idl.track_table('Port')
+    assert idl._session.sent == []
+
+    assert idl.run()
+    assert [msg.method for msg in idl._session.sent] == ['monitor']
+
+    # Tracked once the initial contents are received
+    assert not idl.tracked
+    idl._session.reply('Port', new_row(name='port0'))
+    idl.run()
+    assert get_names(idl, 'Port') == ['port0']
+    assert idl.tracked == set([('Port', None)])
+
+
+def test_updates_of_monitored_tables(idl):
+    idl.add_table('Port')
+    idl.run()
+    idl._session.reply('Port', {})
+    idl.run()
+
+    # Only the updates of the monitored tables are applied
+    for table, row in (('Port', new_row(name='port0')),
+                       ('VRF', new_row(name='red'))):
+        idl._session.received.append(
+            Message.create_notify('update', [table, {table: row}]))
+    assert idl.run()
+    assert get_names(idl, 'Port') == ['port0']
+    assert not idl.tables['VRF'].rows
+
+
+def test_echo_replies_are_expected(idl, monkeypatch):
+    messages = []
+    monkeypatch.setattr(notificationidl.app_log, 'debug', messages.append)
+
+    idl.run()
+    idl._session.received.append(Message.create_reply([], 'echo'))
+    assert not idl.run()
+    assert not messages
+
+
+def test_add_and_remove_tables_on_open_session(idl):
+    idl.add_table('Port')
+    idl.run()
+    idl._session.reply('Port', new_row(name='port0'))
+    idl.run()
+    idl._session.take_sent()
+
+    idl.add_table('VRF')
+    idl.track_table('VRF')
+    assert idl._session.take_sent() == [
+        ('monitor', {'VRF': {'columns': ['name']}})]
+
+    idl.remove_table('Port')
+    assert idl._session.take_sent() == [('monitor_cancel', 'Port')]
+    assert not idl.tables['Port'].rows
+
+    # Reconnected: the tables left are monitored again, not tracked
+    # until their contents are received
+    idl._session.seqno += 1
+    idl.run()
+    assert idl._session.take_sent() == [
+        ('monitor', {'VRF': {'columns': ['name']}})]
+    assert not idl.tracked
+
+
+def test_track_columns(idl):
+    idl.add_table('Port')
+    idl.run()
+    idl._session.reply('Port', {})
+    idl.run()
+
+    idl.track_table('Port', frozenset(['mtu']))
+    assert idl.tracked == set([('Port', 'mtu')])
+    idl.track_table('Port', frozenset(['mtu', 'name']))
+    assert idl.tracked == set([('Port', 'mtu'), ('Port', 'name')])
+    idl.track_table('Port')
+    assert idl.tracked == set([('Port', None)])
+    idl.untrack_table('Port')
+    assert not idl.tracked
+
+
+class Manager(object):
+    def __init__(self, idl):
+        self.idl = idl
+
+
+def test_monitor_table_dependencies(idl, monkeypatch):
+    monkeypatch.setattr(OvsdbNotificationMonitor, 'start_new_manager',
+                        lambda monitor: Manager(idl))
+    monitor = OvsdbNotificationMonitor(OVS_REMOTE, None, get_rest_schema(),
+                                       None)
+
+    # The routes are serialized with their VRF, System and Port rows
+    monitor.add_table_monitor('Static_Route', frozenset(['metric']))
+    monitor.add_table_monitor('Port')
+    assert idl.monitored_tables == set(['Static_Route', 'VRF', 'System',
+                                        'Port'])
+    assert idl.tracked_tables == {'Static_Route': frozenset(['metric']),
+                                  'Port': None}
+
+    monitor.remove_table_monitor('Static_Route')
+    assert idl.monitored_tables == set(['Port'])
+    assert idl.tracked_tables == {'Port': None}
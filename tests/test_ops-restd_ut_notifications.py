@@ -0,0 +1,141 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import json
+
+import pytest
+from tornado.ioloop import IOLoop
+
+from opsrest.notifications.changecache import NotificationChangeCache
+from opsrest.notifications.subscription import RowSubscription
+from opsrest.notifications.utils import EncodedJson, encode_json
+
+from restd_ut_utils import MemoryDb, populate
+
+PORT_URI = '/rest/v1/system/ports/port0'
+
+
+@pytest.fixture
+def db():
+    db = MemoryDb()
+    populate(db)
+    return db
+
+
+@pytest.fixture
+def selections(monkeypatch):
+    # (subscription, row) of the column selections computed
+    selections = []
+
+    get_selected_columns = RowSubscription.get_selected_columns
+
+    def select(subscription, row, schema, idl):
+        selections.append((subscription, row))
+        return get_selected_columns(subscription, row, schema, idl)
+
+    monkeypatch.setattr(RowSubscription, 'get_selected_columns', select)
+    return selections
+
+
+def get_port(db):
+    return db.idl.index_to_row_lookup(['port0'], 'Port')
+
+
+def get_cached_values(db, cache, columns=None):
+    port = get_port(db)
+
+    def get_values():
+        if columns is None:
+            return cache.get_row_values(port.uuid, 'Port', db.rest_schema,
+                                        db.idl, PORT_URI)
+        return cache.get_columns_to_values(columns, port.uuid, 'Port',
+                                           db.rest_schema, db.idl, PORT_URI)
+
+    return IOLoop.current().run_sync(get_values)
+
+
+def subscribe(db, name, columns=None, selector=None):
+    subscription = RowSubscription('Port', name, '/subscriptions/' + name,
+                                   PORT_URI, get_port(db).uuid)
+    subscription.columns = columns
+    subscription.selector = selector
+    return subscription
+
+
+def get_values(db, cache, subscription):
+    return IOLoop.current().run_sync(
+        lambda: subscription.get_row_values(subscription.row, PORT_URI,
+                                            db.idl, db.rest_schema,
+                                            cache)).value
+
+
+def test_filtered_values(db):
+    cache = NotificationChangeCache()
+    db.update(get_port(db), mtu=1500, link_state='up')
+
+    subscription = subscribe(db, 'config', selector='configuration')
+    values = get_values(db, cache, subscription)
+    assert values['mtu'] == 1500
+    assert 'link_state' not in values
+
+    subscription = subscribe(db, 'status', selector='status')
+    assert get_values(db, cache, subscription).keys() == ['link_state']
+
+    subscription = subscribe(db, 'mtu', columns=frozenset(['mtu']),
+                             selector='configuration')
+    assert get_values(db, cache, subscription).keys() == ['mtu']
+
+
+def test_selected_columns_computed_once_per_seqno(db, selections):
+    cache = NotificationChangeCache()
+    port = get_port(db)
+    subscriptions = [subscribe(db, 'config', selector='configuration'),
+                     subscribe(db, 'mtu', frozenset(['mtu']), 'configuration'),
+                     subscribe(db, 'status', selector='status')]
+
+    for subscription in subscriptions:
+        get_values(db, cache, subscription)
+        subscription.filter_columns(['mtu', 'link_state'], port.uuid,
+                                    db.rest_schema, db.idl, cache)
+    assert [subscription.subscriber_name for subscription, row in
+            selections] == ['config', 'status']
+
+    db.idl.change_seqno += 1
+    subscriptions[1].filter_columns(['mtu'], port.uuid, db.rest_schema,
+                                    db.idl, cache)
+    assert len(selections) == 3
+
+
+def test_values_shared_per_seqno(db):
+    cache = NotificationChangeCache()
+    values = get_cached_values(db, cache)
+    assert get_cached_values(db, cache) is values
+    assert get_cached_values(db, cache, ['mtu']) is not values
+
+    db.update(get_port(db), mtu=1500)
+    db.idl.change_seqno += 1
+    new_values = get_cached_values(db, cache)
+    assert new_values is not values
+    assert new_values.value['mtu'] == 1500
+
+
+def test_encode_json():
+    data = {'modified': [{'resource': PORT_URI,
+                          'new_values': EncodedJson({'mtu': 1500})}],
+            'deleted': [], u'name': u'port\xe9'}
+    assert json.loads(encode_json(data)) == json.loads(json.dumps(
+        dict(data, modified=[{'resource': PORT_URI,
+                              'new_values': {'mtu': 1500}}])))
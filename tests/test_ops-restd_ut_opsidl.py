@@ -0,0 +1,66 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+from ovs.jsonrpc import Message
+
+from restd_ut_utils import MemoryDb
+
+
+class Txn(object):
+    '''
+    Outstanding transaction of the IDL, waiting for its reply.
+    '''
+    def __init__(self):
+        self.replies = []
+
+    def _process_reply(self, msg):
+        self.replies.append(msg)
+
+
+def send_txns(idl, *ids):
+    txns = dict((txn_id, Txn()) for txn_id in ids)
+    idl._outstanding_txns.update(txns)
+    return txns
+
+
+def reply(idl, txn_id):
+    idl._Idl__txn_process_reply(Message.create_reply([], txn_id))
+
+
+def test_txn_replies_not_recorded_by_default():
+    idl = MemoryDb().idl
+    txns = send_txns(idl, 1, 2)
+
+    reply(idl, 1)
+    idl._Idl__txn_abort_all()
+    assert len(txns[1].replies) == 1
+    assert idl.txn_replies is None
+    assert idl.get_txn_replies() == []
+
+
+def test_tracked_txn_replies():
+    idl = MemoryDb().idl
+    idl.track_txn_replies()
+    send_txns(idl, 1, 2, 3)
+
+    reply(idl, 2)
+    reply(idl, 4)
+    assert idl.get_txn_replies() == [2]
+    assert idl.get_txn_replies() == []
+
+    # Aborted by a reconnection
+    idl._Idl__txn_abort_all()
+    assert sorted(idl.get_txn_replies()) == [1, 3]
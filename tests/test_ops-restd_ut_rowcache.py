@@ -0,0 +1,191 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+from ovs.db.idl import Transaction
+from tornado.ioloop import IOLoop
+
+from opsrest.get import get_row_json
+from opsrest.rowcache import RowJsonCache
+from opsrest.utils import utils
+
+from restd_ut_utils import MemoryDb, populate
+
+
+class Manager(object):
+    def __init__(self, db):
+        self.db = db
+        self.row_cache = RowJsonCache(100)
+
+    def idl_check_and_update(self):
+        # Same invalidation as OvsdbConnectionManager
+        self.row_cache.invalidate_rows(self.db.get_changed_rows())
+
+
+def get(manager, row, table):
+    db = manager.db
+    if table == 'System':
+        uri = '/rest/v1/system'
+    else:
+        uri = utils.row_to_uri(row, table, db.rest_schema, db.idl)
+    return IOLoop.current().run_sync(
+        lambda: get_row_json(row.uuid, table, db.rest_schema, db.idl, uri,
+                             manager=manager))
+
+
+def setup_manager():
+    db = MemoryDb()
+    populate(db)
+    db.get_changed_rows()
+    return Manager(db)
+
+
+def get_route(db, vrf_name, prefix):
+    for row in db.idl.tables['Static_Route'].rows.itervalues():
+        if row.vrf.name == vrf_name and row.prefix == prefix:
+            return row
+
+
+def test_hit_returns_copy():
+    manager = setup_manager()
+    db = manager.db
+    route = get_route(db, 'red', '10.0.0.0/24')
+
+    data = get(manager, route, 'Static_Route')
+    assert len(manager.row_cache) == 1
+
+    # Callers may drop keys from the JSON they are given
+    data['configuration'].clear()
+    data = get(manager, route, 'Static_Route')
+    assert data['configuration']['prefix'] == '10.0.0.0/24'
+
+
+def test_changed_row_invalidated():
+    manager = setup_manager()
+    db = manager.db
+    route = get_route(db, 'red', '10.0.0.0/24')
+    get(manager, route, 'Static_Route')
+
+    db.update(route, metric=5)
+    manager.idl_check_and_update()
+    assert len(manager.row_cache) == 0
+
+    data = get(manager, route, 'Static_Route')
+    assert data['configuration']['metric'] == 5
+
+
+def test_referenced_row_index_change():
+    manager = setup_manager()
+    db = manager.db
+    route = get_route(db, 'red', '10.0.0.0/24')
+    port = route.port[0]
+
+    data = get(manager, route, 'Static_Route')
+    assert data['configuration']['port'] == ['/rest/v1/system/ports/port0']
+    assert len(manager.row_cache) == 1
+
+    db.update(port, name='renamed')
+    manager.idl_check_and_update()
+
+    data = get(manager, route, 'Static_Route')
+    assert data['configuration']['port'] == ['/rest/v1/system/ports/renamed']
+
+
+def test_referenced_row_deleted():
+    manager = setup_manager()
+    db = manager.db
+    route = get_route(db, 'red', '10.0.1.0/24')
+    get(manager, route, 'Static_Route')
+
+    # Only the referenced row is reported, as if the reference was weak
+    db.delete(route.port[0])
+    manager.idl_check_and_update()
+    assert len(manager.row_cache) == 0
+
+
+def test_child_row_index_change():
+    manager = setup_manager()
+    db = manager.db
+    system = db.idl.tables['System'].rows.values()[0]
+
+    data = get(manager, system, 'System')
+    assert '/rest/v1/system/vrfs/red' in data['configuration']['vrfs']
+
+    vrf = [row for row in system.vrfs if row.name == 'red'][0]
+    db.update(vrf, name='green')
+    manager.idl_check_and_update()
+
+    data = get(manager, system, 'System')
+    assert '/rest/v1/system/vrfs/green' in data['configuration']['vrfs']
+    assert '/rest/v1/system/vrfs/red' not in data['configuration']['vrfs']
+
+
+def test_not_cached_in_transaction():
+    manager = setup_manager()
+    db = manager.db
+    route = get_route(db, 'red', '10.0.0.0/24')
+    get(manager, route, 'Static_Route')
+
+    txn = Transaction(db.idl)
+    route.metric = 5
+    data = get(manager, route, 'Static_Route')
+    assert data['configuration']['metric'] == 5
+    txn.abort()
+
+    data = get(manager, route, 'Static_Route')
+    assert 'metric' not in data['configuration']
+
+    manager.row_cache.clear()
+    txn = Transaction(db.idl)
+    route.metric = 5
+    get(manager, route, 'Static_Route')
+    txn.abort()
+    assert len(manager.row_cache) == 0
+
+
+def test_unrelated_change_keeps_entry():
+    manager = setup_manager()
+    db = manager.db
+    route = get_route(db, 'red', '10.0.0.0/24')
+    get(manager, route, 'Static_Route')
+
+    other = get_route(db, 'blue', '10.0.3.0/24')
+    db.update(other, metric=5)
+    manager.idl_check_and_update()
+    assert len(manager.row_cache) == 1
+
+
+def test_eviction_drops_dependencies():
+    cache = RowJsonCache(1)
+    cache.set(('Static_Route', 1, 'uri'), {}, [('Port', 2)])
+    cache.set(('Static_Route', 3, 'uri'), {}, [('Port', 2)])
+    assert len(cache) == 1
+
+    cache.invalidate('Port', 2)
+    assert len(cache) == 0
+    assert not cache._keys_by_row
+    assert not cache._rows_by_key
+
+
+def test_least_recently_used_entry_evicted():
+    cache = RowJsonCache(2)
+    cache.set(('Static_Route', 1, 'uri'), {'configuration': {}}, [])
+    cache.set(('Static_Route', 2, 'uri'), {'configuration': {}}, [])
+    cache.get(('Static_Route', 1, 'uri'))
+    cache.set(('Static_Route', 3, 'uri'), {'configuration': {}}, [])
+
+    assert cache.get(('Static_Route', 2, 'uri')) is None
+    assert cache.get(('Static_Route', 1, 'uri')) is not None
+    assert ('Static_Route', 2) not in cache._keys_by_row
@@ -0,0 +1,167 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 with pytest, no ovsdb-server is needed
+
+import json
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+from opsrest.notifications import subscriberqueue
+from opsrest.notifications.constants import (
+    NOTIF_MSG,
+    UPDATE_TYPE_ADDED,
+    UPDATE_TYPE_DELETED,
+    UPDATE_TYPE_MODIFIED,
+    UPDATE_TYPE_RESYNC
+)
+from opsrest.notifications.subscriberqueue import SubscriberQueue
+from opsrest.notifications.subscription import (
+    RowSubscription,
+    construct_added_msg,
+    construct_deleted_msg,
+    construct_modified_msg
+)
+from opsrest.notifications.utils import EncodedJson
+
+RESOURCE_URI = '/rest/v1/system/ports/port0'
+
+
+class Subscriber(object):
+    '''
+    Records the messages sent, whose Futures are resolved by calling
+    sent.
+    '''
+
+    def __init__(self, min_interval=0):
+        self.subscription = RowSubscription('Port', 'subscriber', '/sub',
+                                            RESOURCE_URI, None)
+        self.subscription.min_interval = min_interval
+        self.messages = []
+        self.futures = []
+        self.queue = SubscriberQueue('subscriber', self.send,
+                                     self.get_initial_values)
+
+    def send(self, subscriber_name, data):
+        self.messages.append(json.loads(data)[NOTIF_MSG])
+        self.futures.append(Future())
+        return self.futures[-1]
+
+    def sent(self):
+        for future in self.futures:
+            future.set_result(None)
+        self.futures = []
+
+    @gen.coroutine
+    def get_initial_values(self, subscription):
+        raise gen.Return(construct_added_msg('/sub', RESOURCE_URI,
+                                             {'mtu': 'current'}))
+
+    def modify(self, **values):
+        self.queue.add_update(self.subscription, UPDATE_TYPE_MODIFIED,
+                              construct_modified_msg('/sub', RESOURCE_URI,
+                                                     EncodedJson(values)))
+        self.queue.schedule()
+
+
+def run(coroutine):
+    IOLoop.current().run_sync(gen.coroutine(coroutine))
+
+
+def test_modifications_are_coalesced():
+    subscriber = Subscriber(min_interval=0.05)
+
+    def updates():
+        subscriber.modify(mtu=1500, name='port0')
+        yield gen.sleep(0.01)
+        subscriber.sent()
+
+        # Within min_interval of the first message
+        for mtu in range(3):
+            subscriber.modify(mtu=mtu)
+        subscriber.queue.add_update(subscriber.subscription,
+                                    UPDATE_TYPE_DELETED,
+                                    construct_deleted_msg('/sub',
+                                                          RESOURCE_URI))
+        subscriber.queue.schedule()
+        yield gen.sleep(0.01)
+        assert len(subscriber.messages) == 1
+        yield gen.sleep(0.1)
+
+    run(updates)
+    assert len(subscriber.messages) == 2
+    modified = subscriber.messages[1][UPDATE_TYPE_MODIFIED]
+    assert [update['new_values'] for update in modified] == [{'mtu': 2}]
+    assert len(subscriber.messages[1][UPDATE_TYPE_DELETED]) == 1
+    assert subscriber.queue.pending == 0
+
+
+def test_unsent_data_holds_updates(monkeypatch):
+    monkeypatch.setattr(subscriberqueue, 'NOTIF_MAX_BUFFER_SIZE', 10)
+    subscriber = Subscriber()
+
+    def updates():
+        subscriber.modify(mtu=1500)
+        yield gen.moment
+        subscriber.modify(mtu=9000)
+        yield gen.moment
+        assert len(subscriber.messages) == 1
+
+        subscriber.sent()
+        yield gen.moment
+        yield gen.moment
+
+    run(updates)
+    assert len(subscriber.messages) == 2
+    assert subscriber.queue.buffered > 0
+
+
+def test_backlog_is_dropped_to_resync(monkeypatch):
+    monkeypatch.setattr(subscriberqueue, 'NOTIF_MAX_PENDING_UPDATES', 3)
+    monkeypatch.setattr(subscriberqueue, 'NOTIF_MAX_BUFFER_SIZE', 10)
+    subscriber = Subscriber()
+
+    def updates():
+        subscriber.modify(mtu=1500)
+        yield gen.moment
+
+        # Held until the first message is sent, dropped on the 4th
+        for i in range(4):
+            subscriber.queue.add_update(subscriber.subscription,
+                                        UPDATE_TYPE_ADDED, {'index': i})
+            subscriber.queue.schedule()
+        assert subscriber.queue.pending == 0
+
+        subscriber.sent()
+        yield gen.moment
+        yield gen.moment
+
+    run(updates)
+    message = subscriber.messages[-1]
+    assert message[UPDATE_TYPE_RESYNC] == [{'subscription': '/sub'}]
+    assert message[UPDATE_TYPE_ADDED] == [
+        {'subscription': '/sub', 'resource': RESOURCE_URI,
+         'values': {'mtu': 'current'}}]
+
+
+def test_remove_subscription():
+    subscriber = Subscriber(min_interval=10)
+    subscriber.queue.add_update(subscriber.subscription, UPDATE_TYPE_ADDED,
+                                {'index': 0})
+
+    assert subscriber.queue.pending == 1
+    assert subscriber.queue.remove_subscription(subscriber.subscription)
+    assert subscriber.queue.pending == 0
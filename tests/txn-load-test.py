@@ -0,0 +1,110 @@
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+# NOTE: run using Python2 against a running switch, e.g.
+#   python txn-load-test.py 172.17.0.2 500
+import json
+import sys
+import time
+import urllib
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPError
+from tornado.ioloop import IOLoop
+
+'''
+Load test of the transaction completion. Hundreds of PUTs of the System
+configuration are sent at once, each one changing its own other_config
+key, and the completion latency of every request is reported. With the
+transaction tracker no request should wait for a timer, so the latencies
+stay close to the DB commit time instead of rounding up to seconds.
+'''
+SWITCH_IP = sys.argv[1] if len(sys.argv) > 1 else '172.17.0.2'
+CONCURRENT_PUTS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+USERNAME = 'netop'
+PASSWORD = 'netop'
+
+BASE_URL = 'https://%s' % SWITCH_IP
+SYSTEM_URL = BASE_URL + '/rest/v1/system'
+
+
+def request(url, method='GET', headers=None, body=None):
+    return HTTPRequest(url, method=method, headers=headers, body=body,
+                       validate_cert=False, request_timeout=120)
+
+
+@gen.coroutine
+def login(client):
+    body = urllib.urlencode({'username': USERNAME, 'password': PASSWORD})
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    response = yield client.fetch(request(BASE_URL + '/login', 'POST',
+                                          headers, body))
+    raise gen.Return({'Cookie': response.headers['Set-Cookie']})
+
+
+@gen.coroutine
+def timed_put(client, headers, config, index):
+    config = dict(config)
+    other_config = dict(config.get('other_config', {}))
+    other_config['txn_load_test_%d' % index] = str(index)
+    config['other_config'] = other_config
+    body = json.dumps({'configuration': config})
+
+    start = time.time()
+    try:
+        response = yield client.fetch(request(SYSTEM_URL, 'PUT',
+                                              headers, body))
+        code = response.code
+    except HTTPError as e:
+        code = e.code
+    raise gen.Return((time.time() - start, code))
+
+
+def percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+@gen.coroutine
+def main():
+    AsyncHTTPClient.configure(None, max_clients=CONCURRENT_PUTS)
+    client = AsyncHTTPClient()
+    headers = yield login(client)
+
+    response = yield client.fetch(request(SYSTEM_URL +
+                                          '?selector=configuration',
+                                          headers=headers))
+    config = json.loads(response.body)['configuration']
+
+    start = time.time()
+    results = yield [timed_put(client, headers, config, i)
+                     for i in range(CONCURRENT_PUTS)]
+    elapsed = time.time() - start
+
+    latencies = sorted(latency for latency, code in results)
+    failed = len([code for latency, code in results if code != 200])
+
+    print("%d concurrent PUTs in %.3fs, %d failed"
+          % (CONCURRENT_PUTS, elapsed, failed))
+    print("Latency min %.3fs p50 %.3fs p90 %.3fs p99 %.3fs max %.3fs"
+          % (latencies[0], percentile(latencies, 50),
+             percentile(latencies, 90), percentile(latencies, 99),
+             latencies[-1]))
+
+    # Restore the original configuration
+    yield client.fetch(request(SYSTEM_URL, 'PUT', headers,
+                               json.dumps({'configuration': config})))
+
+
+if __name__ == '__main__':
+    IOLoop.current().run_sync(main)